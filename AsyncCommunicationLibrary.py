@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+import asyncio
+import time
+from CommunicationLibrary import ActionRequest, MessageType, ResponseData, ResponseDecoder, request_name, \
+    pho_result, HEADER_SIZE, SUBHEADER_SIZE, NUMBER_OF_JOINTS, CARTES_POSE_LEN, JOINT_STATE_TYPE, TOOL_POSE_TYPE, \
+    BRAND_IDENTIFICATION, BRAND_IDENTIFICATION_SERVER, RESYNC_QUIET_TIME, RECEIVE_BUFFER_SIZE
+from PhoCodec import PHO, VS_ID, VS_ID_POSE, VS_ID_START_END, SOL_ID_VS_ID, POSE, JOINT_STATE_FRAME, TOOL_POSE_FRAME, \
+    RequestEncoder
+from PhoMetrics import ProtocolMetrics
+from PhoLogging import logger, log_error, flight_recorder
+from SessionCapture import SENT, RECEIVED
+from PhoErrors import PhoRequestError, PhoRequestInProgress, PhoProtocolError, PhoRequestIdError
+from RobotStateServer import get_joint_state, get_tool_pose, init_joint_state, base_quat
+
+
+class AsyncRobotRequestResponseCommunication:  # asyncio version of RobotRequestResponseCommunication
+    def __init__(self):
+        self.active_request = 0  # variable to check, if old request has finished and new one can be called
+        self.reader = None
+        self.writer = None
+        self.lock = asyncio.Lock()  # one request/response round-trip on the connection at a time
+        self.split_request = 0  # scan sent by split request - holds the lock until its response is received
+        self.split_task = None  # task which sent the split request
+        self.requests = RequestEncoder()  # request frames are packed into one reusable buffer
+        self.message = None
+        self.response_data = ResponseData()  # create object for storing data
+        self.decoder = ResponseDecoder(self.response_data)
+        self.metrics = ProtocolMetrics(request_name)  # latency histograms and counters per request
+        self.sent_time = None  # time.perf_counter() when the active request was sent
+
+    async def connect_to_server(self, CONTROLLER_IP, PORT):
+        self.reader, self.writer = await asyncio.open_connection(str(CONTROLLER_IP), PORT)
+        self.writer.write(BRAND_IDENTIFICATION.encode('utf-8'))
+        await self.writer.drain()
+
+    async def close_connection(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    # -------------------------------------------------------------------
+    #                      BIN PICKING REQUESTS
+    # -------------------------------------------------------------------
+    async def pho_request_binpicking_init(self, vs_id, start, end):
+        # payload - vision system ID, robot start pose, robot end pose
+        return await self.pho_request(ActionRequest.PHO_BINPICKING_INITIALIZATION, VS_ID_START_END, vs_id, *start, *end)
+
+    async def pho_request_binpicking_scan(self, vs_id, tool_pose=None):
+        await self.pho_send_split_request(ActionRequest.PHO_BINPICKING_SCAN, *pose_values(vs_id, tool_pose))
+
+    async def pho_request_binpicking_trigger_scan(self, vs_id, tool_pose=None):
+        await self.pho_send_split_request(ActionRequest.PHO_BINPICKING_TRIGGER_SCAN, *pose_values(vs_id, tool_pose))
+
+    async def pho_request_binpicking_localize_on_the_last_scan(self, vs_id, tool_pose=None):
+        await self.pho_send_split_request(ActionRequest.PHO_BINPICKING_LOCALIZE_ON_THE_LAST_SCAN,
+                                          *pose_values(vs_id, tool_pose))
+
+    async def pho_binpicking_wait_for_scan(self):
+        return await self.pho_wait_for_response(ActionRequest.PHO_BINPICKING_SCAN)
+
+    async def pho_request_binpicking_trajectory(self, vs_id):
+        return await self.pho_request(ActionRequest.PHO_BINPICKING_TRAJECTORY, VS_ID, vs_id)
+
+    async def pho_request_binpicking_pick_failed(self, vs_id):
+        return await self.pho_request(ActionRequest.PHO_BINPICKING_PICK_FAILED, VS_ID, vs_id)
+
+    async def pho_request_binpicking_object_pose(self, vs_id):
+        return await self.pho_request(ActionRequest.PHO_BINPICKING_OBJECT_POSE, VS_ID, vs_id)
+
+    async def pho_request_binpicking_change_scene_status(self, scene_status_id):
+        return await self.pho_request(ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS, VS_ID, scene_status_id)
+
+    async def pho_request_binpicking_get_vision_system_status(self, vs_id):
+        return await self.pho_request(ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS, VS_ID, vs_id)
+
+    # -------------------------------------------------------------------
+    #                      LOCATOR REQUESTS
+    # -------------------------------------------------------------------
+
+    # parameter tool_pose used only in Hand-eye
+    async def pho_request_locator_scan(self, vs_id, tool_pose=None):
+        if tool_pose is not None and len(tool_pose) != 7:
+            raise PhoRequestError('Wrong tool_pose size')
+        await self.pho_send_split_request(ActionRequest.PHO_LOCATOR_SCAN, *pose_values(vs_id, tool_pose))
+
+    async def pho_locator_wait_for_scan(self):
+        return await self.pho_wait_for_response(ActionRequest.PHO_LOCATOR_SCAN)
+
+    async def pho_request_locator_trigger_scan(self, vs_id, tool_pose=None):
+        await self.pho_send_split_request(ActionRequest.PHO_LOCATOR_TRIGGER_SCAN, *pose_values(vs_id, tool_pose))
+
+    async def pho_request_locator_localize_on_the_last_scan(self, vs_id, tool_pose=None):
+        await self.pho_send_split_request(ActionRequest.PHO_LOCATOR_LOCALIZE_ON_THE_LAST_SCAN,
+                                          *pose_values(vs_id, tool_pose))
+
+    async def pho_request_locator_get_objects(self, vs_id, number_of_objects):
+        # payload - vision system id, number of objects
+        return await self.pho_request(ActionRequest.PHO_LOCATOR_GET_OBJECTS, SOL_ID_VS_ID, vs_id, number_of_objects)
+
+    async def pho_request_locator_get_vision_system_status(self, vs_id):
+        return await self.pho_request(ActionRequest.PHO_LOCATOR_GET_VISION_SYSTEM_STATUS, VS_ID, vs_id)
+
+    # -------------------------------------------------------------------
+    #                      CALIBRATION REQUESTS
+    # -------------------------------------------------------------------
+    async def pho_request_calibration_add_point(self, tool_pose=None):
+        if tool_pose is None:
+            return await self.pho_request(ActionRequest.PHO_CALIBRATION_ADD_POINT)
+        return await self.pho_request(ActionRequest.PHO_CALIBRATION_ADD_POINT, POSE, *tool_pose)  # payload - robot pose
+
+    async def pho_request_calibration_start(self, sol_id, vs_id):
+        # payload - solution id, vision system id
+        return await self.pho_request(ActionRequest.PHO_CALIBRATION_START_AUTOMATIC, SOL_ID_VS_ID, sol_id, vs_id)
+
+    async def pho_request_calibration_save(self):
+        return await self.pho_request(ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC)
+
+    async def pho_request_calibration_stop(self):
+        return await self.pho_request(ActionRequest.PHO_CALIBRATION_STOP_AUTOMATIC)
+
+    # -------------------------------------------------------------------
+    #                      SOLUTION REQUESTS
+    # -------------------------------------------------------------------
+    async def pho_request_solution_change(self, sol_id):
+        return await self.pho_request(ActionRequest.PHO_SOLUTION_CHANGE, VS_ID, sol_id)
+
+    async def pho_request_solution_start(self, sol_id):
+        return await self.pho_request(ActionRequest.PHO_SOLUTION_START, VS_ID, sol_id)
+
+    async def pho_request_solution_stop(self):
+        return await self.pho_request(ActionRequest.PHO_SOLUTION_STOP)
+
+    async def pho_request_solution_get_running(self):
+        return await self.pho_request(ActionRequest.PHO_SOLUTION_GET_RUNNING)
+
+    async def pho_request_solution_get_available(self):
+        return await self.pho_request(ActionRequest.PHO_SOLUTION_GET_AVAILABLE)
+
+    # -------------------------------------------------------------------
+    #                     REQUEST RELATED FUNCTIONS
+    # -------------------------------------------------------------------
+
+    async def pho_request(self, request_id, layout=None, *values):
+        # whole round-trip under lock - concurrent coroutines wait for their turn on the connection
+        self.pho_check_split_request(request_id)
+        async with self.lock:
+            await self.pho_send_request(request_id, layout, *values)
+            return await self.pho_receive_response(request_id)
+
+    async def pho_send_split_request(self, request_id, layout=None, *values):
+        # scan split into send and wait - lock is held from send until the wait receives the response,
+        # requests of other coroutines wait for their turn instead of failing
+        self.pho_check_split_request(request_id)
+        await self.lock.acquire()
+        try:
+            await self.pho_send_request(request_id, layout, *values)
+        except BaseException:
+            self.lock.release()
+            raise
+        self.split_request = request_id
+        self.split_task = asyncio.current_task()
+        self.split_task.add_done_callback(self.pho_abandon_split_request)
+
+    def pho_check_split_request(self, request_id):
+        # the task holding the lock would wait for itself
+        if self.split_request != 0 and self.split_task is asyncio.current_task():
+            raise PhoRequestInProgress("Cannot send request " + request_name[request_id] + " because previous " +
+                                       "request " + request_name[self.split_request] + " is not finished ")
+
+    async def pho_wait_for_response(self, required_id):
+        # response of split request - lock taken by its send is released
+        if self.split_request == 0:
+            raise PhoRequestError("No request " + request_name[required_id] + " is waiting for response")
+        try:
+            return await self.pho_receive_response(required_id)
+        finally:
+            self.pho_release_split_request()
+
+    def pho_abandon_split_request(self, task):
+        # task ended (e.g. was cancelled) between send and wait - its response is skipped by the next request
+        if self.split_task is task:
+            logger.warning("Response of %s is not awaited - task finished", request_name[self.split_request])
+            self.active_request = 0
+            self.pho_release_split_request()
+
+    def pho_release_split_request(self):
+        self.split_task.remove_done_callback(self.pho_abandon_split_request)
+        self.split_request = 0
+        self.split_task = None
+        self.lock.release()
+
+    async def pho_send_request(self, request_id, layout=None, *values):
+        # layout - payload struct of PhoCodec, frame is packed into reusable buffer of the client -
+        # the transport copies the part it could not send at once
+        logger.info("Sending request \033[35m%s\033[0m", request_name[request_id])
+        if self.active_request != 0:
+            raise PhoRequestInProgress("Cannot send request " + request_name[request_id] + " because previous " +
+                                       "request " + request_name[self.active_request] + " is not finished ")
+
+        self.active_request = request_id
+        frame = self.requests.request(request_id, layout, *values)
+        self.sent_time = time.perf_counter()
+        try:
+            self.writer.write(frame)
+            flight_recorder.record(SENT, request_name[request_id], frame)
+            self.metrics.record_request(request_id, len(frame))
+            await self.writer.drain()
+        except BaseException:
+            self.active_request = 0  # request was not sent - no response will come
+            raise
+
+    async def pho_receive_response(self, required_id):
+        # receive header - responses of other requests are skipped
+        try:
+            while True:
+                received_header = await self.reader.readexactly(HEADER_SIZE)
+                header_time = time.perf_counter()
+                flight_recorder.record(RECEIVED, "header", received_header)
+                try:
+                    header = self.decoder.decode_header(received_header, required_id)
+                    break
+                except PhoRequestIdError as error:
+                    log_error(str(error))
+                    await self.pho_skip_messages(int.from_bytes(received_header[4:7], "little"))
+
+            bytes_received = HEADER_SIZE
+            waypoints = 0
+            errors = 0
+            error = None  # first error of the response - rest of the response is read without decoding
+            for message_count in range(header.sub_headers):
+                received_subheader = await self.reader.readexactly(SUBHEADER_SIZE)
+                flight_recorder.record(RECEIVED, "subheader", received_subheader)
+                try:
+                    message_type, payload_size, bytes_to_read = self.decoder.decode_subheader(received_subheader)
+                except PhoProtocolError as exception:
+                    await self.pho_resync(exception)
+                    raise
+                data = await self.reader.readexactly(bytes_to_read)
+                flight_recorder.record(RECEIVED, "payload", data)
+                if error is None:
+                    try:
+                        self.message = self.decoder.decode_message(message_type, payload_size, data)
+                    except PhoProtocolError as exception:
+                        log_error(str(exception))
+                        error = exception
+                        error.resynchronized = True
+                bytes_received += SUBHEADER_SIZE + bytes_to_read
+                if message_type == MessageType.PHO_TRAJECTORY_CNT or message_type == MessageType.PHO_TRAJECTORY_FINE:
+                    waypoints += payload_size
+                elif message_type == MessageType.PHO_ERROR:
+                    errors += 1
+
+            self.decoder.decode_end()
+            self.metrics.record_response(self.active_request, header_time - self.sent_time,
+                                         time.perf_counter() - self.sent_time, bytes_received, header.sub_headers,
+                                         waypoints, errors)
+            if error is not None:
+                raise error
+            return pho_result(header.request_id, self.response_data)
+        finally:
+            self.active_request = 0  # request finished - response received or reading failed
+
+    async def pho_skip_messages(self, number_of_messages):
+        # read rest of response without decoding - subheaders give the size of every payload
+        for message_count in range(number_of_messages):
+            received_subheader = await self.reader.readexactly(SUBHEADER_SIZE)
+            try:
+                message_type, payload_size, bytes_to_read = self.decoder.decode_subheader(received_subheader)
+            except PhoProtocolError as exception:
+                await self.pho_resync(exception)
+                raise
+            await self.reader.readexactly(bytes_to_read)
+
+    async def pho_resync(self, error):
+        # position in the stream is lost - everything received until the line is quiet is discarded
+        log_error(str(error))
+        dropped = 0
+        while True:
+            try:
+                data = await asyncio.wait_for(self.reader.read(RECEIVE_BUFFER_SIZE), RESYNC_QUIET_TIME)
+            except asyncio.TimeoutError:
+                break
+            if not data:
+                raise ConnectionError('Connection closed by peer')
+            dropped += len(data)
+        logger.warning("Resynchronized - %d bytes discarded", dropped)
+        self.active_request = 0
+        error.resynchronized = True
+
+
+# -------------------------------------------------------------------
+#                     OTHER FUNCTIONS
+# -------------------------------------------------------------------
+
+def pose_values(vs_id, tool_pose=None):
+    # payload layout and its values for pho_send_request
+    if tool_pose is None:
+        return VS_ID, vs_id  # payload - vision system ID
+    return (VS_ID_POSE, vs_id, *tool_pose)  # payload - vision system ID, robot pose
+
+
+# -------------------------------------------------------------------
+#                      STATE SERVER FUNCTIONS
+# -------------------------------------------------------------------
+
+class AsyncRobotStateCommunication:  # asyncio version of RobotStateCommunication
+    def __init__(self):
+        self.server = None
+        self.writer = None
+        self.client_connected = asyncio.Event()
+
+    async def create_server(self, ROBOT_CONTROLLER_IP, PORT):
+        self.server = await asyncio.start_server(self.handle_client, ROBOT_CONTROLLER_IP, PORT, reuse_address=True)
+        logger.info('Server is running, waiting for client...')
+
+    async def handle_client(self, reader, writer):
+        logger.info('Connection established...')
+        self.writer = writer
+        # Send hello string
+        writer.write(BRAND_IDENTIFICATION_SERVER.encode('utf-8'))
+        await writer.drain()
+        self.client_connected.set()
+
+    async def wait_for_client(self):
+        await self.client_connected.wait()
+
+    async def close_connection(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    # writer may keep the frame until it is sent - frames are packed into new bytes, not into reusable buffer
+    async def send_joint_state(self):
+        self.writer.write(JOINT_STATE_FRAME.pack(*PHO, NUMBER_OF_JOINTS, JOINT_STATE_TYPE,
+                                                 *get_joint_state(init_joint_state)))
+        await self.writer.drain()
+
+    async def send_tool_pose(self):
+        self.writer.write(TOOL_POSE_FRAME.pack(*PHO, CARTES_POSE_LEN, TOOL_POSE_TYPE, *get_tool_pose(base_quat)))
+        await self.writer.drain()
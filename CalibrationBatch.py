@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import json
+from collections import deque
+import numpy as np
+from PhoCodec import CARTES_POSE_LEN
+
+# automatic calibration with all points sent at once - add point requests are pipelined
+QUATERNION_TOLERANCE = 1e-3  # accepted difference of quaternion norm from 1
+CHUNK_SIZE = 64  # points of streamed source converted together
+READ_SIZE = 65536  # bytes read from streamed JSON file at once
+
+
+def calibration_poses(points, translation_scale=1.0):
+    # points - (N, 7) array-like of tool poses or list of {"translation": [...], "quaternion": [...]},
+    # translation is multiplied by translation_scale (1000 -> m to mm), returns (N, 7) float array
+    if len(points) and isinstance(points[0], dict):
+        poses = np.array([point["translation"] + point["quaternion"] for point in points], dtype=float)
+    else:
+        poses = np.array(points, dtype=float)
+    poses = poses.reshape(-1, CARTES_POSE_LEN)
+    poses[:, :3] *= translation_scale
+    return poses
+
+
+def validate_quaternions(poses, tolerance=QUATERNION_TOLERANCE):
+    # all quaternions are checked at once before anything is sent
+    norms = np.linalg.norm(poses[:, 3:], axis=1)
+    wrong = np.flatnonzero(np.abs(norms - 1) > tolerance)
+    if len(wrong):
+        raise ValueError("Quaternion of calibration points " + str(wrong.tolist()) + " is not normalized: " +
+                         str(norms[wrong].tolist()))
+
+
+def iter_json_points(file, read_size=READ_SIZE):
+    # yields points of JSON list one by one while the file is read - whole file is never loaded,
+    # point is decoded only when the separator after it was read (number can continue in the next chunk)
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    expected = "["  # "[" - start of list, "]" - first point or end of list, "point", "," - separator or end of list
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n":
+            position += 1
+        if position == len(buffer) or expected in ("]", "point") and buffer[position] not in ",]":
+            if position < len(buffer):
+                try:
+                    point, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    end = len(buffer)  # point is not complete - read more
+                # point is complete when separator follows it - "1" of "1.5" split between chunks is not
+                if eof or end < len(buffer) and (buffer[end] in ",] \t\r\n" or "," in buffer[end:] or
+                                                 "]" in buffer[end:]):
+                    yield point
+                    position = end
+                    expected = ","
+                    continue
+            elif eof:
+                raise ValueError("JSON list of calibration points is not closed by ]" if expected != "[" else
+                                 "JSON file of calibration points is empty")
+            chunk = file.read(read_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        character = buffer[position]
+        position += 1
+        if expected == "[":
+            if character != "[":
+                raise ValueError("JSON file of calibration points has to contain list, found " + repr(character))
+            expected = "]"
+        elif character == "]" and expected in ("]", ","):
+            return
+        elif character == "," and expected == ",":
+            expected = "point"
+        else:
+            raise ValueError("Unexpected " + repr(character) + " in JSON list of calibration points")
+
+
+def iter_chunks(source, translation_scale=1.0, chunk_size=CHUNK_SIZE):
+    # (N, 7) array, list of points, iterable of points or opened JSON file -> (M, 7) arrays of tool poses
+    if hasattr(source, "read"):
+        source = iter_json_points(source)
+    if isinstance(source, (np.ndarray, list, tuple)):
+        yield calibration_poses(source, translation_scale)
+        return
+    chunk = []
+    for point in source:
+        chunk.append(point)
+        if len(chunk) == chunk_size:
+            yield calibration_poses(chunk, translation_scale)
+            chunk = []
+    if chunk:
+        yield calibration_poses(chunk, translation_scale)
+
+
+class CalibrationBatch:  # automatic calibration over RobotRequestResponseCommunication
+    def __init__(self, robot, window=None):
+        self.robot = robot  # connected RobotRequestResponseCommunication
+        self.window = window  # maximum of add point requests waiting for response, None -> no limit
+        self.errors = []  # (point index, error code) of rejected points
+        self.number_of_points = 0
+
+    def run(self, source, sol_id, vs_id, translation_scale=1.0, stop=True):
+        # start calibration, add all points of source, save - returns CalibrationResult with calib_data, camera_pose
+        self.robot.pho_request_calibration_start(sol_id, vs_id)
+        try:
+            self.add_points(source, translation_scale)
+        except ValueError:
+            self.robot.pho_request_calibration_stop()  # wrong points - calibration is not saved
+            raise
+        result = self.robot.pho_request_calibration_save()
+        if stop:
+            self.robot.pho_request_calibration_stop()
+        return result
+
+    def add_points(self, source, translation_scale=1.0):
+        # points are validated chunk by chunk before they are sent, responses are collected at the end
+        self.errors = []
+        self.number_of_points = 0
+        in_flight = deque()
+        for poses in iter_chunks(source, translation_scale):
+            validate_quaternions(poses)
+            for pose in poses.tolist():
+                in_flight.append((self.number_of_points, self.robot.pho_request_calibration_add_point_nowait(pose)))
+                self.number_of_points += 1
+                if self.window is not None and len(in_flight) >= self.window:
+                    self.collect(*in_flight.popleft())
+        while in_flight:
+            self.collect(*in_flight.popleft())
+        if self.number_of_points == 0:
+            raise ValueError("No calibration points")
+
+    def collect(self, index, handle):
+        result = handle.result()
+        if result.error:
+            self.errors.append((index, result.error))
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from PhoMetrics import LATENCY_BUCKETS, LatencyHistogram
+from PhoLogging import logger
+
+# several robot cells from one PC - every cell runs in its own process (own GIL) with its own connections,
+# cycle results and protocol metrics are written into shared memory and aggregated by the parent
+
+# state of cell process
+CELL_STARTING = 0
+CELL_RUNNING = 1
+CELL_FINISHED = 2
+CELL_FAILED = 3
+CELL_STATES = {CELL_STARTING: "starting", CELL_RUNNING: "running", CELL_FINISHED: "finished", CELL_FAILED: "failed"}
+
+REPORT_INTERVAL = 5.0  # [s] period of summary logged by the parent
+
+# one record per cell - written only by the cell process
+CELL_DTYPE = np.dtype([
+    ("pid", np.int64),
+    ("state", np.int64),
+    ("heartbeat", np.float64),  # time.time() of the last update
+    ("cycles", np.int64),  # finished pick cycles
+    ("picks", np.int64),  # cycles ending with grasped part
+    ("failed_cycles", np.int64),  # cycles without usable trajectory
+    ("pick_retries", np.int64),
+    ("rescans", np.int64),
+    ("cycle_time", np.float64),  # sum of cycle durations [s]
+    ("wait_time", np.float64),  # sum of robot waiting for vision controller [s]
+    ("last_cycle_time", np.float64),
+    ("requests", np.int64),
+    ("responses", np.int64),
+    ("errors", np.int64),  # PHO_ERROR messages
+    ("bytes_sent", np.int64),
+    ("bytes_received", np.int64),
+    ("latency_counts", np.int64, (len(LATENCY_BUCKETS) + 1,)),  # send -> response of all requests
+    ("latency_sum", np.float64),
+])
+
+
+def load_config(path):
+    # {"cells": [{"name": ..., "controller_ip": ..., "port": ..., "vs_id": ..., ...}, ...], "pin_cpus": true}
+    with open(path) as file:
+        config = json.load(file)
+    names = [cell["name"] for cell in config["cells"]]
+    if len(set(names)) != len(names):
+        raise ValueError("Cell names are not unique: " + str(names))
+    return config
+
+
+def load_function(path):
+    # "module:function" -> function, None -> None
+    if path is None:
+        return None
+    module, function = path.split(":")
+    return getattr(importlib.import_module(module), function)
+
+
+class CellReport:  # view of own record in shared memory - used by the cell process
+    def __init__(self, record):
+        self.record = record  # 0-d view into shared array
+
+    def set_state(self, state):
+        self.record["state"] = state
+        self.record["heartbeat"] = time.time()
+
+    def cycle(self, timing):
+        # CycleTiming of finished cycle, None if no usable trajectory was found
+        if timing is None:
+            self.record["failed_cycles"] += 1
+        else:
+            self.record["cycles"] += 1
+            self.record["picks"] += timing.grasped
+            self.record["pick_retries"] += timing.pick_retries
+            self.record["rescans"] += timing.rescans
+            self.record["cycle_time"] += timing.total
+            self.record["wait_time"] += timing.wait
+            self.record["last_cycle_time"] = timing.total
+        self.record["heartbeat"] = time.time()
+
+    def metrics(self, protocol_metrics):
+        # ProtocolMetrics of the cell client - totals over all requests
+        requests = protocol_metrics.requests.values()
+        self.record["requests"] = sum(metrics.requests for metrics in requests)
+        self.record["responses"] = sum(metrics.responses for metrics in requests)
+        self.record["errors"] = sum(metrics.errors for metrics in requests)
+        self.record["bytes_sent"] = sum(metrics.bytes_sent for metrics in requests)
+        self.record["bytes_received"] = sum(metrics.bytes_received for metrics in requests)
+        counts = np.zeros(len(LATENCY_BUCKETS) + 1, dtype=np.int64)
+        for metrics in requests:
+            counts += metrics.total.counts
+        self.record["latency_counts"] = counts
+        self.record["latency_sum"] = sum(metrics.total.sum for metrics in requests)
+        self.record["heartbeat"] = time.time()
+
+
+def binpicking_task(robot, cell, report):
+    # default task of cell - bin picking cycles, pick and place are "module:function" of the cell config
+    from PickCycle import BinPickingCycle
+    pick = load_function(cell.get("pick")) or (lambda trajectory: True)
+    place = load_function(cell.get("place")) or (lambda: None)
+    vs_id = cell.get("vs_id", 1)
+    if "start_pose" in cell and "end_pose" in cell:
+        robot.pho_request_binpicking_init(vs_id, cell["start_pose"], cell["end_pose"])
+    engine = BinPickingCycle(robot, vs_id, pick, place, cell.get("tool_pose"))
+    picks = cell.get("picks")  # None -> until the process is stopped
+    engine.start_prefetch()
+    pick_number = 0
+    while picks is None or pick_number < picks:
+        pick_number += 1
+        timing = engine.cycle(prefetch_next=picks is None or pick_number < picks)
+        report.cycle(timing)
+        report.metrics(robot.metrics)
+        if timing is None:
+            break
+    engine.finish_prefetch()
+
+
+def run_cell(cell, shm_name, index, cpu=None):
+    # entry point of cell process - owns the connection to vision controller and robot state server
+    import CommunicationLibrary
+    from PhoReconnect import ReconnectPolicy
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+    shm = attach_shared_memory(shm_name)
+    records = np.ndarray((index + 1,), dtype=CELL_DTYPE, buffer=shm.buf)
+    report = CellReport(records[index:index + 1].reshape(()))
+    report.record["pid"] = os.getpid()
+    state_server = None
+    robot = None
+    try:
+        if "state_port" in cell:
+            state_server = CommunicationLibrary.RobotStateCommunication()
+            state_server.create_server(cell.get("state_ip", "0.0.0.0"), cell["state_port"])
+            if "state_shm" in cell:
+                state_server.start_publishing(cell["state_shm"])  # local readers use StateReader(state_shm)
+            threading.Thread(target=state_server.serve_state, args=(cell.get("state_rate", 100),),
+                             daemon=True).start()
+        robot = CommunicationLibrary.RobotRequestResponseCommunication()
+        robot.connect_to_server(cell["controller_ip"], cell.get("port", 11003),
+                                reconnect=ReconnectPolicy() if cell.get("reconnect", True) else None)
+        if "solution" in cell:
+            robot.pho_request_solution_start(cell["solution"])
+        report.set_state(CELL_RUNNING)
+        task = load_function(cell.get("task")) or binpicking_task
+        task(robot, cell, report)
+        report.metrics(robot.metrics)
+        report.set_state(CELL_FINISHED)
+    except BaseException:
+        report.set_state(CELL_FAILED)
+        raise
+    finally:
+        if robot is not None and robot.transport is not None:
+            robot.close_connection()
+        if state_server is not None:
+            state_server.close_connection()
+        del records, report
+        shm.close()
+
+
+def attach_shared_memory(name):
+    # shared memory is owned by the parent - unlinked by the parent only
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 - spawned cells share resource tracker of the parent
+        return shared_memory.SharedMemory(name=name)
+
+
+class CellOrchestrator:  # starts cell processes and aggregates their results from shared memory
+    def __init__(self, config):
+        self.config = config  # dict of load_config()
+        self.cells = config["cells"]
+        self.context = multiprocessing.get_context("spawn")  # cells do not inherit state of the parent
+        self.shm = None
+        self.records = None  # (number of cells,) array of CELL_DTYPE in shared memory
+        self.processes = []
+
+    def start(self):
+        self.shm = shared_memory.SharedMemory(create=True, size=CELL_DTYPE.itemsize * len(self.cells))
+        self.records = np.ndarray((len(self.cells),), dtype=CELL_DTYPE, buffer=self.shm.buf)
+        self.records[:] = np.zeros(1, dtype=CELL_DTYPE)
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+        if len(self.cells) > len(cpus):
+            logger.warning("%d cells on %d cores - cells will share cores", len(self.cells), len(cpus))
+        for index, cell in enumerate(self.cells):
+            cpu = cpus[index % len(cpus)] if self.config.get("pin_cpus", False) else None
+            process = self.context.Process(target=run_cell, args=(cell, self.shm.name, index, cpu),
+                                           name=cell["name"], daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def alive(self):
+        return any(process.is_alive() for process in self.processes)
+
+    def join(self, report_interval=REPORT_INTERVAL):
+        # wait for all cells, summary is logged every report_interval
+        while self.alive():
+            for process in self.processes:
+                process.join(report_interval / len(self.processes))
+            logger.info(self.summary())
+        for index, process in enumerate(self.processes):
+            if process.exitcode != 0 and self.records["state"][index] != CELL_FAILED:
+                self.records["state"][index] = CELL_FAILED  # killed before it could report
+        return self.snapshot()
+
+    def stop(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join()
+
+    def close(self):
+        self.stop()
+        self.records = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    # -------------------------------------------------------------------
+    #                      AGGREGATION
+    # -------------------------------------------------------------------
+
+    def snapshot(self):
+        # copy of all records - cells keep writing into shared memory
+        records = self.records.copy()
+        cells = {}
+        for cell, record in zip(self.cells, records):
+            cells[cell["name"]] = {name: record[name].tolist() for name in CELL_DTYPE.names}
+            cells[cell["name"]]["state"] = CELL_STATES[int(record["state"])]
+        return {"cells": cells, "total": self.totals(records)}
+
+    def totals(self, records=None):
+        records = self.records.copy() if records is None else records
+        latency = self.latency(records)
+        cycle_time = records["cycle_time"].sum()
+        return {"cycles": int(records["cycles"].sum()), "failed_cycles": int(records["failed_cycles"].sum()),
+                "picks": int(records["picks"].sum()), "requests": int(records["requests"].sum()),
+                "errors": int(records["errors"].sum()),
+                "picks_per_hour": float(3600 * np.sum(records["picks"] / np.maximum(records["cycle_time"], 1e-9))),
+                "mean_cycle_time": float(cycle_time / records["cycles"].sum()) if records["cycles"].sum() else None,
+                "latency_p50": latency.percentile(50), "latency_p99": latency.percentile(99)}
+
+    def latency(self, records=None):
+        # latency histogram of all requests of all cells
+        records = self.records.copy() if records is None else records
+        histogram = LatencyHistogram()
+        histogram.counts = records["latency_counts"].sum(axis=0).tolist()
+        histogram.count = int(records["latency_counts"].sum())
+        histogram.sum = float(records["latency_sum"].sum())
+        return histogram
+
+    def summary(self):
+        total = self.totals()
+        states = [CELL_STATES[int(state)] for state in self.records["state"]]
+        return ("cells: " + ", ".join(cell["name"] + "=" + state for cell, state in zip(self.cells, states)) +
+                " | cycles: " + str(total["cycles"]) + " | picks per hour: " + str(round(total["picks_per_hour"])) +
+                " | latency p50/p99: " + str(total["latency_p50"]) + "/" + str(total["latency_p99"]) + " s")
+
+
+def main(path):
+    orchestrator = CellOrchestrator(load_config(path))
+    orchestrator.start()
+    try:
+        result = orchestrator.join()
+    finally:
+        orchestrator.close()
+    print(json.dumps(result["total"], indent=2))
+
+
+if __name__ == "__main__":  # if main
+    main(sys.argv[1] if len(sys.argv) > 1 else "cells.json")
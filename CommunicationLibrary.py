@@ -1,9 +1,23 @@
 #!/usr/bin/env python3
 import socket
-import sys
-from copy import deepcopy
+import select
+import selectors
+import threading
+import time
+from collections import deque
 import struct
 import numpy as np
+from PhoCodec import HEADER, PHO, VS_ID, VS_ID_POSE, VS_ID_START_END, SOL_ID_VS_ID, POSE, \
+    FrameEncoder, RequestEncoder, pack_floats
+from SessionCapture import SessionRecorder, CaptureFile, ReplaySocket, SENT, RECEIVED
+from PhoMetrics import ProtocolMetrics
+from PhoResults import PhoResult, TrajectoryResult, ObjectsResult, StatusResult, CalibrationResult, SolutionResult, \
+    LocatedObject
+from PhoLogging import logger, log_error, flight_recorder
+from PhoReconnect import set_keepalive
+from StateSharedMemory import StatePublisher, RING_SIZE
+from PhoErrors import PhoRequestError, PhoConnectionLost, PhoProtocolError, PhoHeaderError, PhoRequestIdError, \
+    PhoMessageTypeError, PhoChecksumError
 from RobotStateServer import get_joint_state, get_tool_pose, init_joint_state, base_quat
 
 BRAND_IDENTIFICATION = "ABB_IRB/1.8.0XXXXXXXXXXX"
@@ -79,6 +93,17 @@ request_name = {
     ActionRequest.PHO_SOLUTION_GET_RUNNING: "GET RUNNING SOLUTION",
     ActionRequest.PHO_SOLUTION_GET_AVAILABLE: "GET AVAILABLE SOLUTION"}
 
+# typed result of every request - requests missing here return PhoResult
+result_type = {
+    ActionRequest.PHO_BINPICKING_TRAJECTORY: TrajectoryResult,
+    ActionRequest.PHO_BINPICKING_OBJECT_POSE: ObjectsResult,
+    ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS: StatusResult,
+    ActionRequest.PHO_LOCATOR_GET_OBJECTS: ObjectsResult,
+    ActionRequest.PHO_LOCATOR_GET_VISION_SYSTEM_STATUS: StatusResult,
+    ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC: CalibrationResult,
+    ActionRequest.PHO_SOLUTION_GET_RUNNING: SolutionResult,
+    ActionRequest.PHO_SOLUTION_GET_AVAILABLE: SolutionResult}
+
 # STATE SERVER Requests
 JOINT_STATE_TYPE = 1
 TOOL_POSE_TYPE = 2
@@ -89,37 +114,149 @@ SUBHEADER_SIZE = 12
 PACKET_SIZE = 4
 NUMBER_OF_JOINTS = 6
 CARTES_POSE_LEN = 7
+WAYPOINT_SIZE = 2 * PACKET_SIZE + NUMBER_OF_JOINTS * PACKET_SIZE  # waypoint ID + joints + checksum
+
+# waypoint layout on the wire - used to view received trajectory block without copying
+WAYPOINT_DTYPE = np.dtype([('id', '<i4'), ('joints', '<f4', (NUMBER_OF_JOINTS,)), ('checksum', '<f4')])
 
 # Photoneo header
 PHO_HEADER = struct.pack("III", 80, 72, 79)  # P, H, O
 
 
+RECEIVE_BUFFER_SIZE = 65536  # initial size of transport receive buffer
+RESYNC_QUIET_TIME = 0.05  # [s] without received data after which discarded stream is considered empty
+
+
+class PhoTransport:  # buffered exact-length framing over TCP socket
+    def __init__(self, sock, buffer_size=RECEIVE_BUFFER_SIZE):
+        self.sock = sock
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # first unread byte in buffer
+        self.end = 0  # end of received data in buffer
+        self.recorder = None  # SessionRecorder - captures raw sent and received bytes when set
+
+    def buffered(self):
+        return self.end - self.start
+
+    def send(self, data):
+        self.sock.sendall(data)
+        if self.recorder is not None:
+            self.recorder.record(SENT, data)
+
+    def readable(self, timeout=0):
+        # True if received data is buffered or waiting in the socket
+        if self.end > self.start:
+            return True
+        return self.wait_readable(timeout)
+
+    def wait_readable(self, timeout):
+        # replay source of capture is not a socket - it has its own readiness check
+        if isinstance(self.sock, socket.socket):
+            return bool(select.select([self.sock], [], [], timeout)[0])
+        return self.sock.readable(timeout)
+
+    def recv_exact(self, size):
+        # returns memoryview of exactly size bytes - valid only until next recv_exact call
+        if self.end - self.start < size:
+            self.fill(size)
+        frame = self.view[self.start:self.start + size]
+        self.start += size
+        return frame
+
+    def fill(self, size):
+        available = self.end - self.start
+        if size > len(self.buffer):
+            # grow buffer - new allocation, old frames may still reference the previous one
+            new_buffer = bytearray(max(size, 2 * len(self.buffer)))
+            new_buffer[0:available] = self.view[self.start:self.end]
+            self.buffer = new_buffer
+            self.view = memoryview(self.buffer)
+        elif self.start > 0:
+            # move unread bytes to the beginning of buffer
+            self.view[0:available] = self.view[self.start:self.end]
+        self.start = 0
+        self.end = available
+        while self.end < size:
+            count = self.sock.recv_into(self.view[self.end:])
+            if count == 0:
+                raise ConnectionError('Connection closed by peer')
+            if self.recorder is not None:
+                self.recorder.record(RECEIVED, self.view[self.end:self.end + count])
+            self.end += count
+
+    def discard(self, quiet_time=RESYNC_QUIET_TIME):
+        # drop buffered data and everything received until nothing arrives for quiet_time, returns dropped bytes
+        dropped = self.end - self.start
+        self.start = 0
+        self.end = 0
+        while self.wait_readable(quiet_time):
+            count = self.sock.recv_into(self.view)
+            if count == 0:
+                raise ConnectionError('Connection closed by peer')
+            if self.recorder is not None:  # capture keeps the whole stream - replay follows the same resync
+                self.recorder.record(RECEIVED, self.view[:count])
+            dropped += count
+        return dropped
+
+    def close(self):
+        self.sock.close()
+
+
+class PhoRequestHandle:  # outstanding request - response is collected later
+    def __init__(self, client, request_id, response_data):
+        self.client = client
+        self.request_id = request_id
+        self.response_id = pho_response_id(request_id)  # request ID expected in the response header
+        self.response_data = response_data
+        self.finished = False
+        self.sent_time = None  # time.perf_counter() when the request was sent
+        self.exception = None  # raised by result() - e.g. connection was lost before the response was received
+        self.finished_time = None  # time.perf_counter() when the whole response was received
+        self.value = None  # typed result - built once the response is received
+
+    def done(self):
+        if not self.finished:
+            self.client.pho_poll_responses()
+        return self.finished
+
+    def result(self):
+        # wait until response of this request is received, returns typed result (TrajectoryResult, ...)
+        while not self.finished:
+            self.client.pho_dispatch_response()
+        if self.exception is not None:
+            raise self.exception
+        if self.value is None:
+            self.value = pho_result(self.response_id, self.response_data)
+        return self.value
+
+
 class ResponseHeader:
     def __init__(self, request_id, sub_headers):
         self.request_id = request_id
         self.sub_headers = sub_headers
 
 
-class ResponseData:  # class used for storing data
+class ResponseData:  # class used for storing data - every client and request has its own instance
 
     def __init__(self):
         self.segment_id = 0
-
-    print_message = 1  # set 1 for printing messages
-    error = 0
-    gripper_command = None  # stores gripper commands
-    trajectory_data = []  # stores trajectory waypoints in 4 segments
-    gripping_info = None
-    dimensions = []
-    status_data = None
-    calib_data = None
-    running_solution = None
-    available_solution = []
-    object_pose = []
-    camera_pose = []
-    zheight_angle = [] # ako to pomenovat ??
+        self.error = 0
+        self.gripper_command = None  # stores gripper commands
+        self.trajectory_data = []  # stores trajectory waypoints in 4 segments
+        self.trajectory_types = []  # MessageType of every trajectory segment
+        self.gripping_info = []
+        self.dimensions = []
+        self.status_data = None
+        self.calib_data = None
+        self.running_solution = None
+        self.available_solution = []
+        self.object_pose = []
+        self.camera_pose = []
+        self.zheight_angle = [] # ako to pomenovat ??
 
     def init_response_data(self):
+        # everything is replaced for every response - data of previous responses is not kept
         self.error = 0
         #self.gripper_command = []  # stores gripper commands
         #self.trajectory_data = []  # stores trajectory waypoints in 4 segments
@@ -128,149 +265,438 @@ class ResponseData:  # class used for storing data
         self.status_data = None
         self.calib_data = None
         self.running_solution = None
+        self.available_solution = []
         self.object_pose = []
+        self.camera_pose = []
+        self.zheight_angle = []
 
     def init_trajectory_data(self):
         # empty the variable for storing trajectory
         self.trajectory_data = []
         self.trajectory_data.append(np.empty((0, NUMBER_OF_JOINTS), dtype=float))
+        self.trajectory_types = []
         self.segment_id = 0
         self.gripper_command = []
 
     def add_waypoint(self, slice_index, row):
         self.trajectory_data[slice_index] = np.vstack([self.trajectory_data[slice_index], row])
 
+    def add_waypoints(self, slice_index, rows):
+        # add block of waypoints (shape (N, NUMBER_OF_JOINTS)) to the segment at once
+        if len(self.trajectory_data[slice_index]) == 0:
+            self.trajectory_data[slice_index] = np.array(rows, dtype=float)
+        else:
+            self.trajectory_data[slice_index] = np.vstack([self.trajectory_data[slice_index], rows])
+
     def add_segment(self):
         self.trajectory_data.append(np.empty((0, NUMBER_OF_JOINTS), dtype=float))
 
     def data_store(self, message_type, request_id, message): #store received messages into variables - specific for each request
         if message_type == MessageType.PHO_TRAJECTORY_CNT or message_type == MessageType.PHO_TRAJECTORY_FINE:
-            if self.print_message == 1: print("trajectory: " + str(self.trajectory_data))
+            logger.debug("trajectory: %s", self.trajectory_data)
         elif message_type == MessageType.PHO_GRIPPER:
-            if self.print_message == 1: print("gripper commands: " + str(self.gripper_command))
+            logger.debug("gripper commands: %s", self.gripper_command)
         elif message_type == MessageType.PHO_ERROR:
             self.error = message
-            if self.print_message == 1: print("error message: " + str(self.error))
+            logger.debug("error message: %s", self.error)
         elif message_type == MessageType.PHO_INFO:
             # TRAJECTORY - BPS
             if request_id == ActionRequest.PHO_BINPICKING_TRAJECTORY:
                 self.gripping_info.append(message)
-                if self.print_message == 1: print("gripping info: " + str(self.gripping_info))
+                logger.debug("gripping info: %s", self.gripping_info)
             # OBJECT POSE - BPS
             elif request_id == ActionRequest.PHO_BINPICKING_OBJECT_POSE:
                 self.dimensions = message
-                if self.print_message == 1: print("dimensions: " + str(self.dimensions))
+                logger.debug("dimensions: %s", self.dimensions)
             # GET VISION SYSTEM STATUS
             elif request_id == ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS:
                 self.status_data = message
-                if self.print_message == 1: print("status data: " + str(self.status_data))
+                logger.debug("status data: %s", self.status_data)
             # GET OBJECTS - LS
             elif request_id == ActionRequest.PHO_LOCATOR_GET_OBJECTS:
                 self.dimensions.append(message)
-                if self.print_message == 1: print("dimensions: " + str(self.dimensions))
+                logger.debug("dimensions: %s", self.dimensions)
             elif request_id == ActionRequest.PHO_LOCATOR_GET_VISION_SYSTEM_STATUS:
                 self.status_data = message
-                if self.print_message == 1: print("status data: " + str(self.status_data))
+                logger.debug("status data: %s", self.status_data)
             elif request_id == ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC:
                 self.calib_data = message
-                if self.print_message == 1: print("calibration data: " + str(self.calib_data))
+                logger.debug("calibration data: %s", self.calib_data)
             elif request_id == ActionRequest.PHO_SOLUTION_GET_RUNNING:
                 self.running_solution = message
-                if self.print_message == 1: print("running solution: " + str(self.running_solution))
+                logger.debug("running solution: %s", self.running_solution)
 
         elif message_type == MessageType.PHO_OBJECT_POSE:
             self.object_pose.append(message)
-            if self.print_message == 1: print("object pose: " + str(self.object_pose))
+            logger.debug("object pose: %s", self.object_pose)
         else:
-            print('\033[31mUnexpected operation type\033[0m')
-            sys.exit()
+            raise PhoMessageTypeError('Unexpected operation type', request_id)
 
 
 
-class RobotRequestResponseCommunication:
-    response_data = ResponseData()  # create object for storing data
+class ResponseDecoder:  # decodes received frames into ResponseData - shared by sync and async clients
+    def __init__(self, response_data):
+        self.response_data = response_data
+        self.request_id = 0  # request ID of the response being decoded
+        self.object_dimension_flag = 0  # 0 -> next INFO are dimensions, 1 -> z-height/angle
+
+    def decode_header(self, received_header, required_id):
+        request_id = pho_response_id(int.from_bytes(received_header[0:3], "little"))
+        number_of_messages = int.from_bytes(received_header[4:7], "little")
 
+        #check received header size
+        if len(received_header) != HEADER_SIZE:
+            raise PhoHeaderError('Wrong header size', required_id)
+
+        # check request ID
+        header = ResponseHeader(request_id, number_of_messages)
+        if header.request_id != required_id:
+            raise PhoRequestIdError('Wrong request id received - ' + str(request_id) + ' instead of ' +
+                                    str(required_id), required_id)
+
+        if request_id == ActionRequest.PHO_BINPICKING_TRAJECTORY: self.response_data.init_trajectory_data()  # empty variable for receiving new trajectory
+
+        # clear response_data variables
+        self.response_data.init_response_data()
+        self.request_id = request_id
+        self.object_dimension_flag = 0
+        return header
+
+    def decode_subheader(self, received_subheader):
+        # returns message type, payload size and number of payload bytes following the subheader
+        message_type = int.from_bytes(received_subheader[0:3], "little")
+        operation_number = int.from_bytes(received_subheader[4:7], "little")
+        payload_size = int.from_bytes(received_subheader[8:11], "little")
+        # check received subheader size
+        if len(received_subheader) != SUBHEADER_SIZE:
+            raise PhoHeaderError('Wrong subheader size', self.request_id)
+
+        if message_type == MessageType.PHO_TRAJECTORY_CNT or message_type == MessageType.PHO_TRAJECTORY_FINE:
+            return message_type, payload_size, payload_size * WAYPOINT_SIZE
+        elif message_type in (MessageType.PHO_GRIPPER, MessageType.PHO_ERROR, MessageType.PHO_INFO, MessageType.PHO_OBJECT_POSE):
+            return message_type, payload_size, payload_size * PACKET_SIZE
+        raise PhoMessageTypeError('Unexpected operation type ' + str(message_type), self.request_id)
+
+    def decode_message(self, message_type, payload_size, data):
+        # store one received message into response_data, returns decoded message
+        message = None
+        if message_type == MessageType.PHO_TRAJECTORY_CNT or message_type == MessageType.PHO_TRAJECTORY_FINE:
+            if self.response_data.segment_id >= len(
+                    self.response_data.trajectory_data):  self.response_data.add_segment()
+            waypoints = self.decode_waypoints(data, payload_size)
+            self.response_data.add_waypoints(self.response_data.segment_id,
+                                             waypoints['joints'])  # add waypoints to the actual segment of trajectory
+            self.response_data.trajectory_types.append(message_type)
+            self.response_data.segment_id += 1  # increment to switch to another segment of trajectory
+            message = waypoints['joints'].ravel()
+            # print data stored in trajectory data
+            logger.debug("\033[94mtrajectory segment %d: \033[0m%s", self.response_data.segment_id - 1,
+                         waypoints['joints'])
+        elif message_type == MessageType.PHO_GRIPPER:
+            self.response_data.gripper_command.append(int(data[0]))  # store gripper command
+            message = bytes(data)
+            logger.debug("\033[94mgripper command: \033[0m%s", self.response_data.gripper_command[-1])
+        elif message_type == MessageType.PHO_ERROR:
+            error_code = int.from_bytes(data, "little")
+            message = error_code
+            self.response_data.error = error_code
+            logger.warning("\033[94merror message: \033[0m%s", error_code)
+        elif message_type == MessageType.PHO_INFO:
+            message = bytes(data)
+            data_size = int((len(data) + 1) / 4)
+            info_list = []
+            for iterator in range(data_size):
+                info = int.from_bytes(message[0 + iterator * PACKET_SIZE:3 + iterator * PACKET_SIZE], "little")
+                info_list.append(info)
+            # TRAJECTORY - BPS
+            if self.request_id == ActionRequest.PHO_BINPICKING_TRAJECTORY:
+                self.response_data.gripping_info.append(info_list)
+                logger.debug("\033[94mgripping info: \033[0m%s", info_list)
+            # OBJECT POSE - BPS
+            elif self.request_id == ActionRequest.PHO_BINPICKING_OBJECT_POSE:
+                if self.object_dimension_flag == 0:
+                    self.response_data.dimensions = info_list
+                    logger.debug("\033[94mdimensions: \033[0m%s", info_list)
+                elif self.object_dimension_flag == 1:
+                    self.response_data.zheight_angle = info_list
+                    logger.debug("\033[94mz-height/angle: \033[0m%s", info_list)
+                self.object_dimension_flag = 1
+            # GET VISION SYSTEM STATUS
+            elif self.request_id == ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS:
+                self.response_data.status_data = info_list
+                logger.debug("\033[94mstatus data: \033[0m%s", info_list)
+            # GET OBJECTS - LS
+            elif self.request_id == ActionRequest.PHO_LOCATOR_GET_OBJECTS:
+                if self.object_dimension_flag == 0:
+                    self.response_data.dimensions.append(info_list)
+                    logger.debug("\033[94mdimensions: \033[0m%s", info_list)
+                elif self.object_dimension_flag == 1:
+                    self.response_data.zheight_angle.append(info_list)
+                    logger.debug("\033[94mz-height/angle: \033[0m%s", info_list)
+                self.object_dimension_flag = 1
+            elif self.request_id == ActionRequest.PHO_LOCATOR_GET_VISION_SYSTEM_STATUS:
+                self.response_data.status_data = info_list
+                logger.debug("\033[94mstatus data: \033[0m%s", info_list)
+            elif self.request_id == ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC:
+                self.response_data.calib_data = info_list
+                logger.debug("\033[94mcalibration data: \033[0m%s", info_list)
+            elif self.request_id == ActionRequest.PHO_SOLUTION_GET_RUNNING:
+                self.response_data.running_solution = info_list
+                logger.debug("\033[94mrunning solution: \033[0m%s", info_list)
+            elif self.request_id == ActionRequest.PHO_SOLUTION_GET_AVAILABLE:
+                self.response_data.available_solution.append(info_list)
+                logger.debug("\033[94mavailable solution: \033[0m%s", info_list)
+        elif message_type == MessageType.PHO_OBJECT_POSE:
+            object_pose = struct.unpack(f'<{CARTES_POSE_LEN}f', data)
+            message = object_pose
+            if self.request_id == ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC:
+                self.response_data.camera_pose = object_pose
+                logger.debug("\033[94mcamera pose: \033[0m%s", object_pose)
+            else:
+                self.response_data.object_pose.append(object_pose)
+            self.object_dimension_flag = 0
+
+        return message
+
+    def decode_end(self):
+        # print list of object poses
+        if self.response_data.object_pose:
+            logger.debug("\033[94mobject pose: \033[0m%s", self.response_data.object_pose)
+
+    def decode_waypoints(self, data, number_of_waypoints):
+        # view received trajectory segment as structured array without copying
+        waypoints = np.frombuffer(data, dtype=WAYPOINT_DTYPE, count=number_of_waypoints)
+        # check received joint values - all waypoints at once
+        joint_sum = waypoints['joints'].sum(axis=1, dtype=np.float64)
+        if np.any(np.abs(joint_sum - waypoints['checksum']) > 0.01):
+            raise PhoChecksumError('Wrong joints sum', self.request_id)
+        return waypoints
+
+
+class RobotRequestResponseCommunication:
     def __init__(self):
-        self.active_request = 0  # variable to check, if old request has finished and new one can be called
+        self.response_data = ResponseData()  # create object for storing data
+        self.active_request = 0  # last sent request, 0 when no request is waiting for response
+        self.pending = {}  # outstanding requests - response ID -> deque of PhoRequestHandle
+        self.partial = None  # messages of response left partially read by a stopped stream
+        self.current_handle = None  # request whose response is being received - already removed from pending
         self.client = None
+        self.transport = None  # buffered framing over self.client
+        self.requests = RequestEncoder()  # request frames are packed into one reusable buffer
+        self.decoder = ResponseDecoder(self.response_data)
         self.message = None
         self.print_messages = True  # True -> prints messages , False -> doesnt print messages
-
-    def connect_to_server(self, CONTROLLER_IP, PORT):
-        self.client = socket.socket()
-        self.client.connect((str(CONTROLLER_IP), PORT))
+        self.metrics = ProtocolMetrics(request_name)  # latency histograms and counters per request
+        self.address = None  # (CONTROLLER_IP, PORT) of the last connection
+        self.reconnect_policy = None  # ReconnectPolicy - None -> connection errors are raised
+        self.reconnecting = False
+        self.reconnects = 0
+        self.running_solution = None  # solution started by this client - restored after reconnect
+
+    def connect_to_server(self, CONTROLLER_IP, PORT, reconnect=None):
+        # reconnect - ReconnectPolicy, lost connection is then re-established automatically
+        self.address = (str(CONTROLLER_IP), PORT)
+        self.reconnect_policy = reconnect
+        self.pho_open_connection()
+
+    def pho_open_connection(self):
+        timeout = self.reconnect_policy.connect_timeout if self.reconnect_policy is not None else None
+        self.client = socket.create_connection(self.address, timeout)
+        self.client.settimeout(None)
+        if self.reconnect_policy is not None:
+            self.reconnect_policy.apply_keepalive(self.client)
+        recorder = self.transport.recorder if self.transport is not None else None
+        self.transport = PhoTransport(self.client)
+        self.transport.recorder = recorder  # recording continues over the new connection
         msg = bytearray(BRAND_IDENTIFICATION.encode('utf-8'))
-        self.client.send(msg)
+        self.transport.send(msg)
+
+    def pho_reconnect(self):
+        # new connection with handshake - attempts are repeated with backoff, running solution is started again
+        self.reconnecting = True
+        error = None
+        try:
+            for delay in self.reconnect_policy.delays():
+                time.sleep(delay)
+                try:
+                    self.transport.close()
+                    self.pho_open_connection()
+                    if self.reconnect_policy.restore_solution and self.running_solution is not None:
+                        self.pho_request_solution_start(self.running_solution)
+                except OSError as exception:
+                    error = exception
+                    self.pending.clear()  # solution start of failed attempt
+                    self.current_handle = None
+                    logger.warning("Reconnect to %s:%s failed: %s", self.address[0], self.address[1], exception)
+                    continue
+                self.reconnects += 1
+                logger.warning("Reconnected to %s:%s", self.address[0], self.address[1])
+                return
+        finally:
+            self.reconnecting = False
+        raise ConnectionError("Reconnect to vision controller failed") from error
+
+    def pho_connection_lost(self, error):
+        # requests waiting for response will never get it - they fail with ConnectionError, connection is reopened
+        if self.reconnect_policy is None or self.reconnecting:
+            raise error
+        logger.warning("Connection lost: %s", error)
+        self.pho_fail_pending(PhoConnectionLost("Connection lost before response was received: " + str(error)))
+        self.pho_reconnect()
+
+    def pho_fail_pending(self, exception):
+        # responses of waiting requests will not be received - their result() raises exception
+        handles = [handle for handles in self.pending.values() for handle in handles]
+        if self.current_handle is not None and not self.current_handle.finished:
+            handles.append(self.current_handle)  # connection lost in the middle of its response
+        for handle in handles:
+            handle.exception = exception
+            handle.finished = True
+        self.pending.clear()
+        self.current_handle = None
+        self.partial = None
+        self.active_request = 0
+
+    def pho_resync(self, error):
+        # position in the stream is lost - received data is discarded (or connection reopened) and all
+        # waiting requests fail with error, the connection is usable afterwards
+        log_error(str(error))
+        if self.reconnect_policy is not None and not self.reconnecting:
+            self.pho_fail_pending(error)
+            self.pho_reconnect()
+        else:
+            dropped = self.transport.discard()
+            logger.warning("Resynchronized - %d bytes discarded", dropped)
+            self.pho_fail_pending(error)
+        error.resynchronized = True
+
+    def pho_skip_messages(self, number_of_messages):
+        # read rest of response without decoding - subheaders give the size of every payload
+        for message_count in range(number_of_messages):
+            received_subheader = self.transport.recv_exact(SUBHEADER_SIZE)
+            message_type, payload_size, bytes_to_read = self.decoder.decode_subheader(received_subheader)
+            self.transport.recv_exact(bytes_to_read)
 
     def close_connection(self):
-        self.client.close()
+        self.stop_recording()
+        self.transport.close()
+
+    def start_recording(self, path):
+        # capture raw byte stream between robot and vision controller into file
+        self.stop_recording()
+        self.transport.recorder = SessionRecorder(path)
+
+    def stop_recording(self):
+        if self.transport is not None and self.transport.recorder is not None:
+            self.transport.recorder.close()
+            self.transport.recorder = None
+
+    def connect_to_capture(self, path, realtime=False):
+        # responses are read from capture file instead of vision controller, requests are not sent anywhere
+        self.transport = PhoTransport(ReplaySocket(CaptureFile(path), RECEIVED, realtime))
+
+    def replay_capture(self, path, realtime=False):
+        # feed recorded session through decoder - yields PhoRequestHandle of every recorded response,
+        # capture file is closed when the replay ends
+        self.connect_to_capture(path, realtime)
+        requests = self.transport.sock.capture.records(SENT)
+        data = None
+        try:
+            for timestamp, direction, data in requests:
+                if len(data) < HEADER.size or bytes(data[0:12]) != PHO_HEADER:
+                    continue  # hello string
+                payload_size, request_id = struct.unpack_from("<ii", data, 12)
+                payload = bytes(data[HEADER.size:]) if payload_size else None
+                self.pho_submit_request(request_id, payload)
+            data = None  # view into the mapped file
+            while any(self.pending.values()):
+                yield self.pho_dispatch_response()
+        finally:
+            data = None
+            requests.close()
+            self.close_connection()
 
     # -------------------------------------------------------------------
     #                      BIN PICKING REQUESTS
     # -------------------------------------------------------------------
+    # every request has a *_nowait variant - it returns PhoRequestHandle right after sending,
+    # the response is collected later with handle.result()
     def pho_request_binpicking_init(self, vs_id, start, end):
-        payload = struct.pack("i", vs_id)  # payload - vision system ID
-        payload = payload + floatArray2bytes(start)  # payload - robot start pose
-        payload = payload + floatArray2bytes(end)  # payload - robot end pose
-        self.pho_send_request(ActionRequest.PHO_BINPICKING_INITIALIZATION, payload)
-        self.pho_receive_response(ActionRequest.PHO_BINPICKING_INITIALIZATION)
+        return self.pho_request_binpicking_init_nowait(vs_id, start, end, self.response_data).result()
+
+    def pho_request_binpicking_init_nowait(self, vs_id, start, end, response_data=None):
+        # payload - vision system ID, robot start pose, robot end pose
+        return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_INITIALIZATION, response_data,
+                                     VS_ID_START_END, vs_id, *start, *end)
 
     def pho_request_binpicking_scan(self, vs_id, tool_pose=None):
-        if tool_pose is None:
-            payload = struct.pack("i", vs_id)  # payload - vision system ID
-            self.pho_send_request(ActionRequest.PHO_BINPICKING_SCAN, payload)
+        self.pho_request_binpicking_scan_nowait(vs_id, tool_pose, self.response_data)
 
-        else:
-            payload = struct.pack("i", vs_id)  # payload - vision system id
-            payload = payload + floatArray2bytes(tool_pose)  # payload - robot pose
-            self.pho_send_request(ActionRequest.PHO_BINPICKING_SCAN, payload)
+    def pho_request_binpicking_scan_nowait(self, vs_id, tool_pose=None, response_data=None):
+        if tool_pose is None:  # payload - vision system ID
+            return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_SCAN, response_data, VS_ID, vs_id)
+        # payload - vision system ID, robot pose
+        return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_SCAN, response_data, VS_ID_POSE, vs_id, *tool_pose)
 
     def pho_request_binpicking_trigger_scan(self, vs_id, tool_pose=None):
-        if tool_pose is None:
-            payload = struct.pack("i", vs_id)  # payload - vision system ID
-            self.pho_send_request(ActionRequest.PHO_BINPICKING_TRIGGER_SCAN, payload)
-        else:
-            payload = struct.pack("i", vs_id)  # payload - vision system id
-            payload = payload + floatArray2bytes(tool_pose)  # payload - robot pose
-            self.pho_send_request(ActionRequest.PHO_BINPICKING_TRIGGER_SCAN, payload)
+        self.pho_request_binpicking_trigger_scan_nowait(vs_id, tool_pose, self.response_data)
+
+    def pho_request_binpicking_trigger_scan_nowait(self, vs_id, tool_pose=None, response_data=None):
+        if tool_pose is None:  # payload - vision system ID
+            return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_TRIGGER_SCAN, response_data, VS_ID, vs_id)
+        # payload - vision system ID, robot pose
+        return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_TRIGGER_SCAN, response_data,
+                                     VS_ID_POSE, vs_id, *tool_pose)
 
     def pho_request_binpicking_localize_on_the_last_scan(self, vs_id, tool_pose=None):
-        if tool_pose is None:
-            payload = struct.pack("i", vs_id)  # payload - vision system ID
-            self.pho_send_request(ActionRequest.PHO_BINPICKING_LOCALIZE_ON_THE_LAST_SCAN, payload)
-        else:
-            payload = struct.pack("i", vs_id)  # payload - vision system id
-            payload = payload + floatArray2bytes(tool_pose)  # payload - robot pose
-            self.pho_send_request(ActionRequest.PHO_BINPICKING_LOCALIZE_ON_THE_LAST_SCAN, payload)
+        self.pho_request_binpicking_localize_on_the_last_scan_nowait(vs_id, tool_pose, self.response_data)
+
+    def pho_request_binpicking_localize_on_the_last_scan_nowait(self, vs_id, tool_pose=None, response_data=None):
+        if tool_pose is None:  # payload - vision system ID
+            return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_LOCALIZE_ON_THE_LAST_SCAN, response_data,
+                                         VS_ID, vs_id)
+        # payload - vision system ID, robot pose
+        return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_LOCALIZE_ON_THE_LAST_SCAN, response_data,
+                                     VS_ID_POSE, vs_id, *tool_pose)
 
     def pho_binpicking_wait_for_scan(self):
-        self.pho_receive_response(ActionRequest.PHO_BINPICKING_SCAN)
-        self.active_request = 0  # request finished - response from request received
+        return self.pho_receive_response(ActionRequest.PHO_BINPICKING_SCAN)
 
     def pho_request_binpicking_trajectory(self, vs_id):
-        payload = struct.pack("i", vs_id)  # payload - vision system ID
-        self.pho_send_request(ActionRequest.PHO_BINPICKING_TRAJECTORY, payload)
-        self.pho_receive_response(ActionRequest.PHO_BINPICKING_TRAJECTORY)
+        return self.pho_request_binpicking_trajectory_nowait(vs_id, self.response_data).result()
+
+    def pho_request_binpicking_trajectory_nowait(self, vs_id, response_data=None):
+        # payload - vision system ID
+        return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_TRAJECTORY, response_data, VS_ID, vs_id)
 
     def pho_request_binpicking_pick_failed(self, vs_id):
-        payload = struct.pack("i", vs_id)  # payload - vision system ID
-        self.pho_send_request(ActionRequest.PHO_BINPICKING_PICK_FAILED, payload)
-        self.pho_receive_response(ActionRequest.PHO_BINPICKING_PICK_FAILED)
+        return self.pho_request_binpicking_pick_failed_nowait(vs_id, self.response_data).result()
+
+    def pho_request_binpicking_pick_failed_nowait(self, vs_id, response_data=None):
+        # payload - vision system ID
+        return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_PICK_FAILED, response_data, VS_ID, vs_id)
 
     def pho_request_binpicking_object_pose(self, vs_id):
-        payload = struct.pack("i", vs_id)  # payload - vision system ID
-        self.pho_send_request(ActionRequest.PHO_BINPICKING_OBJECT_POSE, payload)
-        self.pho_receive_response(ActionRequest.PHO_BINPICKING_OBJECT_POSE)
+        return self.pho_request_binpicking_object_pose_nowait(vs_id, self.response_data).result()
+
+    def pho_request_binpicking_object_pose_nowait(self, vs_id, response_data=None):
+        # payload - vision system ID
+        return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_OBJECT_POSE, response_data, VS_ID, vs_id)
 
     def pho_request_binpicking_change_scene_status(self, scene_status_id):
-        payload = struct.pack("i", scene_status_id)  # payload - status scene ID
-        self.pho_send_request(ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS, payload)
-        self.pho_receive_response(ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS)
+        return self.pho_request_binpicking_change_scene_status_nowait(scene_status_id, self.response_data).result()
+
+    def pho_request_binpicking_change_scene_status_nowait(self, scene_status_id, response_data=None):
+        # payload - status scene ID
+        return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS, response_data,
+                                     VS_ID, scene_status_id)
 
     def pho_request_binpicking_get_vision_system_status(self, vs_id):
-        payload = struct.pack("i", vs_id)  # payload - vision system id
-        self.pho_send_request(ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS, payload)
-        self.pho_receive_response(ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS)
+        return self.pho_request_binpicking_get_vision_system_status_nowait(vs_id, self.response_data).result()
+
+    def pho_request_binpicking_get_vision_system_status_nowait(self, vs_id, response_data=None):
+        # payload - vision system id
+        return self.pho_submit_frame(ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS, response_data, VS_ID, vs_id)
 
     # -------------------------------------------------------------------
     #                      LOCATOR REQUESTS
@@ -278,265 +704,294 @@ class RobotRequestResponseCommunication:
 
     # parameter tool_pose used only in Hand-eye
     def pho_request_locator_scan(self, vs_id, tool_pose=None):
-        if tool_pose is None:
-            payload = struct.pack("i", vs_id)  # payload - vision system id
-            self.pho_send_request(ActionRequest.PHO_LOCATOR_SCAN, payload)
-        else:
-            if len(tool_pose) != 7:
-                print('Wrong tool_pose size')
-                sys.exit()
-            payload = struct.pack("i", vs_id)  # payload - vision system id
-            payload = payload + floatArray2bytes(tool_pose)  # payload - tool pose
-            self.pho_send_request(ActionRequest.PHO_LOCATOR_SCAN, payload)
+        self.pho_request_locator_scan_nowait(vs_id, tool_pose, self.response_data)
+
+    def pho_request_locator_scan_nowait(self, vs_id, tool_pose=None, response_data=None):
+        if tool_pose is None:  # payload - vision system ID
+            return self.pho_submit_frame(ActionRequest.PHO_LOCATOR_SCAN, response_data, VS_ID, vs_id)
+        if len(tool_pose) != 7:
+            raise PhoRequestError('Wrong tool_pose size')
+        # payload - vision system ID, tool pose
+        return self.pho_submit_frame(ActionRequest.PHO_LOCATOR_SCAN, response_data, VS_ID_POSE, vs_id, *tool_pose)
 
     def pho_locator_wait_for_scan(self):
-        self.pho_receive_response(ActionRequest.PHO_LOCATOR_SCAN)
-        self.active_request = 0  # request finished - response from request received
+        return self.pho_receive_response(ActionRequest.PHO_LOCATOR_SCAN)
 
     def pho_request_locator_trigger_scan(self, vs_id, tool_pose=None):
-        if tool_pose is None:
-            payload = struct.pack("i", vs_id)  # payload - vision system ID
-            self.pho_send_request(ActionRequest.PHO_LOCATOR_TRIGGER_SCAN, payload)
-        else:
-            payload = struct.pack("i", vs_id)  # payload - vision system id
-            payload = payload + floatArray2bytes(tool_pose)  # payload - robot pose
-            self.pho_send_request(ActionRequest.PHO_LOCATOR_TRIGGER_SCAN, payload)
+        self.pho_request_locator_trigger_scan_nowait(vs_id, tool_pose, self.response_data)
+
+    def pho_request_locator_trigger_scan_nowait(self, vs_id, tool_pose=None, response_data=None):
+        if tool_pose is None:  # payload - vision system ID
+            return self.pho_submit_frame(ActionRequest.PHO_LOCATOR_TRIGGER_SCAN, response_data, VS_ID, vs_id)
+        # payload - vision system ID, robot pose
+        return self.pho_submit_frame(ActionRequest.PHO_LOCATOR_TRIGGER_SCAN, response_data,
+                                     VS_ID_POSE, vs_id, *tool_pose)
 
     def pho_request_locator_localize_on_the_last_scan(self, vs_id, tool_pose=None):
-        if tool_pose is None:
-            payload = struct.pack("i", vs_id)  # payload - vision system ID
-            self.pho_send_request(ActionRequest.PHO_LOCATOR_LOCALIZE_ON_THE_LAST_SCAN, payload)
-        else:
-            payload = struct.pack("i", vs_id)  # payload - vision system id
-            payload = payload + floatArray2bytes(tool_pose)  # payload - robot pose
-            self.pho_send_request(ActionRequest.PHO_LOCATOR_LOCALIZE_ON_THE_LAST_SCAN, payload)
+        self.pho_request_locator_localize_on_the_last_scan_nowait(vs_id, tool_pose, self.response_data)
+
+    def pho_request_locator_localize_on_the_last_scan_nowait(self, vs_id, tool_pose=None, response_data=None):
+        if tool_pose is None:  # payload - vision system ID
+            return self.pho_submit_frame(ActionRequest.PHO_LOCATOR_LOCALIZE_ON_THE_LAST_SCAN, response_data,
+                                         VS_ID, vs_id)
+        # payload - vision system ID, robot pose
+        return self.pho_submit_frame(ActionRequest.PHO_LOCATOR_LOCALIZE_ON_THE_LAST_SCAN, response_data,
+                                     VS_ID_POSE, vs_id, *tool_pose)
 
     def pho_request_locator_get_objects(self, vs_id, number_of_objects):
-        payload = struct.pack("ii", vs_id, number_of_objects)  # payload - vision system id, number of objects
-        self.pho_send_request(ActionRequest.PHO_LOCATOR_GET_OBJECTS, payload)
-        self.pho_receive_response(ActionRequest.PHO_LOCATOR_GET_OBJECTS)
+        return self.pho_request_locator_get_objects_nowait(vs_id, number_of_objects, self.response_data).result()
+
+    def pho_request_locator_get_objects_nowait(self, vs_id, number_of_objects, response_data=None):
+        # payload - vision system id, number of objects
+        return self.pho_submit_frame(ActionRequest.PHO_LOCATOR_GET_OBJECTS, response_data,
+                                     SOL_ID_VS_ID, vs_id, number_of_objects)
+
+    def pho_request_locator_get_objects_stream(self, vs_id, number_of_objects):
+        # request is sent now, returned generator yields LocatedObject as soon as it is received
+        handle = self.pho_request_locator_get_objects_nowait(vs_id, number_of_objects)
+        return self.pho_stream_objects(handle)
 
     def pho_request_locator_get_vision_system_status(self, vs_id):
-        payload = struct.pack("i", vs_id)  # payload - vision system id
-        self.pho_send_request(ActionRequest.PHO_LOCATOR_GET_VISION_SYSTEM_STATUS, payload)
-        self.pho_receive_response(ActionRequest.PHO_LOCATOR_GET_VISION_SYSTEM_STATUS)
+        return self.pho_request_locator_get_vision_system_status_nowait(vs_id, self.response_data).result()
+
+    def pho_request_locator_get_vision_system_status_nowait(self, vs_id, response_data=None):
+        # payload - vision system id
+        return self.pho_submit_frame(ActionRequest.PHO_LOCATOR_GET_VISION_SYSTEM_STATUS, response_data, VS_ID, vs_id)
 
     # -------------------------------------------------------------------
     #                      CALIBRATION REQUESTS
     # -------------------------------------------------------------------
     def pho_request_calibration_add_point(self, tool_pose=None):
+        return self.pho_request_calibration_add_point_nowait(tool_pose, self.response_data).result()
+
+    def pho_request_calibration_add_point_nowait(self, tool_pose=None, response_data=None):
         if tool_pose is None:
-            self.pho_send_request(ActionRequest.PHO_CALIBRATION_ADD_POINT)
-            self.pho_receive_response(ActionRequest.PHO_CALIBRATION_ADD_POINT)
-        else:
-            payload = floatArray2bytes(tool_pose)  # payload - robot pose
-            self.pho_send_request(ActionRequest.PHO_CALIBRATION_ADD_POINT, payload)
-            self.pho_receive_response(ActionRequest.PHO_CALIBRATION_ADD_POINT)
+            return self.pho_submit_frame(ActionRequest.PHO_CALIBRATION_ADD_POINT, response_data)
+        # payload - robot pose
+        return self.pho_submit_frame(ActionRequest.PHO_CALIBRATION_ADD_POINT, response_data, POSE, *tool_pose)
 
     def pho_request_calibration_start(self, sol_id, vs_id):
-        payload = struct.pack("ii", sol_id, vs_id)  # payload - solution id, vision system id
-        self.pho_send_request(ActionRequest.PHO_CALIBRATION_START_AUTOMATIC, payload)
-        self.pho_receive_response(ActionRequest.PHO_CALIBRATION_START_AUTOMATIC)
+        return self.pho_request_calibration_start_nowait(sol_id, vs_id, self.response_data).result()
+
+    def pho_request_calibration_start_nowait(self, sol_id, vs_id, response_data=None):
+        # payload - solution id, vision system id
+        return self.pho_submit_frame(ActionRequest.PHO_CALIBRATION_START_AUTOMATIC, response_data,
+                                     SOL_ID_VS_ID, sol_id, vs_id)
 
     def pho_request_calibration_save(self):
-        self.pho_send_request(ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC)
-        self.pho_receive_response(ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC)
+        return self.pho_request_calibration_save_nowait(self.response_data).result()
+
+    def pho_request_calibration_save_nowait(self, response_data=None):
+        return self.pho_submit_frame(ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC, response_data)
 
     def pho_request_calibration_stop(self):
-        self.pho_send_request(ActionRequest.PHO_CALIBRATION_STOP_AUTOMATIC)
-        self.pho_receive_response(ActionRequest.PHO_CALIBRATION_STOP_AUTOMATIC)
+        return self.pho_request_calibration_stop_nowait(self.response_data).result()
+
+    def pho_request_calibration_stop_nowait(self, response_data=None):
+        return self.pho_submit_frame(ActionRequest.PHO_CALIBRATION_STOP_AUTOMATIC, response_data)
 
     # -------------------------------------------------------------------
     #                      SOLUTION REQUESTS
     # -------------------------------------------------------------------
     def pho_request_solution_change(self, sol_id):
-        payload = struct.pack("i", sol_id)  # payload - vision system id
-        self.pho_send_request(ActionRequest.PHO_SOLUTION_CHANGE, payload)
-        self.pho_receive_response(ActionRequest.PHO_SOLUTION_CHANGE)
+        return self.pho_request_solution_change_nowait(sol_id, self.response_data).result()
+
+    def pho_request_solution_change_nowait(self, sol_id, response_data=None):
+        # payload - vision system id
+        return self.pho_submit_frame(ActionRequest.PHO_SOLUTION_CHANGE, response_data, VS_ID, sol_id)
 
     def pho_request_solution_start(self, sol_id):
-        payload = struct.pack("i", sol_id)  # payload - vision system id
-        self.pho_send_request(ActionRequest.PHO_SOLUTION_START, payload)
-        self.pho_receive_response(ActionRequest.PHO_SOLUTION_START)
+        return self.pho_request_solution_start_nowait(sol_id, self.response_data).result()
+
+    def pho_request_solution_start_nowait(self, sol_id, response_data=None):
+        self.running_solution = sol_id
+        # payload - vision system id
+        return self.pho_submit_frame(ActionRequest.PHO_SOLUTION_START, response_data, VS_ID, sol_id)
 
     def pho_request_solution_stop(self):
-        self.pho_send_request(ActionRequest.PHO_SOLUTION_STOP)
-        self.pho_receive_response(ActionRequest.PHO_SOLUTION_STOP)
+        return self.pho_request_solution_stop_nowait(self.response_data).result()
+
+    def pho_request_solution_stop_nowait(self, response_data=None):
+        self.running_solution = None
+        return self.pho_submit_frame(ActionRequest.PHO_SOLUTION_STOP, response_data)
 
     def pho_request_solution_get_running(self):
-        self.pho_send_request(ActionRequest.PHO_SOLUTION_GET_RUNNING)
-        self.pho_receive_response(ActionRequest.PHO_SOLUTION_GET_RUNNING)
+        return self.pho_request_solution_get_running_nowait(self.response_data).result()
+
+    def pho_request_solution_get_running_nowait(self, response_data=None):
+        return self.pho_submit_frame(ActionRequest.PHO_SOLUTION_GET_RUNNING, response_data)
 
     def pho_request_solution_get_available(self):
-        self.pho_send_request(ActionRequest.PHO_SOLUTION_GET_AVAILABLE)
-        self.pho_receive_response(ActionRequest.PHO_SOLUTION_GET_AVAILABLE)
+        return self.pho_request_solution_get_available_nowait(self.response_data).result()
+
+    def pho_request_solution_get_available_nowait(self, response_data=None):
+        return self.pho_submit_frame(ActionRequest.PHO_SOLUTION_GET_AVAILABLE, response_data)
 
     # -------------------------------------------------------------------
     #                     REQUEST RELATED FUNCTIONS
     # -------------------------------------------------------------------
 
-    def pho_send_request(self, request_id, payload=None):
-        print("Sending request \033[35m" + request_name[request_id] + "\033[0m")
-        if self.active_request != 0:
-            print(
-                "\033[31mCannot send request " + request_name[request_id] + " because previous request " + request_name[
-                    self.active_request] + " is not finished \033[0m")
-            sys.exit()
-
+    def pho_submit_request(self, request_id, payload=None, response_data=None):
+        if response_data is None:
+            response_data = ResponseData()  # separate storage - result must not be overwritten by other requests
+        return self.pho_send_request(request_id, payload, response_data)
+
+    def pho_submit_frame(self, request_id, response_data=None, layout=None, *values):
+        # request frame packed into reusable buffer of the client - it is sent before the buffer is used again
+        if response_data is None:
+            response_data = ResponseData()
+        return self.pho_send_frame(request_id, self.requests.request(request_id, layout, *values), response_data)
+
+    def pho_send_request(self, request_id, payload=None, response_data=None):
+        return self.pho_send_frame(request_id, pho_build_request(request_id, payload), response_data)
+
+    def pho_send_frame(self, request_id, frame, response_data=None):
+        # send request and register it as outstanding - response is matched by request ID
+        logger.info("Sending request \033[35m%s\033[0m", request_name[request_id])
+        if response_data is None:
+            response_data = self.response_data
+        handle = PhoRequestHandle(self, request_id, response_data)
+        handle.sent_time = time.perf_counter()
+        try:
+            self.transport.send(frame)
+        except OSError as error:
+            # request was not delivered - it is sent again over the new connection
+            self.pho_connection_lost(error)
+            handle.sent_time = time.perf_counter()
+            self.transport.send(frame)
+        flight_recorder.record(SENT, request_name[request_id], frame)
+        self.metrics.record_request(request_id, len(frame))
         self.active_request = request_id
-        msg = PHO_HEADER  # header - PHO
-        if payload is not None:
-            msg = msg + struct.pack("ii", int(len(payload) / PACKET_SIZE),
-                                    request_id)  # header - payload size, request ID
-            msg = msg + bytearray(payload)  # payload
-        else:
-            msg = msg + struct.pack("ii", 0, request_id)  # header - payload size, request ID
-        self.client.send(bytearray(msg))
+        self.pending.setdefault(handle.response_id, deque()).append(handle)
+        return handle
 
     def pho_receive_response(self, required_id):
-        # receive header
-        received_header = self.client.recv(HEADER_SIZE)
-        request_id = int.from_bytes(received_header[0:3], "little")
-        number_of_messages = int.from_bytes(received_header[4:7], "little")
-
-        # Accept BINPICKING TRIGGER_SCAN as REQUEST_SCAN
-        if request_id == 28 or request_id == 29: request_id = 1
-        # Accept LOCATOR TRIGGER_SCAN as REQUEST_SCAN
-        if request_id == 30 or request_id == 31: request_id = 19
-
-        #check received header size
-        if len(received_header) != HEADER_SIZE:
-            print('\033[31mWrong header size\033[0m')
-            sys.exit()
-
-        # check request ID
-        header = ResponseHeader(request_id, number_of_messages)
-        if header.request_id != required_id:
-            print('\033[31mWrong request id received\033[0m')
-            sys.exit()
-
-        if request_id == ActionRequest.PHO_BINPICKING_TRAJECTORY: self.response_data.init_trajectory_data()  # empty variable for receiving new trajectory
-
-        # clear response_data variables
-        self.response_data.init_response_data()
-
-
+        # wait for the oldest outstanding request with required_id
+        if not self.pending.get(required_id):
+            raise PhoRequestError("No request " + request_name[required_id] + " is waiting for response")
+        return self.pending[required_id][0].result()
+
+    def pho_dispatch_response(self):
+        # receive one response and hand it over to the request it belongs to
+        try:
+            self.pho_drain()
+            messages = self.pho_receive_messages()
+            while True:
+                try:
+                    next(messages)
+                except StopIteration as stop:
+                    return stop.value
+        except OSError as error:
+            self.pho_connection_lost(error)
+
+    def pho_drain(self):
+        # finish response left partially read by a stopped stream - called before any other response is read
+        while self.partial is not None:
+            messages, self.partial = self.partial, None
+            for _ in messages:
+                pass
+
+    def pho_receive_messages(self):
+        # generator receiving one response - yields handle after the header and after every decoded message,
+        # returns handle once the whole response is received
+        while True:
+            received_header = self.transport.recv_exact(HEADER_SIZE)
+            header_time = time.perf_counter()
+            flight_recorder.record(RECEIVED, "header", received_header)
+            response_id = pho_response_id(int.from_bytes(received_header[0:3], "little"))
+            if self.pending.get(response_id):
+                break
+            # response nobody waits for - skipped, the next response is read correctly
+            log_error(str(PhoRequestIdError('Wrong request id received - no request ' + str(response_id) +
+                                            ' is waiting', response_id)))
+            try:
+                self.pho_skip_messages(int.from_bytes(received_header[4:7], "little"))
+            except PhoProtocolError as exception:
+                self.pho_resync(exception)
+                raise
+        handle = self.current_handle = self.pending[response_id].popleft()
+        self.decoder.response_data = handle.response_data
+        header = self.decoder.decode_header(received_header, response_id)
+        yield handle
+
+        bytes_received = HEADER_SIZE
+        waypoints = 0
+        errors = 0
+        error = None  # first error of the response - rest of the response is read without decoding
         for message_count in range(header.sub_headers):
-            received_subheader = self.client.recv(SUBHEADER_SIZE)
-            message_type = int.from_bytes(received_subheader[0:3], "little")
-            operation_number = int.from_bytes(received_subheader[4:7], "little")
-            payload_size = int.from_bytes(received_subheader[8:11], "little")
-            # check received subheader size
-            if len(received_subheader) != SUBHEADER_SIZE:
-                print('\033[31mWrong subheader size\033[0m')
-                sys.exit()
-
-
+            received_subheader = self.transport.recv_exact(SUBHEADER_SIZE)
+            flight_recorder.record(RECEIVED, "subheader", received_subheader)
+            try:
+                message_type, payload_size, bytes_to_read = self.decoder.decode_subheader(received_subheader)
+            except PhoProtocolError as exception:
+                # size of payload is unknown - stream cannot be followed
+                self.pending.setdefault(response_id, deque()).appendleft(handle)
+                self.current_handle = None
+                self.pho_resync(exception)
+                return handle
+            data = self.transport.recv_exact(bytes_to_read)
+            flight_recorder.record(RECEIVED, "payload", data)
+            if error is None:
+                try:
+                    self.message = self.decoder.decode_message(message_type, payload_size, data)
+                except PhoProtocolError as exception:
+                    log_error(str(exception))
+                    error = exception
+                    error.resynchronized = True
+            bytes_received += SUBHEADER_SIZE + bytes_to_read
             if message_type == MessageType.PHO_TRAJECTORY_CNT or message_type == MessageType.PHO_TRAJECTORY_FINE:
-                if self.response_data.segment_id >= len(
-                        self.response_data.trajectory_data):  self.response_data.add_segment()
-                waypoints = ()
-                waypoint_size = 2 * PACKET_SIZE + NUMBER_OF_JOINTS * PACKET_SIZE
-                for iterator in range(payload_size):
-                    data = self.client.recv(waypoint_size)
-                    waypoint_id = struct.unpack('<i', data[0:4])[0]
-                    waypoint = struct.unpack(f'<{NUMBER_OF_JOINTS}f', data[4:(4*NUMBER_OF_JOINTS+4)])
-                    check_sum = struct.unpack('<f', data[(4*NUMBER_OF_JOINTS+4):(4*NUMBER_OF_JOINTS+8)])[0]
-                    joint_sum = sum(waypoint)
-                    # check received joint values
-                    if abs(joint_sum - check_sum) > 0.01:
-                        print('\033[31mWrong joints sum\033[0m')
-                        sys.exit()
-                    waypoints = waypoints + waypoint
-                    self.response_data.add_waypoint(self.response_data.segment_id,
-                                                    waypoint)  # add waypoint to the actual segment of trajectory-
-                self.response_data.segment_id += 1  # increment to switch to another segment of trajectory
-                self.message = waypoints
-                # print data stored in trajectory data
-                if self.response_data.print_message == 1: print('\033[94m' + "trajectory: " + '\033[0m' + str(self.response_data.trajectory_data))
-                #self.print_message(message_type)
-            elif message_type == MessageType.PHO_GRIPPER:
-                bytes_to_read = payload_size * PACKET_SIZE
-                data = self.client.recv(bytes_to_read)
-                self.response_data.gripper_command.append(int(data[0]))  # store gripper command
-                self.message = data
-                if self.response_data.print_message == 1: print('\033[94m' + "gripper commands: " + '\033[0m' + str(self.response_data.gripper_command))
-                #self.print_message(message_type)
+                waypoints += payload_size
             elif message_type == MessageType.PHO_ERROR:
-                bytes_to_read = payload_size * PACKET_SIZE  # bytes_to_read = payload_size * PACKET_SIZE
-                data = self.client.recv(bytes_to_read)
-                error_code = int.from_bytes(data, "little")
-                self.message = error_code
-                self.response_data.error = error_code
-                if self.response_data.print_message == 1: print('\033[94m' + "error message: " + '\033[0m' + str(self.response_data.error))
-                #self.print_message(message_type)
-            elif message_type == MessageType.PHO_INFO:
-                data = self.client.recv(payload_size * PACKET_SIZE)
-                self.message = data
-                data_size = int((len(data) + 1) / 4)
-                info_list = []
-                for iterator in range(data_size):
-                    info = int.from_bytes(self.message[0 + iterator * PACKET_SIZE:3 + iterator * PACKET_SIZE], "little")
-                    info_list.append(info)
-                # TRAJECTORY - BPS
-                if request_id == ActionRequest.PHO_BINPICKING_TRAJECTORY:
-                    self.response_data.gripping_info.append(info_list)
-                    if self.response_data.print_message == 1: print('\033[94m' + "gripping info: " + '\033[0m' + str(self.response_data.gripping_info))
-                # OBJECT POSE - BPS
-                elif request_id == ActionRequest.PHO_BINPICKING_OBJECT_POSE:
-                    if object_dimension_flag == 0:
-                        self.response_data.dimensions = info_list
-                        if self.response_data.print_message == 1: print('\033[94m' + "dimensions: " + '\033[0m' + str(self.response_data.dimensions))
-                    elif object_dimension_flag == 1:
-                        self.response_data.zheight_angle = info_list
-                        if self.response_data.print_message == 1: print('\033[94m' + "z-height/angle: " + '\033[0m' + str(self.response_data.zheight_angle))
-                    object_dimension_flag = 1
-                # GET VISION SYSTEM STATUS
-                elif request_id == ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS:
-                    self.response_data.status_data = info_list
-                    if self.response_data.print_message == 1: print('\033[94m' + "status data: " + '\033[0m' + str(self.response_data.status_data))
-                # GET OBJECTS - LS
-                elif request_id == ActionRequest.PHO_LOCATOR_GET_OBJECTS:
-                    if object_dimension_flag == 0:
-                        self.response_data.dimensions.append(info_list)
-                        if self.response_data.print_message == 1: print('\033[94m' + "dimensions: " + '\033[0m' + str(self.response_data.dimensions))
-                    elif object_dimension_flag == 1:
-                        self.response_data.zheight_angle.append(info_list)
-                        if self.response_data.print_message == 1: print('\033[94m' + "z-height/angle: " + '\033[0m' + str(self.response_data.zheight_angle))
-                    object_dimension_flag = 1
-                elif request_id == ActionRequest.PHO_LOCATOR_GET_VISION_SYSTEM_STATUS:
-                    self.response_data.status_data = info_list
-                    if self.response_data.print_message == 1: print('\033[94m' + "status data: " + '\033[0m' + str(self.response_data.status_data))
-                elif request_id == ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC:
-                    self.response_data.calib_data = info_list
-                    if self.response_data.print_message == 1: print('\033[94m' + "calibration data: " + '\033[0m' + str(self.response_data.calib_data))
-                elif request_id == ActionRequest.PHO_SOLUTION_GET_RUNNING:
-                    self.response_data.running_solution = info_list
-                    if self.response_data.print_message == 1: print('\033[94m' + "running solution: " + '\033[0m' + str(self.response_data.running_solution))
-                elif request_id == ActionRequest.PHO_SOLUTION_GET_AVAILABLE:
-                    self.response_data.available_solution.append(info_list)
-                    if self.response_data.print_message == 1: print('\033[94m' + "available solution: " + '\033[0m' + str(self.response_data.available_solution))
-                # self.print_message(message_type)
-            elif message_type == MessageType.PHO_OBJECT_POSE:
-                data = self.client.recv(payload_size * PACKET_SIZE)
-                object_pose = struct.unpack(f'<{CARTES_POSE_LEN}f', data)
-                self.message = object_pose
-                if request_id == ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC:
-                    self.response_data.camera_pose = object_pose
-                    print('\033[94m' + "camera pose: " + '\033[0m' + str(self.response_data.camera_pose))
-                else:
-                    self.response_data.object_pose.append(object_pose)
-                object_dimension_flag = 0
-                # self.print_message(message_type)
-            else:
-                print('\033[31mUnexpected operation type\033[0m')
-                sys.exit()
-
-        # print list of object poses
-        if self.response_data.print_message == 1 and self.response_data.object_pose:
-            print('\033[94m' + "object pose: "+ '\033[0m' + str(self.response_data.object_pose))
-
-        self.active_request = 0  # request finished - response from request received
+                errors += 1
+            yield handle
+
+        self.decoder.decode_end()
+        self.current_handle = None
+        handle.finished = True
+        handle.finished_time = time.perf_counter()
+        handle.exception = error
+        # first byte latency is measured when the header is read - responses of nowait requests read later are longer
+        self.metrics.record_response(handle.request_id, header_time - handle.sent_time,
+                                     handle.finished_time - handle.sent_time, bytes_received, header.sub_headers,
+                                     waypoints, errors)
+        if not any(self.pending.values()):
+            self.active_request = 0  # all requests finished - responses received
+        return handle
+
+    def pho_poll_responses(self):
+        # dispatch responses which are already available - does not wait for new ones
+        if self.partial is not None and self.transport.readable():
+            self.pho_drain()
+        while any(self.pending.values()) and self.transport.readable():
+            self.pho_dispatch_response()
+
+    def pho_stream_objects(self, handle):
+        # generator yielding LocatedObject as soon as its pose, dimensions and z-height/angle are decoded,
+        # when the caller stops early the rest of the response is drained before the next response is read
+        located = 0  # objects already yielded
+        while not handle.finished:
+            try:
+                self.pho_drain()
+                messages = self.pho_receive_messages()
+                if next(messages) is not handle:
+                    for _ in messages:  # response of older request
+                        pass
+                    continue
+                data = handle.response_data
+                self.partial = messages  # drained by the next request if the caller stops iterating
+                for _ in messages:
+                    if len(data.zheight_angle) > located:
+                        yield LocatedObject.from_response_data(data, located)
+                        located += 1
+                self.partial = None
+            except OSError as error:
+                self.pho_connection_lost(error)
+        if handle.exception is not None:
+            raise handle.exception
+        # objects without z-height/angle and objects of response received before iteration started
+        data = handle.response_data
+        for index in range(located, len(data.object_pose)):
+            yield LocatedObject.from_response_data(data, index)
 
     def print_message(self, operation_type):
         if self.print_messages is not True:
@@ -561,8 +1016,7 @@ class RobotRequestResponseCommunication:
             for iterator in range(data_size):
                 # check received message size
                 if len(self.message) != data_size * PACKET_SIZE:
-                    print('\033[31mWrong message size\033[0m')
-                    sys.exit()
+                    raise PhoProtocolError('Wrong message size')
                 info = int.from_bytes(self.message[0 + iterator * PACKET_SIZE:3 + iterator * PACKET_SIZE], "little")
                 print('\033[94m' + "INFO: " + '\033[0m' + "[" + str(info) + "]")
         elif operation_type == MessageType.PHO_OBJECT_POSE:
@@ -582,21 +1036,51 @@ class RobotRequestResponseCommunication:
 #                     OTHER FUNCTIONS
 # -------------------------------------------------------------------
 
+def pho_response_id(request_id):
+    # Accept BINPICKING TRIGGER_SCAN as REQUEST_SCAN
+    if request_id == 28 or request_id == 29: request_id = 1
+    # Accept LOCATOR TRIGGER_SCAN as REQUEST_SCAN
+    if request_id == 30 or request_id == 31: request_id = 19
+    return request_id
+
+
+def pho_result(response_id, response_data):
+    # typed result of received response - arrays are not shared with response_data used for next responses
+    return result_type.get(response_id, PhoResult).from_response_data(response_id, response_data)
+
+
+def pho_build_request(request_id, payload=None):
+    if payload is None:
+        return HEADER.pack(*PHO, 0, request_id)  # header - PHO, payload size, request ID
+    return HEADER.pack(*PHO, len(payload) // PACKET_SIZE, request_id) + payload  # header + payload
+
+
 def floatArray2bytes(array):
-    msg = []
-    for value in array:
-        msg = msg + list(struct.pack('<f', value))
-    return bytearray(msg)
+    return pack_floats(array)
 
 
 # -------------------------------------------------------------------
 #                      STATE SERVER FUNCTIONS
 # -------------------------------------------------------------------
 
+class StreamStatistics:  # timing of state streaming
+    def __init__(self, rate):
+        self.rate = rate  # requested rate [Hz]
+        self.ticks = 0  # number of sent state frames
+        self.missed_deadlines = 0  # number of skipped ticks - frame was not sent in its period
+        self.max_lateness = 0.0  # worst delay of send after its deadline [s]
+
+
 class RobotStateCommunication:
     def __init__(self):
         self.client = None
         self.server = None
+        self.stream_statistics = None
+        self.encoder = FrameEncoder(JOINT_STATE_TYPE, TOOL_POSE_TYPE)  # frames are packed into one reusable buffer
+        self.recorder = None  # SessionRecorder - captures sent frames when set
+        self.publisher = None  # StatePublisher - latest state in shared memory when set
+        self.publisher_lock = threading.Lock()  # serve_state thread publishes while another thread may close
+        self.joint_state = None  # joints of the last joint state frame - published with the next tool pose
 
     def create_server(self, ROBOT_CONTROLLER_IP, PORT):
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -604,26 +1088,276 @@ class RobotStateCommunication:
         self.server.bind((ROBOT_CONTROLLER_IP, PORT))
         # Listen for incoming connections
         self.server.listen(1)
-        print('Server is running, waiting for client...')
+        logger.info('Server is running, waiting for client...')
 
     def wait_for_client(self):
         self.client, client_address = self.server.accept()
-        print('Connection established...')
+        self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # do not delay small state frames
+        set_keepalive(self.client)  # dead client is detected in seconds
+        logger.info('Connection established...')
         # Send hello string
         msg = bytearray(BRAND_IDENTIFICATION_SERVER.encode('utf-8'))
         self.client.send(msg)
 
     def close_connection(self):
-        self.server.close()
+        self.stop_recording()
+        self.server.close()  # stops serve_state waiting for client
+        self.stop_publishing()
+
+    # frames are memoryviews of encoder buffer - valid only until the next frame is built
+    def joint_state_frame(self):
+        self.joint_state = get_joint_state(init_joint_state)
+        return self.encoder.joint_state(self.joint_state)
+
+    def tool_pose_frame(self):
+        tool_pose = get_tool_pose(base_quat)
+        if self.publisher is not None:
+            self.publish(self.joint_state if self.joint_state is not None else get_joint_state(init_joint_state),
+                         tool_pose)
+        self.joint_state = None
+        return self.encoder.tool_pose(tool_pose)
+
+    def state_frame(self):
+        joint_state = get_joint_state(init_joint_state)
+        tool_pose = get_tool_pose(base_quat)
+        if self.publisher is not None:
+            self.publish(joint_state, tool_pose)
+        return self.encoder.state(joint_state, tool_pose)
+
+    def publish_state(self):
+        # sample state into shared memory only - no client is connected
+        self.publish(get_joint_state(init_joint_state), get_tool_pose(base_quat))
+
+    def publish(self, joint_state, tool_pose):
+        with self.publisher_lock:
+            if self.publisher is not None:
+                self.publisher.publish(joint_state, tool_pose)
+
+    def start_publishing(self, name=None, ring_size=RING_SIZE):
+        # every sent state is also published into shared memory - local readers attach StateReader(name),
+        # serve_state keeps publishing while no client is connected, returns name of shared memory block
+        self.stop_publishing()
+        self.publisher = StatePublisher(name, ring_size)
+        return self.publisher.name
+
+    def stop_publishing(self):
+        with self.publisher_lock:
+            if self.publisher is not None:
+                self.publisher.close()
+                self.publisher = None
+
+    def start_recording(self, path):
+        # capture sent state frames into file
+        self.stop_recording()
+        self.recorder = SessionRecorder(path)
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def send_frame(self, frame):
+        self.client.sendall(frame)
+        if self.recorder is not None:
+            self.recorder.record(SENT, frame)
 
     def send_joint_state(self):
-        msg = deepcopy(PHO_HEADER)
-        msg = msg + struct.pack("ii", NUMBER_OF_JOINTS, JOINT_STATE_TYPE)  # Data size, Type
-        msg = msg + floatArray2bytes(get_joint_state(init_joint_state))
-        self.client.send(bytearray(msg))
+        self.send_frame(self.joint_state_frame())
 
     def send_tool_pose(self):
-        msg = deepcopy(PHO_HEADER)
-        msg = msg + struct.pack("ii", 7, TOOL_POSE_TYPE)  # Data size, Type
-        msg = msg + floatArray2bytes(get_tool_pose(base_quat))
-        self.client.send(bytearray(msg))
+        self.send_frame(self.tool_pose_frame())
+
+    def send_state(self):
+        # joint state and tool pose coalesced into one send
+        self.send_frame(self.state_frame())
+
+    def stream_state(self, rate=100, number_of_ticks=None):
+        # send state at fixed rate against monotonic deadlines - send time does not shift the schedule
+        period = 1.0 / rate
+        self.stream_statistics = StreamStatistics(rate)
+        deadline = time.monotonic()
+        while (number_of_ticks is None or self.stream_statistics.ticks < number_of_ticks) and self.has_clients():
+            now = time.monotonic()
+            if now < deadline:
+                time.sleep(deadline - now)
+                now = time.monotonic()
+            lateness = now - deadline
+            if lateness >= period:
+                # deadline missed - skip lost ticks instead of sending a burst
+                missed = int(lateness / period)
+                self.stream_statistics.missed_deadlines += missed
+                deadline += missed * period
+                lateness -= missed * period
+            self.stream_statistics.max_lateness = max(self.stream_statistics.max_lateness, lateness)
+
+            self.send_state()
+            self.stream_statistics.ticks += 1
+            deadline += period
+        return self.stream_statistics
+
+    def serve_state(self, rate=100, number_of_clients=None):
+        # stream state to one client after another - when client drops, reconnecting client is accepted at once
+        served = 0
+        while number_of_clients is None or served < number_of_clients:
+            if self.publisher is not None and not self.publish_until_client(rate):
+                return  # server closed
+            self.wait_for_client()
+            served += 1
+            try:
+                self.stream_state(rate)
+            except OSError as error:
+                logger.warning('Communication lost: %s. Waiting for client to reconnect...', error)
+            self.client.close()
+            logger.info("Sent frames: %d, missed deadlines: %d", self.stream_statistics.ticks,
+                        self.stream_statistics.missed_deadlines)
+
+    def has_clients(self):
+        return True  # lost client is detected by failed send
+
+    def publish_until_client(self, rate=100):
+        # local readers of shared memory get state at rate also before the first client and after a drop,
+        # returns True when client is connecting, False when server was closed
+        period = 1.0 / rate
+        deadline = time.monotonic()
+        while self.server.fileno() != -1:
+            self.publish_state()
+            deadline = max(deadline + period, time.monotonic())  # missed ticks are skipped
+            try:
+                if select.select([self.server], [], [], max(deadline - time.monotonic(), 0))[0]:
+                    return self.server.fileno() != -1
+            except (OSError, ValueError):  # closed while waiting
+                return False
+        return False
+
+
+class StateSubscriber:  # one client of MultiClientRobotStateCommunication
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.buffer = bytearray()  # frames not yet accepted by the socket
+        self.skipped_frames = 0  # consecutive frames skipped because the client is slow
+
+
+class MultiClientRobotStateCommunication(RobotStateCommunication):  # state server for many clients
+    def __init__(self, max_buffer=65536, max_skipped_frames=100):
+        super().__init__()
+        self.selector = selectors.DefaultSelector()
+        self.subscribers = {}  # socket -> StateSubscriber
+        self.max_buffer = max_buffer  # above this amount of unsent bytes frames for client are skipped
+        self.max_skipped_frames = max_skipped_frames  # client is dropped after this many skipped frames in a row
+        self.accepted = 0  # number of accepted clients
+
+    def create_server(self, ROBOT_CONTROLLER_IP, PORT, backlog=16):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((ROBOT_CONTROLLER_IP, PORT))
+        # Listen for incoming connections
+        self.server.listen(backlog)
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ)
+        logger.info('Server is running, waiting for clients...')
+
+    def wait_for_client(self):
+        # block until at least one client is connected
+        while not self.subscribers:
+            self.poll(None)
+
+    def has_clients(self):
+        return bool(self.subscribers)
+
+    def serve_state(self, rate=100, number_of_clients=None):
+        # stream state while at least one client is connected - clients connect and leave at any time,
+        # serving ends when number_of_clients were accepted and all of them left
+        while number_of_clients is None or self.accepted < number_of_clients or self.subscribers:
+            if self.publisher is not None and not self.subscribers and not self.publish_until_client(rate):
+                return  # server closed
+            self.wait_for_client()
+            self.stream_state(rate)  # until the last client leaves
+            logger.info("Sent frames: %d, missed deadlines: %d", self.stream_statistics.ticks,
+                        self.stream_statistics.missed_deadlines)
+
+    def close_connection(self):
+        self.stop_recording()
+        self.stop_publishing()
+        for sock in list(self.subscribers):
+            if self.subscribers[sock].buffer:
+                self.flush(self.subscribers[sock])  # last attempt to deliver queued frames
+            if sock in self.subscribers:
+                self.remove_subscriber(sock)
+        self.selector.unregister(self.server)
+        self.server.close()
+
+    def accept_client(self):
+        try:
+            sock, client_address = self.server.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # do not delay small state frames
+        subscriber = StateSubscriber(sock, client_address)
+        self.subscribers[sock] = subscriber
+        self.accepted += 1
+        self.selector.register(sock, selectors.EVENT_READ)
+        logger.info('Connection established with %s', client_address)
+        # Send hello string
+        self.queue_frame(subscriber, BRAND_IDENTIFICATION_SERVER.encode('utf-8'))
+
+    def remove_subscriber(self, sock):
+        subscriber = self.subscribers.pop(sock)
+        self.selector.unregister(sock)
+        sock.close()
+        logger.info('Connection closed with %s', subscriber.address)
+
+    def poll(self, timeout=0):
+        # accept new clients, detect closed ones and flush pending data - never blocks with timeout=0
+        for key, events in self.selector.select(timeout):
+            sock = key.fileobj
+            if sock is self.server:
+                self.accept_client()
+                continue
+            if sock not in self.subscribers:
+                continue
+            if events & selectors.EVENT_READ:
+                try:
+                    data = sock.recv(4096)  # clients are not expected to send anything
+                except OSError:
+                    data = b''
+                if not data:
+                    self.remove_subscriber(sock)
+                    continue
+            if events & selectors.EVENT_WRITE:
+                self.flush(self.subscribers[sock])
+
+    def flush(self, subscriber):
+        try:
+            sent = subscriber.sock.send(subscriber.buffer)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.remove_subscriber(subscriber.sock)
+            return
+        del subscriber.buffer[:sent]
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if subscriber.buffer else selectors.EVENT_READ
+        self.selector.modify(subscriber.sock, events)
+
+    def queue_frame(self, subscriber, frame):
+        if len(subscriber.buffer) > self.max_buffer:
+            # slow client - downsample by skipping whole frames, drop it when it does not recover
+            subscriber.skipped_frames += 1
+            if subscriber.skipped_frames > self.max_skipped_frames:
+                logger.warning('\033[31mClient %s is too slow\033[0m', subscriber.address)
+                self.remove_subscriber(subscriber.sock)
+            return
+        subscriber.skipped_frames = 0
+        was_empty = not subscriber.buffer
+        subscriber.buffer += frame
+        if was_empty:
+            self.flush(subscriber)
+
+    def send_frame(self, frame):
+        # frame is encoded once and queued for every client
+        self.poll()
+        for subscriber in list(self.subscribers.values()):
+            self.queue_frame(subscriber, frame)
+        if self.recorder is not None:
+            self.recorder.record(SENT, frame)
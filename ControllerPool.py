@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+from CommunicationLibrary import RobotRequestResponseCommunication
+
+
+class RobotControllerPool:  # persistent connections to several vision controllers
+    def __init__(self):
+        self.controllers = {}  # controller name -> connected RobotRequestResponseCommunication
+        self.bins = []  # (controller name, vs_id) - one vision system per bin
+
+    def add_controller(self, name, CONTROLLER_IP, PORT, vs_ids=(1,)):
+        robot = RobotRequestResponseCommunication()  # object is created
+        robot.connect_to_server(CONTROLLER_IP, PORT)  # connection with BRAND_IDENTIFICATION handshake
+        self.controllers[name] = robot
+        for vs_id in vs_ids:
+            self.bins.append((name, vs_id))
+
+    def close_connection(self):
+        for robot in self.controllers.values():
+            robot.close_connection()
+        self.controllers = {}
+        self.bins = []
+
+    def fan_out(self, request):
+        # request(robot, vs_id) has to return PhoRequestHandle - all requests are sent first,
+        # then typed results are collected, so total time follows the slowest controller
+        handles = {}
+        for name, vs_id in self.bins:
+            handles[(name, vs_id)] = request(self.controllers[name], vs_id)
+        return {key: handle.result() for key, handle in handles.items()}
+
+    def fan_out_controllers(self, request):
+        # request(robot) is sent once per controller, results are keyed by controller name
+        handles = {name: request(robot) for name, robot in self.controllers.items()}
+        return {name: handle.result() for name, handle in handles.items()}
+
+    # -------------------------------------------------------------------
+    #                      BIN PICKING REQUESTS
+    # -------------------------------------------------------------------
+    def pho_request_binpicking_scan(self, tool_pose=None):
+        return self.fan_out(lambda robot, vs_id: robot.pho_request_binpicking_scan_nowait(vs_id, tool_pose))
+
+    def pho_request_binpicking_trajectory(self):
+        return self.fan_out(lambda robot, vs_id: robot.pho_request_binpicking_trajectory_nowait(vs_id))
+
+    def pho_request_binpicking_get_vision_system_status(self):
+        return self.fan_out(lambda robot, vs_id: robot.pho_request_binpicking_get_vision_system_status_nowait(vs_id))
+
+    # -------------------------------------------------------------------
+    #                      LOCATOR REQUESTS
+    # -------------------------------------------------------------------
+    def pho_request_locator_scan(self, tool_pose=None):
+        return self.fan_out(lambda robot, vs_id: robot.pho_request_locator_scan_nowait(vs_id, tool_pose))
+
+    def pho_request_locator_get_objects(self, number_of_objects):
+        return self.fan_out(
+            lambda robot, vs_id: robot.pho_request_locator_get_objects_nowait(vs_id, number_of_objects))
+
+    def pho_request_locator_scan_and_get_objects(self, number_of_objects, tool_pose=None):
+        # scan every bin concurrently, then ask every bin for located objects
+        self.pho_request_locator_scan(tool_pose)
+        return self.pho_request_locator_get_objects(number_of_objects)
+
+    def pho_request_locator_get_vision_system_status(self):
+        return self.fan_out(lambda robot, vs_id: robot.pho_request_locator_get_vision_system_status_nowait(vs_id))
+
+    # -------------------------------------------------------------------
+    #                      SOLUTION REQUESTS
+    # -------------------------------------------------------------------
+    def pho_request_solution_start(self, sol_id):
+        return self.fan_out_controllers(lambda robot: robot.pho_request_solution_start_nowait(sol_id))
+
+    def pho_request_solution_stop(self):
+        return self.fan_out_controllers(lambda robot: robot.pho_request_solution_stop_nowait())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+import socket
+import struct
+import threading
+import time
+import numpy as np
+from CommunicationLibrary import ActionRequest, MessageType, BRAND_IDENTIFICATION, NUMBER_OF_JOINTS, CARTES_POSE_LEN, \
+    WAYPOINT_DTYPE, PACKET_SIZE, pho_response_id
+
+MOCK_IP = "127.0.0.1"
+PORT = 11003
+REQUEST_HEADER_SIZE = 20  # P, H, O, payload size, request ID
+
+
+class MockVisionController:  # local stand-in for Photoneo vision controller speaking PHO protocol
+    def __init__(self, trajectory_segments=4, waypoints_per_segment=50, number_of_objects=5, scan_delay=0.0,
+                 response_delay=0.0, errors=None, seed=None):
+        self.trajectory_segments = trajectory_segments  # segments of trajectory response
+        self.waypoints_per_segment = waypoints_per_segment  # waypoints in every segment
+        self.number_of_objects = number_of_objects  # maximum number of located objects
+        self.scan_delay = scan_delay  # duration of scan requests [s]
+        self.response_delay = response_delay  # delay of every other response [s]
+        self.errors = errors or {}  # request ID -> error code sent with the response
+        self.rng = np.random.default_rng(seed)
+        self.running_solution = 0
+        self.calibration_points = 0
+        self.trajectory = None  # trajectory messages are generated once and sent for every request
+        self.server = None
+        self.thread = None
+        self.clients = []
+
+    def start(self, MOCK_IP=MOCK_IP, PORT=0):
+        # PORT 0 -> free port is chosen, returns (IP, port) to connect to
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((MOCK_IP, PORT))
+        self.server.listen(8)
+        self.thread = threading.Thread(target=self.accept_loop, daemon=True)
+        self.thread.start()
+        return self.server.getsockname()
+
+    def stop(self):
+        self.server.close()
+        for client in self.clients:
+            client.close()
+
+    def accept_loop(self):
+        while True:
+            try:
+                client, client_address = self.server.accept()
+            except OSError:
+                return  # server closed
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.clients.append(client)
+            threading.Thread(target=self.serve_client, args=(client,), daemon=True).start()
+
+    def serve_client(self, client):
+        try:
+            recv_exact(client, len(BRAND_IDENTIFICATION))  # hello string of robot
+            while True:
+                header = recv_exact(client, REQUEST_HEADER_SIZE)
+                payload_size, request_id = struct.unpack("<ii", header[12:20])
+                payload = recv_exact(client, payload_size * PACKET_SIZE)
+                client.sendall(self.response(request_id, payload))
+        except (ConnectionError, OSError):
+            client.close()
+
+    # -------------------------------------------------------------------
+    #                      RESPONSES
+    # -------------------------------------------------------------------
+    def response(self, request_id, payload):
+        scan = pho_response_id(request_id) in (ActionRequest.PHO_BINPICKING_SCAN, ActionRequest.PHO_LOCATOR_SCAN)
+        time.sleep(self.scan_delay if scan else self.response_delay)
+
+        messages = []
+        if request_id == ActionRequest.PHO_BINPICKING_TRAJECTORY:
+            if self.trajectory is None:
+                self.trajectory = self.trajectory_messages()
+            messages = list(self.trajectory)
+        elif request_id == ActionRequest.PHO_BINPICKING_OBJECT_POSE:
+            messages = self.object_messages(1)
+        elif request_id == ActionRequest.PHO_LOCATOR_GET_OBJECTS:
+            vs_id, number_of_objects = struct.unpack("<ii", payload[0:8])
+            messages = self.object_messages(min(number_of_objects, self.number_of_objects))
+        elif request_id in (ActionRequest.PHO_BINPICKING_GET_VISION_SYSTEM_STATUS,
+                            ActionRequest.PHO_LOCATOR_GET_VISION_SYSTEM_STATUS):
+            messages = [info_message([1, 0, 0, 0])]  # status data
+        elif request_id == ActionRequest.PHO_CALIBRATION_START_AUTOMATIC:
+            self.calibration_points = 0
+        elif request_id == ActionRequest.PHO_CALIBRATION_ADD_POINT:
+            self.calibration_points += 1
+        elif request_id == ActionRequest.PHO_CALIBRATION_SAVE_AUTOMATIC:
+            messages = [info_message([self.calibration_points, 0]),  # calibration data
+                        pose_message([500.0, 0.0, 1000.0, 0.0, 1.0, 0.0, 0.0])]  # camera pose
+        elif request_id in (ActionRequest.PHO_SOLUTION_START, ActionRequest.PHO_SOLUTION_CHANGE):
+            self.running_solution = struct.unpack("<i", payload[0:4])[0]
+        elif request_id == ActionRequest.PHO_SOLUTION_STOP:
+            self.running_solution = 0
+        elif request_id == ActionRequest.PHO_SOLUTION_GET_RUNNING:
+            messages = [info_message([self.running_solution])]
+        elif request_id == ActionRequest.PHO_SOLUTION_GET_AVAILABLE:
+            messages = [info_message([sol_id]) for sol_id in (252, 253, 254)]
+
+        if request_id in self.errors:
+            messages.append(message(MessageType.PHO_ERROR, struct.pack("<i", self.errors[request_id])))
+        return struct.pack("<iii", request_id, len(messages), 0) + b"".join(messages)
+
+    def trajectory_messages(self):
+        messages = []
+        for segment in range(self.trajectory_segments):
+            waypoints = np.zeros(self.waypoints_per_segment, dtype=WAYPOINT_DTYPE)
+            waypoints['id'] = np.arange(self.waypoints_per_segment)
+            waypoints['joints'] = self.rng.uniform(-np.pi, np.pi, (self.waypoints_per_segment, NUMBER_OF_JOINTS))
+            waypoints['checksum'] = waypoints['joints'].sum(axis=1, dtype=np.float64)
+            message_type = MessageType.PHO_TRAJECTORY_FINE if segment % 2 else MessageType.PHO_TRAJECTORY_CNT
+            messages.append(message(message_type, waypoints.tobytes(), self.waypoints_per_segment))
+            if segment == 1:
+                messages.append(message(MessageType.PHO_GRIPPER, struct.pack("<i", 1)))  # close gripper
+        messages.append(info_message([1, 2, 3]))  # gripping info
+        return messages
+
+    def object_messages(self, number_of_objects):
+        messages = []
+        for object_id in range(number_of_objects):
+            position = self.rng.uniform(-500, 500, 3)
+            messages.append(pose_message(list(position) + [1.0, 0.0, 0.0, 0.0]))  # object pose
+            messages.append(info_message([100, 50, 20]))  # dimensions
+            messages.append(info_message([int(position[2]) & 0xffff, 0]))  # z-height/angle
+        return messages
+
+
+# -------------------------------------------------------------------
+#                     OTHER FUNCTIONS
+# -------------------------------------------------------------------
+
+def recv_exact(client, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = client.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('Connection closed by peer')
+        data += chunk
+    return bytes(data)
+
+
+def message(message_type, payload, payload_size=None):
+    # subheader (type, operation number, payload size) + payload
+    if payload_size is None:
+        payload_size = len(payload) // PACKET_SIZE
+    return struct.pack("<iii", message_type, 0, payload_size) + payload
+
+
+def info_message(values):
+    return message(MessageType.PHO_INFO, struct.pack(f"<{len(values)}i", *values))
+
+
+def pose_message(pose):
+    return message(MessageType.PHO_OBJECT_POSE, struct.pack(f"<{CARTES_POSE_LEN}f", *pose))
+
+
+if __name__ == "__main__":  # if main
+    controller = MockVisionController()
+    print('Mock vision controller is running on ' + str(controller.start(MOCK_IP, PORT)))
+    controller.thread.join()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import time
+from PhoErrors import PhoRequestError
+
+# multi-view acquisition - every view is triggered as soon as the robot arrives at its pose,
+# localization runs on the accumulated views right after the last one is captured
+
+
+class ViewTiming:  # timing of one view [s]
+    __slots__ = ("view", "tool_pose", "move", "acquisition")
+
+    def __init__(self, view, tool_pose, move):
+        self.view = view  # index of view
+        self.tool_pose = tool_pose
+        self.move = move  # time spent in pose iterable - robot moving to the pose
+        self.acquisition = None  # trigger sent -> acquisition acknowledged
+
+    def __repr__(self):
+        return "ViewTiming(" + ", ".join(slot + "=" + repr(getattr(self, slot)) for slot in self.__slots__) + ")"
+
+
+class MultiviewScan:  # multi-view scan over RobotRequestResponseCommunication
+    def __init__(self, robot, vs_id, solution="locator"):
+        self.robot = robot  # connected RobotRequestResponseCommunication
+        self.vs_id = vs_id
+        if solution == "locator":
+            self.trigger_scan = robot.pho_request_locator_trigger_scan_nowait
+            self.localize = robot.pho_request_locator_localize_on_the_last_scan_nowait
+        elif solution == "binpicking":
+            self.trigger_scan = robot.pho_request_binpicking_trigger_scan_nowait
+            self.localize = robot.pho_request_binpicking_localize_on_the_last_scan_nowait
+        else:
+            raise ValueError("Unknown solution: " + str(solution))
+        self.timings = []  # ViewTiming of every view of the last scan
+        self.localization = None  # PhoRequestHandle of localization after the last view
+        self.duration = 0.0  # first pose received -> last view acquired
+
+    def run(self, tool_poses, wait_for_acquisition=True):
+        # tool_poses is iterable yielding tool pose when robot arrives at it - e.g. generator moving the robot,
+        # wait_for_acquisition=True -> the iterable is not advanced before view is acquired (robot must not move),
+        # False -> triggers are streamed and acknowledgements are collected as they come (static camera, robot
+        # synchronized on its own), returns ViewTiming of every view
+        self.timings = []
+        self.localization = None
+        handles = []
+        start = time.perf_counter()
+        iterator = iter(tool_poses)
+        while True:
+            move_start = time.perf_counter()
+            tool_pose = next(iterator, None)
+            if tool_pose is None:
+                break
+            timing = ViewTiming(len(self.timings), tool_pose, time.perf_counter() - move_start)
+            handle = self.trigger_scan(self.vs_id, tool_pose)
+            self.timings.append(timing)
+            handles.append(handle)
+            if wait_for_acquisition:
+                handle.result()
+            else:
+                self.robot.pho_poll_responses()  # collect acknowledgements which already arrived
+
+        for timing, handle in zip(self.timings, handles):
+            handle.result()
+            timing.acquisition = handle.finished_time - handle.sent_time
+        self.duration = time.perf_counter() - start
+        if self.timings:
+            # localization on accumulated views - no extra acquisition at the last pose
+            self.localization = self.localize(self.vs_id, self.timings[-1].tool_pose)
+        return self.timings
+
+    def get_objects(self, number_of_objects):
+        # LOCATOR - objects located in the multi-view scan, request is pipelined behind the localization
+        self.check_localization()
+        handle = self.robot.pho_request_locator_get_objects_nowait(self.vs_id, number_of_objects)
+        self.localization.result()
+        return handle.result()
+
+    def trajectory(self):
+        # BINPICKING - trajectory for object located in the multi-view scan, pipelined behind the localization
+        self.check_localization()
+        handle = self.robot.pho_request_binpicking_trajectory_nowait(self.vs_id)
+        self.localization.result()
+        return handle.result()
+
+    def check_localization(self):
+        if self.localization is None:
+            raise PhoRequestError("No multi-view scan was localized - run() did not get any tool pose")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import numpy as np
+from PhoCodec import CARTES_POSE_LEN
+from PoseMath import pose_to_matrix, matrix_to_pose, invert_transform
+
+# located objects as one (N, CARTES_POSE_LEN) array - x, y, z, quaternion [w, x, y, z],
+# conversion to matrices and transforms into robot frames are done for all objects at once
+
+
+class ObjectPoses:  # poses of located objects with rotation matrices computed on first use
+    __slots__ = ("poses", "matrix_cache")
+
+    def __init__(self, poses):
+        self.poses = np.asarray(poses, dtype=float).reshape(-1, CARTES_POSE_LEN)
+        self.matrix_cache = None
+
+    @classmethod
+    def from_matrices(cls, matrices):
+        return cls(matrix_to_pose(matrices))
+
+    def __len__(self):
+        return len(self.poses)
+
+    def __getitem__(self, index):
+        # index, slice, index array or boolean mask -> ObjectPoses
+        if not isinstance(index, slice) and np.ndim(index) == 0:
+            index = [index]
+        objects = ObjectPoses(self.poses[index])
+        if self.matrix_cache is not None:
+            objects.matrix_cache = self.matrix_cache[index]
+        return objects
+
+    @property
+    def positions(self):
+        return self.poses[:, :3]
+
+    @property
+    def quaternions(self):
+        return self.poses[:, 3:]
+
+    @property
+    def matrices(self):
+        # (N, 4, 4) homogeneous transforms
+        if self.matrix_cache is None:
+            self.matrix_cache = pose_to_matrix(self.poses)
+        return self.matrix_cache
+
+    @property
+    def approach_axes(self):
+        # (N, 3) z-axis of every object
+        return self.matrices[:, :3, 2]
+
+    def transform(self, matrix):
+        # matrix (4, 4) or (N, 4, 4) applied from the left - poses expressed in the frame of matrix
+        matrices = np.asarray(matrix, dtype=float) @ self.matrices
+        objects = ObjectPoses.from_matrices(matrices)
+        objects.matrix_cache = matrices
+        return objects
+
+    def distances(self, point):
+        # (N,) distance of every object from point
+        return np.linalg.norm(self.positions - np.asarray(point, dtype=float), axis=1)
+
+    def order_by(self, key, descending=False):
+        # objects sorted by key - (N,) array, e.g. distances(point) or positions[:, 2]
+        order = np.argsort(key, kind="stable")
+        return self[order[::-1] if descending else order]
+
+    def __repr__(self):
+        return "ObjectPoses(" + repr(self.poses) + ")"
+
+
+class FrameTransforms:  # transforms from camera frame into robot frames for one calibration
+    cache = {}  # (camera pose, hand_eye) -> FrameTransforms
+
+    def __init__(self, camera_pose, hand_eye=False):
+        self.camera = pose_to_matrix(camera_pose)  # camera in robot base (extrinsic) or in tool (hand-eye)
+        self.hand_eye = hand_eye
+
+    @classmethod
+    def for_calibration(cls, calibration, hand_eye=False):
+        # calibration - CalibrationResult of calibration save, transforms are created once for every calibration
+        if calibration.camera_pose is None:
+            raise ValueError("Calibration result does not contain camera pose")
+        key = (np.asarray(calibration.camera_pose, dtype=float).tobytes(), hand_eye)
+        frames = cls.cache.get(key)
+        if frames is None:
+            frames = cls.cache[key] = cls(calibration.camera_pose, hand_eye)
+        return frames
+
+    def camera_to_base(self, tool_pose=None):
+        if not self.hand_eye:
+            return self.camera
+        if tool_pose is None:
+            raise ValueError("Tool pose of the scan is required for hand-eye calibration")
+        return pose_to_matrix(tool_pose) @ self.camera
+
+    def to_base(self, objects, tool_pose=None):
+        # ObjectPoses in camera frame -> robot base frame, tool_pose of the scan is required for hand-eye
+        return objects.transform(self.camera_to_base(tool_pose))
+
+    def to_tool(self, objects, tool_pose):
+        # ObjectPoses in camera frame -> tool frame at tool_pose
+        if self.hand_eye:
+            return objects.transform(self.camera)
+        return objects.transform(invert_transform(pose_to_matrix(tool_pose)) @ self.camera)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import struct
+
+# sizes
+NUMBER_OF_JOINTS = 6
+CARTES_POSE_LEN = 7
+
+# precompiled frame layouts - little endian, 4 bytes per item
+HEADER = struct.Struct("<3I2i")  # P, H, O, payload size, request ID / state type
+VS_ID = struct.Struct("<i")  # vision system ID (or solution ID, scene status ID)
+VS_ID_POSE = struct.Struct(f"<i{CARTES_POSE_LEN}f")  # vision system ID, tool pose
+VS_ID_START_END = struct.Struct(f"<i{2 * NUMBER_OF_JOINTS}f")  # vision system ID, start joints, end joints
+SOL_ID_VS_ID = struct.Struct("<ii")  # solution ID, vision system ID (or vision system ID, number of objects)
+POSE = struct.Struct(f"<{CARTES_POSE_LEN}f")  # tool pose
+JOINT_STATE_FRAME = struct.Struct(f"<3I2i{NUMBER_OF_JOINTS}f")  # header + joint state
+TOOL_POSE_FRAME = struct.Struct(f"<3I2i{CARTES_POSE_LEN}f")  # header + tool pose
+STATE_FRAME = struct.Struct(f"<3I2i{NUMBER_OF_JOINTS}f3I2i{CARTES_POSE_LEN}f")  # joint state + tool pose in one send
+
+PHO = (80, 72, 79)  # P, H, O
+
+# request layouts - payload struct of every request frame
+REQUEST_FRAMES = {layout: struct.Struct("<3I2i" + layout.format[1:]) for layout in
+                  (VS_ID, VS_ID_POSE, VS_ID_START_END, SOL_ID_VS_ID, POSE)}
+
+
+class FrameEncoder:  # builds state frames with pack_into over one reusable buffer
+    def __init__(self, joint_state_type, tool_pose_type):
+        self.joint_state_type = joint_state_type  # state types of state server (CommunicationLibrary)
+        self.tool_pose_type = tool_pose_type
+        self.buffer = bytearray(STATE_FRAME.size)
+        self.view = memoryview(self.buffer)
+
+    # returned memoryviews are valid only until the next call of the encoder
+
+    def joint_state(self, joints):
+        JOINT_STATE_FRAME.pack_into(self.buffer, 0, *PHO, NUMBER_OF_JOINTS, self.joint_state_type, *joints)
+        return self.view[:JOINT_STATE_FRAME.size]
+
+    def tool_pose(self, pose):
+        TOOL_POSE_FRAME.pack_into(self.buffer, 0, *PHO, CARTES_POSE_LEN, self.tool_pose_type, *pose)
+        return self.view[:TOOL_POSE_FRAME.size]
+
+    def state(self, joints, pose):
+        STATE_FRAME.pack_into(self.buffer, 0, *PHO, NUMBER_OF_JOINTS, self.joint_state_type, *joints,
+                              *PHO, CARTES_POSE_LEN, self.tool_pose_type, *pose)
+        return self.view[:STATE_FRAME.size]
+
+
+class RequestEncoder:  # builds request frames with pack_into over one reusable buffer
+    def __init__(self):
+        self.buffer = bytearray(max(frame.size for frame in REQUEST_FRAMES.values()))
+        self.view = memoryview(self.buffer)
+
+    def request(self, request_id, layout=None, *values):
+        # layout is one of the payload structs (VS_ID, VS_ID_POSE, ...), None for request without payload,
+        # returned memoryview is valid only until the next request is built
+        if layout is None:
+            HEADER.pack_into(self.buffer, 0, *PHO, 0, request_id)
+            return self.view[:HEADER.size]
+        frame = REQUEST_FRAMES[layout]
+        frame.pack_into(self.buffer, 0, *PHO, layout.size // 4, request_id, *values)
+        return self.view[:frame.size]
+
+
+float_arrays = {}  # number of floats -> precompiled struct
+
+
+def pack_floats(array):
+    # all floats packed with one call of struct cached for this length
+    layout = float_arrays.get(len(array))
+    if layout is None:
+        layout = float_arrays[len(array)] = struct.Struct(f"<{len(array)}f")
+    return layout.pack(*array)
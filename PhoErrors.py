@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+# exceptions of PHO protocol clients - protocol errors leave the connection usable whenever the rest
+# of the bad response can be skipped (resynchronized == True)
+
+
+class PhoError(Exception):  # base of all PHO protocol client errors
+    pass
+
+
+class PhoRequestError(PhoError, ValueError):  # request cannot be sent - wrong arguments or order of calls
+    pass
+
+
+class PhoRequestInProgress(PhoRequestError):  # previous request has not received its response yet
+    pass
+
+
+class PhoConnectionLost(PhoError, ConnectionError):  # connection dropped before the response was received
+    pass
+
+
+class PhoProtocolError(PhoError):  # received data does not match the protocol
+    def __init__(self, message, request_id=0):
+        super().__init__(message)
+        self.request_id = request_id  # request ID of the response being received, 0 if unknown
+        self.resynchronized = False  # True -> rest of the response was skipped, connection is usable
+
+
+class PhoHeaderError(PhoProtocolError):  # wrong size of header or subheader
+    pass
+
+
+class PhoRequestIdError(PhoProtocolError):  # response to request which is not waiting for it
+    pass
+
+
+class PhoMessageTypeError(PhoProtocolError):  # unknown message type - payload size cannot be determined
+    pass
+
+
+class PhoChecksumError(PhoProtocolError):  # joint values of trajectory do not match checksum
+    pass
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import logging
+import sys
+import time
+from collections import deque
+from SessionCapture import SENT, RECEIVED
+
+# levels - INFO shows requests and connection messages, DEBUG also every decoded message
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+DISABLED = logging.CRITICAL + 1
+
+FLIGHT_RECORDER_SIZE = 64  # number of recent frames kept for dump on error
+FRAME_SNIPPET = 64  # bytes of every frame kept in flight recorder
+
+
+
+class StdoutHandler(logging.StreamHandler):  # writes to current sys.stdout as print() - follows redirect_stdout
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+logger = logging.getLogger("pho")
+if not logger.handlers:
+    # messages go to stdout as print() did - application can reconfigure logger "pho"
+    handler = StdoutHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(INFO)
+    logger.propagate = False
+
+
+def set_log_level(level):
+    logger.setLevel(level)
+
+
+class FlightRecorder:  # ring buffer of recent frames - dumped when protocol error occurs
+    def __init__(self, size=FLIGHT_RECORDER_SIZE, snippet=FRAME_SNIPPET):
+        self.frames = deque(maxlen=size)  # (time, direction, description, first bytes of frame)
+        self.snippet = snippet
+
+    def record(self, direction, description, data=b""):
+        self.frames.append((time.monotonic(), direction, description, len(data), bytes(data[:self.snippet])))
+
+    def dump(self):
+        logger.error("\033[31mLast %d frames:\033[0m", len(self.frames))
+        for timestamp, direction, description, size, data in self.frames:
+            logger.error("%.6f %s %-24s %6d B  %s", timestamp, "->" if direction == SENT else "<-", description, size,
+                         data.hex(" ", 4))
+
+    def clear(self):
+        self.frames.clear()
+
+
+flight_recorder = FlightRecorder()
+
+
+def log_error(message):
+    # log protocol error together with frames which led to it
+    logger.error("\033[31m%s\033[0m", message)
+    flight_recorder.dump()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+from bisect import bisect_left
+
+# upper bounds of latency buckets [s] - last bucket is +Inf
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+
+
+class LatencyHistogram:  # fixed-bucket histogram - recording is one bisect and two additions
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def record(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q):
+        # upper bound of bucket containing q-th percentile (q in 0..100), None for empty histogram
+        if self.count == 0:
+            return None
+        required = q / 100 * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= required and count:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        return {"count": self.count, "sum": self.sum, "counts": list(self.counts),
+                "p50": self.percentile(50), "p99": self.percentile(99)}
+
+
+class RequestMetrics:  # metrics of one ActionRequest
+    def __init__(self):
+        self.first_byte = LatencyHistogram()  # send -> response header received
+        self.total = LatencyHistogram()  # send -> whole response received
+        self.requests = 0
+        self.responses = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.subheaders = 0
+        self.waypoints = 0
+        self.errors = 0  # PHO_ERROR messages
+
+    def snapshot(self):
+        return {"requests": self.requests, "responses": self.responses, "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received, "subheaders": self.subheaders, "waypoints": self.waypoints,
+                "errors": self.errors, "first_byte": self.first_byte.snapshot(), "total": self.total.snapshot()}
+
+
+class ProtocolMetrics:  # per request metrics of one client
+    def __init__(self, names=None):
+        self.names = names or {}  # request ID -> name used in exported metrics
+        self.requests = {}  # request ID -> RequestMetrics
+
+    def request(self, request_id):
+        metrics = self.requests.get(request_id)
+        if metrics is None:
+            metrics = self.requests[request_id] = RequestMetrics()
+        return metrics
+
+    def record_request(self, request_id, bytes_sent):
+        metrics = self.request(request_id)
+        metrics.requests += 1
+        metrics.bytes_sent += bytes_sent
+
+    def record_response(self, request_id, first_byte, total, bytes_received, subheaders, waypoints, errors):
+        metrics = self.request(request_id)
+        metrics.responses += 1
+        metrics.first_byte.record(first_byte)
+        metrics.total.record(total)
+        metrics.bytes_received += bytes_received
+        metrics.subheaders += subheaders
+        metrics.waypoints += waypoints
+        metrics.errors += errors
+
+    def snapshot(self):
+        return {self.names.get(request_id, str(request_id)): metrics.snapshot()
+                for request_id, metrics in self.requests.items()}
+
+    def prometheus_text(self, prefix="pho"):
+        # export in Prometheus text exposition format
+        lines = []
+        counters = ("requests", "responses", "bytes_sent", "bytes_received", "subheaders", "waypoints", "errors")
+        for counter in counters:
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            for request_id, metrics in self.requests.items():
+                lines.append(f'{prefix}_{counter}_total{{{self.label(request_id)}}} {getattr(metrics, counter)}')
+        for histogram in ("first_byte", "total"):
+            name = f"{prefix}_{histogram}_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for request_id, metrics in self.requests.items():
+                values = getattr(metrics, histogram)
+                label = self.label(request_id)
+                cumulative = 0
+                for bound, count in zip(values.buckets, values.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {values.count}')
+                lines.append(f'{name}_sum{{{label}}} {values.sum}')
+                lines.append(f'{name}_count{{{label}}} {values.count}')
+        return "\n".join(lines) + "\n"
+
+    def label(self, request_id):
+        return f'request="{self.names.get(request_id, str(request_id))}"'
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import random
+import socket
+
+# automatic reconnection - exponential backoff with jitter and TCP keep-alive probing of idle connections
+
+
+class ReconnectPolicy:
+    def __init__(self, initial_delay=0.05, max_delay=2.0, multiplier=2.0, jitter=0.5, max_attempts=None,
+                 connect_timeout=1.0, restore_solution=True, keepalive_idle=1, keepalive_interval=1,
+                 keepalive_count=3):
+        self.initial_delay = initial_delay  # [s] wait before the second attempt, the first one is immediate
+        self.max_delay = max_delay  # [s] upper limit of wait between attempts
+        self.multiplier = multiplier  # wait grows by this factor after every failed attempt
+        self.jitter = jitter  # wait is randomly shortened by up to this fraction - cells do not reconnect in sync
+        self.max_attempts = max_attempts  # None -> reconnect until it succeeds
+        self.connect_timeout = connect_timeout  # [s] timeout of one connection attempt
+        self.restore_solution = restore_solution  # True -> solution started before the drop is started again
+        self.keepalive_idle = keepalive_idle  # [s] idle time before the first keep-alive probe
+        self.keepalive_interval = keepalive_interval  # [s] time between unanswered probes
+        self.keepalive_count = keepalive_count  # unanswered probes before connection is considered dead
+        self.rng = random.Random()
+
+    def delays(self):
+        # yields wait [s] before every connection attempt
+        delay = self.initial_delay
+        attempt = 0
+        while self.max_attempts is None or attempt < self.max_attempts:
+            yield 0.0 if attempt == 0 else delay * (1 - self.jitter * self.rng.random())
+            if attempt > 0:
+                delay = min(delay * self.multiplier, self.max_delay)
+            attempt += 1
+
+    def apply_keepalive(self, sock):
+        set_keepalive(sock, self.keepalive_idle, self.keepalive_interval, self.keepalive_count)
+
+
+def set_keepalive(sock, idle=1, interval=1, count=3):
+    # dead peer is detected after idle + interval * count seconds without traffic or unacknowledged data,
+    # options missing on the platform are skipped
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+    elif hasattr(socket, "TCP_KEEPALIVE"):  # macOS
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle)
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+    if hasattr(socket, "TCP_KEEPCNT"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+    if hasattr(socket, "TCP_USER_TIMEOUT"):  # sent data not acknowledged - streaming server never idles
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, 1000 * (idle + interval * count))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+import numpy as np
+from PhoCodec import NUMBER_OF_JOINTS, CARTES_POSE_LEN
+from TrajectoryProcessing import prepare_trajectory
+from ObjectPoses import ObjectPoses
+
+# typed results of requests - built from ResponseData once the response is received,
+# every result owns its arrays, so results of several clients and requests never share storage
+
+
+class PhoResult:  # result of request without response data
+    __slots__ = ("request_id", "error")
+
+    def __init__(self, request_id, error=0):
+        self.request_id = request_id  # request ID from the response header
+        self.error = error  # error code of PHO_ERROR message, 0 -> no error
+
+    @classmethod
+    def from_response_data(cls, request_id, response_data):
+        return cls(request_id, response_data.error)
+
+    def __repr__(self):
+        slots = [slot for klass in reversed(type(self).__mro__) for slot in getattr(klass, "__slots__", ())]
+        return type(self).__name__ + "(" + ", ".join(slot + "=" + repr(getattr(self, slot)) for slot in slots) + ")"
+
+
+class TrajectoryResult(PhoResult):
+    __slots__ = ("segments", "segment_types", "gripper_commands", "gripping_info")
+
+    def __init__(self, request_id, error, segments, segment_types, gripper_commands, gripping_info):
+        super().__init__(request_id, error)
+        self.segments = segments  # list of (N, NUMBER_OF_JOINTS) arrays of joint waypoints
+        self.segment_types = segment_types  # MessageType of every segment - PHO_TRAJECTORY_CNT / PHO_TRAJECTORY_FINE
+        self.gripper_commands = gripper_commands  # gripper command following every gripper message
+        self.gripping_info = gripping_info  # list of info arrays
+
+    @classmethod
+    def from_response_data(cls, request_id, response_data):
+        # segments are arrays created by decoder for this response - no copy is needed, empty segments are
+        # dropped together with their types
+        segment_types = np.array(response_data.trajectory_types, dtype=np.int32)
+        segments = response_data.trajectory_data[:len(segment_types)]
+        keep = np.array([len(segment) > 0 for segment in segments], dtype=bool)
+        return cls(request_id, response_data.error, [segment for segment in segments if len(segment)],
+                   segment_types[keep],
+                   np.array(response_data.gripper_command or [], dtype=np.int32),
+                   [np.array(info, dtype=np.int64) for info in response_data.gripping_info])
+
+    @property
+    def waypoints(self):
+        # all segments as one (N, NUMBER_OF_JOINTS) array
+        if not self.segments:
+            return np.empty((0, NUMBER_OF_JOINTS))
+        return np.concatenate(self.segments)
+
+    def resample(self, cycle, max_velocity, max_acceleration, method="cubic", cnt_min_distance=None):
+        # trajectory sampled every cycle [s] of robot driver - returns times (M,) and joints (M, NUMBER_OF_JOINTS)
+        return prepare_trajectory(self.segments, self.segment_types, cycle, max_velocity, max_acceleration, method,
+                                  cnt_min_distance)
+
+
+class ObjectsResult(PhoResult):
+    __slots__ = ("poses", "dimensions", "zheight_angle")
+
+    def __init__(self, request_id, error, poses, dimensions, zheight_angle):
+        super().__init__(request_id, error)
+        self.poses = poses  # (N, CARTES_POSE_LEN) array - x, y, z, quaternion of every object
+        self.dimensions = dimensions  # (N, 3) array of object dimensions
+        self.zheight_angle = zheight_angle  # (N, 2) array of z-height and angle
+
+    @classmethod
+    def from_response_data(cls, request_id, response_data):
+        poses = np.array(response_data.object_pose, dtype=float).reshape(-1, CARTES_POSE_LEN)
+        return cls(request_id, response_data.error, poses, int_rows(response_data.dimensions, len(poses)),
+                   int_rows(response_data.zheight_angle, len(poses)))
+
+    def __len__(self):
+        return len(self.poses)
+
+    def object_poses(self):
+        # ObjectPoses of all objects - filtering, ranking and transforms into robot frames as array operations
+        return ObjectPoses(self.poses)
+
+
+class LocatedObject:  # one object of LOCATOR get objects response - yielded while the response is received
+    __slots__ = ("index", "pose", "dimensions", "zheight_angle")
+
+    def __init__(self, index, pose, dimensions, zheight_angle):
+        self.index = index  # order of object in the response
+        self.pose = pose  # (CARTES_POSE_LEN,) array - x, y, z, quaternion
+        self.dimensions = dimensions  # array of object dimensions, None if not received
+        self.zheight_angle = zheight_angle  # array of z-height and angle, None if not received
+
+    @classmethod
+    def from_response_data(cls, response_data, index):
+        dimensions = response_data.dimensions[index] if index < len(response_data.dimensions) else None
+        zheight_angle = response_data.zheight_angle[index] if index < len(response_data.zheight_angle) else None
+        return cls(index, np.array(response_data.object_pose[index], dtype=float),
+                   None if dimensions is None else np.array(dimensions, dtype=np.int64),
+                   None if zheight_angle is None else np.array(zheight_angle, dtype=np.int64))
+
+    def __repr__(self):
+        return "LocatedObject(" + ", ".join(slot + "=" + repr(getattr(self, slot)) for slot in self.__slots__) + ")"
+
+
+class StatusResult(PhoResult):
+    __slots__ = ("status",)
+
+    def __init__(self, request_id, error, status):
+        super().__init__(request_id, error)
+        self.status = status  # array of vision system status values
+
+    @classmethod
+    def from_response_data(cls, request_id, response_data):
+        return cls(request_id, response_data.error, np.array(response_data.status_data or [], dtype=np.int64))
+
+
+class CalibrationResult(PhoResult):
+    __slots__ = ("calib_data", "camera_pose")
+
+    def __init__(self, request_id, error, calib_data, camera_pose):
+        super().__init__(request_id, error)
+        self.calib_data = calib_data  # array of calibration info values
+        self.camera_pose = camera_pose  # (CARTES_POSE_LEN,) array, None if camera pose was not received
+
+    @classmethod
+    def from_response_data(cls, request_id, response_data):
+        camera_pose = np.array(response_data.camera_pose, dtype=float) if len(response_data.camera_pose) else None
+        return cls(request_id, response_data.error, np.array(response_data.calib_data or [], dtype=np.int64),
+                   camera_pose)
+
+
+class SolutionResult(PhoResult):
+    __slots__ = ("running_solution", "available_solutions")
+
+    def __init__(self, request_id, error, running_solution, available_solutions):
+        super().__init__(request_id, error)
+        self.running_solution = running_solution  # ID of running solution, None if not requested
+        self.available_solutions = available_solutions  # array of available solution IDs
+
+    @classmethod
+    def from_response_data(cls, request_id, response_data):
+        running_solution = response_data.running_solution[0] if response_data.running_solution else None
+        available = [info[0] for info in response_data.available_solution if info]
+        return cls(request_id, response_data.error, running_solution, np.array(available, dtype=np.int64))
+
+
+def int_rows(values, number_of_rows):
+    # list of info lists (or one info list) -> (N, M) int array, (number_of_rows, 0) if nothing was received
+    if len(values) == 0:
+        return np.empty((number_of_rows, 0), dtype=np.int64)
+    return np.atleast_2d(np.array(values, dtype=np.int64))
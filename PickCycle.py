@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import threading
+import time
+from PhoErrors import PhoConnectionLost
+from PhoLogging import logger
+
+# bin picking cycle with overlapped steps - next scan is triggered and next trajectory is prefetched
+# while robot places the current part
+
+
+class CycleTiming:  # durations of one pick cycle [s]
+    __slots__ = ("scan", "trajectory", "wait", "pick", "place", "total", "grasped", "pick_retries",
+                 "localize_retries", "rescans", "reconnects")
+
+    def __init__(self):
+        self.scan = 0.0  # trigger scan sent -> scan acquired
+        self.trajectory = 0.0  # scan acquired -> trajectory received
+        self.wait = 0.0  # robot waiting for vision controller
+        self.pick = 0.0  # pick callback - including failed picks
+        self.place = 0.0  # place callback - overlapped with next scan and trajectory
+        self.total = 0.0
+        self.grasped = False  # part was picked - cycles without grasp are not counted as picks
+        self.pick_retries = 0  # PICK-FAILED requests
+        self.localize_retries = 0  # LOCALIZE ON THE LAST SCAN requests
+        self.rescans = 0  # scans triggered because no trajectory was found
+        self.reconnects = 0  # scans requested again because connection was lost during prefetch
+
+    def __repr__(self):
+        return "CycleTiming(" + ", ".join(slot + "=" + repr(getattr(self, slot)) for slot in self.__slots__) + ")"
+
+
+class BinPickingCycle:  # pick cycle engine over RobotRequestResponseCommunication
+    def __init__(self, robot, vs_id, pick, place, tool_pose=None, max_pick_retries=3, max_localize_retries=1,
+                 max_rescans=3, max_reconnects=3):
+        self.robot = robot  # connected RobotRequestResponseCommunication with running bin picking solution
+        self.vs_id = vs_id
+        self.pick = pick  # pick(trajectory) - executes TrajectoryResult, returns True if part was grasped
+        self.place = place  # place() - places grasped part, robot is out of the scanned area
+        self.tool_pose = tool_pose  # tool pose sent with scans (hand-eye)
+        self.max_pick_retries = max_pick_retries  # failed picks handled with PICK-FAILED before rescan
+        self.max_localize_retries = max_localize_retries  # empty trajectories handled with localization before rescan
+        self.max_rescans = max_rescans  # scans in row without trajectory before cycle gives up
+        self.max_reconnects = max_reconnects  # prefetches lost with the connection before the error is raised
+        self.timings = []  # CycleTiming of every finished cycle
+        self.prefetch_thread = None
+        self.prefetched = None  # (TrajectoryResult, scan duration, trajectory duration)
+        self.prefetch_error = None
+
+    def run(self, number_of_picks):
+        # returns CycleTiming of every cycle, stops early when no trajectory is found
+        self.start_prefetch()
+        for pick_number in range(number_of_picks):
+            timing = self.cycle(prefetch_next=pick_number < number_of_picks - 1)
+            if timing is None:
+                break
+        self.finish_prefetch()
+        return self.timings
+
+    def cycle(self, prefetch_next=True):
+        cycle_start = time.perf_counter()
+        timing = CycleTiming()
+        trajectory = self.collect_prefetch(timing)
+        if trajectory is None:
+            return None
+
+        start = time.perf_counter()
+        grasped = self.pick(trajectory)
+        while not grasped and timing.pick_retries < self.max_pick_retries:
+            # next candidate from the last localization - no new scan
+            timing.pick_retries += 1
+            self.robot.pho_request_binpicking_pick_failed(self.vs_id)
+            trajectory = self.robot.pho_request_binpicking_trajectory(self.vs_id)
+            if not usable(trajectory):
+                break
+            grasped = self.pick(trajectory)
+        timing.pick = time.perf_counter() - start
+        timing.grasped = grasped
+
+        # robot leaves the bin - next scan and trajectory are computed during place
+        if prefetch_next:
+            self.start_prefetch()
+        if grasped:
+            start = time.perf_counter()
+            self.place()
+            timing.place = time.perf_counter() - start
+        timing.total = time.perf_counter() - cycle_start
+        self.timings.append(timing)
+        return timing
+
+    # -------------------------------------------------------------------
+    #                      PREFETCH
+    # -------------------------------------------------------------------
+
+    def start_prefetch(self):
+        self.prefetch_thread = threading.Thread(target=self.prefetch, daemon=True)
+        self.prefetch_thread.start()
+
+    def finish_prefetch(self):
+        if self.prefetch_thread is not None:
+            self.prefetch_thread.join()
+            self.prefetch_thread = None
+
+    def prefetch(self):
+        # runs in background thread - robot communication is used only by this thread until it is joined
+        try:
+            start = time.perf_counter()
+            scan = self.robot.pho_request_binpicking_trigger_scan_nowait(self.vs_id, self.tool_pose)
+            trajectory = self.robot.pho_request_binpicking_trajectory_nowait(self.vs_id)  # pipelined behind scan
+            scan.result()
+            scanned = time.perf_counter()
+            result = trajectory.result()
+            self.prefetched = (result, scanned - start, time.perf_counter() - scanned)
+        except BaseException as error:  # re-raised in the main thread
+            self.prefetch_error = error
+
+    def collect_prefetch(self, timing):
+        start = time.perf_counter()
+        while True:
+            if self.prefetch_thread is None and self.prefetched is None:
+                self.prefetch()  # nothing was prefetched - scan and trajectory are requested now
+            self.finish_prefetch()
+            if not isinstance(self.prefetch_error, PhoConnectionLost) or timing.reconnects >= self.max_reconnects:
+                break
+            # client has reconnected already - scan and trajectory are requested again
+            logger.warning("Prefetch failed: %s", self.prefetch_error)
+            self.prefetch_error = None
+            timing.reconnects += 1
+        timing.wait = time.perf_counter() - start
+        if self.prefetch_error is not None:
+            error, self.prefetch_error = self.prefetch_error, None
+            raise error
+        trajectory, timing.scan, timing.trajectory = self.prefetched
+        self.prefetched = None
+        return self.recover(trajectory, timing)
+
+    def recover(self, trajectory, timing):
+        # no trajectory - localize on the last scan first, rescan when localization does not help
+        while not usable(trajectory):
+            if timing.localize_retries < self.max_localize_retries:
+                timing.localize_retries += 1
+                self.robot.pho_request_binpicking_localize_on_the_last_scan_nowait(self.vs_id, self.tool_pose).result()
+            elif timing.rescans < self.max_rescans:
+                timing.rescans += 1
+                self.robot.pho_request_binpicking_trigger_scan_nowait(self.vs_id, self.tool_pose).result()
+            else:
+                return None
+            start = time.perf_counter()
+            trajectory = self.robot.pho_request_binpicking_trajectory(self.vs_id)
+            timing.trajectory += time.perf_counter() - start
+        return trajectory
+
+    # -------------------------------------------------------------------
+    #                      STATISTICS
+    # -------------------------------------------------------------------
+
+    def picks(self):
+        # successful picks - cycles ending without grasped part are not counted
+        return sum(timing.grasped for timing in self.timings)
+
+    def failed_picks(self):
+        return len(self.timings) - self.picks()
+
+    def picks_per_hour(self):
+        # successful picks over time of all cycles
+        total = sum(timing.total for timing in self.timings)
+        return 3600 * self.picks() / total if total else 0.0
+
+
+def usable(trajectory):
+    return trajectory.error == 0 and len(trajectory.segments) > 0
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import numpy as np
+
+# batched quaternion and pose math - quaternions [w, x, y, z] as (..., 4) arrays, poses x, y, z, quaternion
+# as (..., 7) arrays, every function works on a single value as well as on arrays of any number of them
+SLERP_LINEAR_THRESHOLD = 1e-6  # sin of angle between quaternions below which SLERP falls back to linear blend
+
+
+def quaternion_multiply(q1, q2):
+    # Hamilton product q1 * q2
+    q1 = np.asarray(q1, dtype=float)
+    q2 = np.asarray(q2, dtype=float)
+    w1, x1, y1, z1 = np.moveaxis(q1, -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(q2, -1, 0)
+    return np.stack([w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+                     w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+                     w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+                     w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2], axis=-1)
+
+
+def right_multiplication_matrix(q):
+    # (..., 4) -> (..., 4, 4) matrix M with quaternion_multiply(p, q) == p @ M,
+    # constant rotation increment applied to many quaternions is one matrix product without temporaries
+    w, x, y, z = np.moveaxis(np.asarray(q, dtype=float), -1, 0)
+    return np.stack([np.stack([w, x, y, z], axis=-1),
+                     np.stack([-x, w, -z, y], axis=-1),
+                     np.stack([-y, z, w, -x], axis=-1),
+                     np.stack([-z, -y, x, w], axis=-1)], axis=-2)
+
+
+def normalize_quaternion(q):
+    q = np.asarray(q, dtype=float)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def quaternion_conjugate(q):
+    # inverse rotation of unit quaternion
+    return np.asarray(q, dtype=float) * np.array([1., -1., -1., -1.])
+
+
+def axis_angle_quaternion(axes, angles):
+    # rotation by angles [rad] around axes (..., 3) -> (..., 4)
+    axes = np.asarray(axes, dtype=float)
+    axes = axes / np.linalg.norm(axes, axis=-1, keepdims=True)
+    half = np.asarray(angles, dtype=float)[..., None] / 2
+    return np.concatenate([np.cos(half), np.sin(half) * axes], axis=-1)
+
+
+def quaternion_slerp(q0, q1, t):
+    # spherical linear interpolation, t in [0, 1] broadcast against quaternions - shortest path is used
+    q0 = np.asarray(q0, dtype=float)
+    q1 = np.asarray(q1, dtype=float)
+    t = np.asarray(t, dtype=float)[..., None]
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    q1 = np.where(dot < 0, -q1, q1)
+    theta = np.arccos(np.clip(np.abs(dot), 0., 1.))
+    sin_theta = np.sin(theta)
+    linear = sin_theta < SLERP_LINEAR_THRESHOLD
+    with np.errstate(divide="ignore", invalid="ignore"):
+        w0 = np.where(linear, 1 - t, np.sin((1 - t) * theta) / sin_theta)
+        w1 = np.where(linear, t, np.sin(t * theta) / sin_theta)
+    return normalize_quaternion(w0 * q0 + w1 * q1)
+
+
+def quaternion_to_matrix(quaternions):
+    # (..., 4) quaternions -> (..., 3, 3) rotation matrices, quaternions are normalized first
+    q = np.asarray(quaternions, dtype=float)
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    matrix = np.empty(q.shape[:-1] + (3, 3))
+    matrix[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    matrix[..., 0, 1] = 2 * (x * y - w * z)
+    matrix[..., 0, 2] = 2 * (x * z + w * y)
+    matrix[..., 1, 0] = 2 * (x * y + w * z)
+    matrix[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    matrix[..., 1, 2] = 2 * (y * z - w * x)
+    matrix[..., 2, 0] = 2 * (x * z - w * y)
+    matrix[..., 2, 1] = 2 * (y * z + w * x)
+    matrix[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return matrix
+
+
+def matrix_to_quaternion(matrices):
+    # (..., 3, 3) or (..., 4, 4) -> (..., 4) quaternions with w >= 0
+    m = np.asarray(matrices, dtype=float)[..., :3, :3]
+    m00, m01, m02 = m[..., 0, 0], m[..., 0, 1], m[..., 0, 2]
+    m10, m11, m12 = m[..., 1, 0], m[..., 1, 1], m[..., 1, 2]
+    m20, m21, m22 = m[..., 2, 0], m[..., 2, 1], m[..., 2, 2]
+    # row k is 4 * q[k] * q - row with the largest diagonal element is numerically the best one
+    rows = np.stack([
+        np.stack([1 + m00 + m11 + m22, m21 - m12, m02 - m20, m10 - m01], axis=-1),
+        np.stack([m21 - m12, 1 + m00 - m11 - m22, m01 + m10, m02 + m20], axis=-1),
+        np.stack([m02 - m20, m01 + m10, 1 - m00 + m11 - m22, m12 + m21], axis=-1),
+        np.stack([m10 - m01, m02 + m20, m12 + m21, 1 - m00 - m11 + m22], axis=-1)], axis=-2)
+    best = np.argmax(np.diagonal(rows, axis1=-2, axis2=-1), axis=-1)
+    q = np.take_along_axis(rows, best[..., None, None], axis=-2)[..., 0, :]
+    q /= np.linalg.norm(q, axis=-1, keepdims=True)
+    return np.where(q[..., :1] < 0, -q, q)
+
+
+def pose_to_matrix(poses):
+    # (..., CARTES_POSE_LEN) poses -> (..., 4, 4) homogeneous transforms
+    poses = np.asarray(poses, dtype=float)
+    matrix = np.zeros(poses.shape[:-1] + (4, 4))
+    matrix[..., :3, :3] = quaternion_to_matrix(poses[..., 3:])
+    matrix[..., :3, 3] = poses[..., :3]
+    matrix[..., 3, 3] = 1
+    return matrix
+
+
+def matrix_to_pose(matrices):
+    # (..., 4, 4) homogeneous transforms -> (..., CARTES_POSE_LEN) poses
+    matrices = np.asarray(matrices, dtype=float)
+    return np.concatenate([matrices[..., :3, 3], matrix_to_quaternion(matrices)], axis=-1)
+
+
+def invert_transform(matrices):
+    # inverse of (..., 4, 4) rigid transforms without general matrix inversion
+    matrices = np.asarray(matrices, dtype=float)
+    inverse = np.zeros_like(matrices)
+    rotation = np.swapaxes(matrices[..., :3, :3], -1, -2)
+    inverse[..., :3, :3] = rotation
+    inverse[..., :3, 3] = -(rotation @ matrices[..., :3, 3, None])[..., 0]
+    inverse[..., 3, 3] = 1
+    return inverse
+
+
+def interpolate_poses(pose0, pose1, t):
+    # positions blended linearly, quaternions with SLERP
+    pose0 = np.asarray(pose0, dtype=float)
+    pose1 = np.asarray(pose1, dtype=float)
+    t = np.asarray(t, dtype=float)
+    position = pose0[..., :3] + t[..., None] * (pose1[..., :3] - pose0[..., :3])
+    return np.concatenate([position, quaternion_slerp(pose0[..., 3:], pose1[..., 3:], t)], axis=-1)
+
+
+def upsample_states(times, joints, tool_poses, rate):
+    # state samples (N,) times [s], (N, J) joints, (N, 7) tool poses -> sampled at rate [Hz] between first
+    # and last sample, returns times (M,), joints (M, J), tool poses (M, 7)
+    times = np.asarray(times, dtype=float)
+    joints = np.asarray(joints, dtype=float)
+    tool_poses = np.asarray(tool_poses, dtype=float)
+    if len(times) < 2:
+        return times, joints, tool_poses
+    samples = np.arange(times[0], times[-1], 1.0 / rate)
+    samples = np.append(samples, times[-1])  # last sample is always included
+    index = np.clip(np.searchsorted(times, samples, side="right") - 1, 0, len(times) - 2)
+    t = (samples - times[index]) / (times[index + 1] - times[index])
+    upsampled_joints = joints[index] + t[:, None] * (joints[index + 1] - joints[index])
+    return samples, upsampled_joints, interpolate_poses(tool_poses[index], tool_poses[index + 1], t)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+import mmap
+import socket
+import struct
+import threading
+import time
+
+# capture file - FILE_HEADER followed by records, every record is RECORD + raw bytes
+CAPTURE_MAGIC = b"PHOCAP01"
+FILE_HEADER = struct.Struct("<8sd")  # magic, wall clock time of capture start
+RECORD = struct.Struct("<dII")  # seconds since capture start, direction, number of bytes
+
+# directions of captured bytes - seen from the side which records
+SENT = 0
+RECEIVED = 1
+
+
+class SessionRecorder:  # appends timestamped raw frames to capture file
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.start = time.monotonic()
+        self.file.write(FILE_HEADER.pack(CAPTURE_MAGIC, time.time()))
+
+    def record(self, direction, data):
+        self.file.write(RECORD.pack(time.monotonic() - self.start, direction, len(data)))
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+class CaptureFile:  # memory-mapped capture file
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        magic, self.start_time = FILE_HEADER.unpack_from(self.map, 0)
+        if magic != CAPTURE_MAGIC:
+            raise ValueError("Not a capture file: " + str(path))
+
+    def records(self, direction=None):
+        # yields (timestamp, direction, data) - data is memoryview of the mapped file, no copy is made
+        offset = FILE_HEADER.size
+        while offset + RECORD.size <= len(self.map):
+            timestamp, record_direction, size = RECORD.unpack_from(self.map, offset)
+            offset += RECORD.size
+            if direction is None or record_direction == direction:
+                yield timestamp, record_direction, self.view[offset:offset + size]
+            offset += size
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+
+class ReplaySocket:  # socket-like source of received bytes from capture - used under PhoTransport, owns capture
+    def __init__(self, capture, direction=RECEIVED, realtime=False):
+        self.capture = capture
+        self.records = capture.records(direction)
+        self.realtime = realtime  # True -> bytes are delivered at recorded speed, False -> as fast as possible
+        self.chunk = memoryview(b"")
+        self.next_record = None  # record read ahead by readable()
+        self.clock = None  # recorded time of the last delivered record - replay clock without realtime
+        self.first_timestamp = None
+        self.start = None
+
+    def peek(self):
+        if self.next_record is None:
+            self.next_record = next(self.records, None)
+        return self.next_record
+
+    def readable(self, timeout=0):
+        # select() replacement - True if bytes arrive within timeout of recorded time, without realtime zero
+        # timeout skips to the next record and waits with timeout advance the replay clock - resync sees the same
+        # quiet gaps as the recorded client, end of capture is readable like closed connection only without timeout
+        if self.chunk:
+            return True
+        record = self.peek()
+        if record is None:
+            if timeout and self.realtime:
+                time.sleep(timeout)
+            return not timeout
+        timestamp = record[0]
+        if self.realtime:
+            if self.start is None:
+                return True
+            delay = self.start + (timestamp - self.first_timestamp) - time.monotonic()
+            if delay > timeout:
+                time.sleep(max(timeout, 0))
+                return False
+            return True
+        if self.clock is None or timeout == 0 or timestamp - self.clock <= timeout:
+            return True
+        self.clock += timeout
+        return False
+
+    def recv_into(self, buffer):
+        if not self.chunk:
+            record = self.peek()
+            if record is None:
+                return 0  # end of capture - same as closed connection
+            self.next_record = None
+            timestamp, direction, self.chunk = record
+            self.clock = timestamp
+            if self.realtime:
+                self.wait_until(timestamp)
+        count = min(len(buffer), len(self.chunk))
+        buffer[:count] = self.chunk[:count]
+        self.chunk = self.chunk[count:]
+        return count
+
+    def wait_until(self, timestamp):
+        if self.start is None:
+            self.start = time.monotonic()
+            self.first_timestamp = timestamp
+        delay = self.start + (timestamp - self.first_timestamp) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def sendall(self, data):
+        pass  # requests of replayed session are not sent anywhere
+
+    def close(self):
+        # views into the mapped file must be gone before it is closed
+        self.chunk = self.next_record = None
+        self.records.close()
+        self.capture.close()
+
+
+class CaptureServer:  # serves capture as fake peer - e.g. fake vision controller for recorded client session
+    def __init__(self, path, send_direction=RECEIVED, realtime=True):
+        self.capture = CaptureFile(path)
+        self.send_direction = send_direction  # recorded direction which is sent to the connected peer
+        self.realtime = realtime
+        self.server = None
+        self.thread = None
+
+    def start(self, IP="127.0.0.1", PORT=0):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((IP, PORT))
+        self.server.listen(1)
+        self.thread = threading.Thread(target=self.accept_loop, daemon=True)
+        self.thread.start()
+        return self.server.getsockname()
+
+    def stop(self):
+        self.server.close()
+
+    def accept_loop(self):
+        while True:
+            try:
+                client, client_address = self.server.accept()
+            except OSError:
+                return  # server closed
+            try:
+                self.serve_client(client)
+            except (ConnectionError, OSError):
+                pass
+            client.close()
+
+    def serve_client(self, client):
+        anchor = time.monotonic()  # wall clock of anchor_timestamp - moved whenever the peer sends data
+        anchor_timestamp = None
+        for timestamp, direction, data in self.capture.records():
+            if anchor_timestamp is None:
+                anchor_timestamp = timestamp
+            if direction == self.send_direction:
+                delay = anchor + (timestamp - anchor_timestamp) - time.monotonic()
+                if self.realtime and delay > 0:
+                    time.sleep(delay)
+                client.sendall(data)
+            else:
+                # wait for the same amount of bytes from peer as was recorded
+                remaining = len(data)
+                while remaining:
+                    chunk = client.recv(remaining)
+                    if not chunk:
+                        raise ConnectionError('Connection closed by peer')
+                    remaining -= len(chunk)
+                anchor = time.monotonic()
+                anchor_timestamp = timestamp
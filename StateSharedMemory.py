@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from PhoCodec import NUMBER_OF_JOINTS, CARTES_POSE_LEN
+
+# latest robot state for processes on the same host - state server writes every sample into a ring in shared
+# memory, every slot is guarded by sequence lock: sequence is odd while the slot is written, even when it holds
+# sample number (sequence - 2) / 2, readers never block the writer and retry when a slot changed under them
+RING_SIZE = 64  # recent samples kept in shared memory
+READ_RETRIES = 100000  # reads of slot changing under the reader before it gives up - publisher died while writing
+SAMPLES_OFFSET = 64  # samples start on their own cache line
+
+published = set()  # names of blocks created by publishers of this process
+
+HEADER_DTYPE = np.dtype([("count", np.int64), ("ring_size", np.int64), ("number_of_joints", np.int64),
+                         ("pose_length", np.int64)])
+
+
+def sample_dtype(number_of_joints=NUMBER_OF_JOINTS, pose_length=CARTES_POSE_LEN):
+    return np.dtype([("sequence", np.int64), ("timestamp", np.float64), ("joints", np.float64, (number_of_joints,)),
+                     ("tool_pose", np.float64, (pose_length,))])
+
+
+class StateSample:  # one sample read from shared memory - reusable as output of StateReader.latest
+    __slots__ = ("number", "timestamp", "joints", "tool_pose")
+
+    def __init__(self, number_of_joints=NUMBER_OF_JOINTS, pose_length=CARTES_POSE_LEN):
+        self.number = -1  # sample number, counted from 0 since the publisher was created
+        self.timestamp = 0.0  # time.time() when the sample was published
+        self.joints = np.zeros(number_of_joints)
+        self.tool_pose = np.zeros(pose_length)
+
+    def __repr__(self):
+        return "StateSample(" + ", ".join(slot + "=" + repr(getattr(self, slot)) for slot in self.__slots__) + ")"
+
+
+class StateRing:  # views of header and sample ring in shared memory block
+    def __init__(self, shm, ring_size, number_of_joints, pose_length):
+        self.shm = shm
+        self.header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=shm.buf)
+        self.samples = np.ndarray((ring_size,), dtype=sample_dtype(number_of_joints, pose_length), buffer=shm.buf,
+                                  offset=SAMPLES_OFFSET)
+        self.ring_size = ring_size
+        # field views are created once - publishing and reading do not build new views
+        self.count = self.header["count"]
+        self.sequence = self.samples["sequence"]
+        self.timestamps = self.samples["timestamp"]
+        self.joints = self.samples["joints"]
+        self.tool_poses = self.samples["tool_pose"]
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def release(self):
+        # views must be gone before the block is closed
+        self.header = self.samples = self.count = self.sequence = None
+        self.timestamps = self.joints = self.tool_poses = None
+        self.shm.close()
+
+
+class StatePublisher(StateRing):  # single writer - state server
+    def __init__(self, name=None, ring_size=RING_SIZE, number_of_joints=NUMBER_OF_JOINTS, pose_length=CARTES_POSE_LEN):
+        size = SAMPLES_OFFSET + ring_size * sample_dtype(number_of_joints, pose_length).itemsize
+        super().__init__(shared_memory.SharedMemory(name=name, create=True, size=size), ring_size, number_of_joints,
+                         pose_length)
+        self.header[0] = (0, ring_size, number_of_joints, pose_length)
+        self.sequence[:] = 0
+        self.number = 0  # number of the next sample
+        published.add(self.shm.name)
+
+    def publish(self, joints, tool_pose, timestamp=None):
+        number = self.number
+        slot = number % self.ring_size
+        self.sequence[slot] = 2 * number + 1  # slot is being written
+        self.timestamps[slot] = time.time() if timestamp is None else timestamp
+        self.joints[slot] = joints
+        self.tool_poses[slot] = tool_pose
+        self.sequence[slot] = 2 * number + 2  # slot holds sample number
+        self.count[0] = number + 1
+        self.number = number + 1
+
+    def close(self):
+        published.discard(self.shm.name)
+        self.release()
+        self.shm.unlink()
+
+
+class StateReader(StateRing):  # any number of readers in other processes
+    def __init__(self, name):
+        shm = attach_shared_memory(name)
+        header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=shm.buf)[0]
+        ring_size, number_of_joints, pose_length = (int(header["ring_size"]), int(header["number_of_joints"]),
+                                                    int(header["pose_length"]))
+        del header
+        super().__init__(shm, ring_size, number_of_joints, pose_length)
+
+    def latest(self, out=None, retries=READ_RETRIES):
+        # newest complete sample copied into out (StateSample, reused without allocation), None before first sample
+        if out is None:
+            out = StateSample(self.joints.shape[1], self.tool_poses.shape[1])
+        for _ in range(retries):
+            number = int(self.count[0]) - 1
+            if number < 0:
+                return None
+            slot = number % self.ring_size
+            sequence = self.sequence[slot]
+            if sequence != 2 * number + 2:
+                continue  # slot is being rewritten - newer sample is published soon
+            out.timestamp = float(self.timestamps[slot])
+            out.joints[:] = self.joints[slot]
+            out.tool_pose[:] = self.tool_poses[slot]
+            if self.sequence[slot] == sequence:
+                out.number = number
+                return out
+        raise TimeoutError("Sample in shared memory " + self.name + " stays incomplete - publisher stopped writing")
+
+    def latest_view(self, retries=READ_RETRIES):
+        # zero-copy access - (number, joints view, tool pose view) of the newest sample, views are valid only
+        # while valid(number) is True, so check it after the values were used
+        for _ in range(retries):
+            number = int(self.count[0]) - 1
+            if number < 0:
+                return None
+            slot = number % self.ring_size
+            if self.sequence[slot] == 2 * number + 2:
+                return number, self.joints[slot], self.tool_poses[slot]
+        raise TimeoutError("Sample in shared memory " + self.name + " stays incomplete - publisher stopped writing")
+
+    def valid(self, number):
+        return self.sequence[number % self.ring_size] == 2 * number + 2
+
+    def recent(self, number_of_samples=RING_SIZE):
+        # up to number_of_samples newest samples, oldest first - samples overwritten while copied are dropped,
+        # returns sample numbers (N,), timestamps (N,), joints (N, J), tool poses (N, 7)
+        count = int(self.count[0])
+        numbers = np.arange(max(count - min(number_of_samples, self.ring_size), 0), count)
+        slots = numbers % self.ring_size
+        expected = 2 * numbers + 2
+        before = self.sequence[slots]
+        timestamps = self.timestamps[slots]
+        joints = self.joints[slots]
+        tool_poses = self.tool_poses[slots]
+        valid = (before == expected) & (self.sequence[slots] == expected)
+        return numbers[valid], timestamps[valid], joints[valid], tool_poses[valid]
+
+    def close(self):
+        self.release()
+
+
+def attach_shared_memory(name):
+    # reader does not own the block - it must not be unlinked when the reader exits
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 - independent reader process would unlink the block at exit
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        if shm.name not in published:  # block of this process stays registered for its publisher
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
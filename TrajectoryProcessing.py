@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+import numpy as np
+from PhoCodec import NUMBER_OF_JOINTS
+
+# post-processing of received trajectories - all segments are processed at once as one (N, NUMBER_OF_JOINTS) array
+PHO_TRAJECTORY_CNT = 0  # same values as MessageType in CommunicationLibrary
+PHO_TRAJECTORY_FINE = 1
+
+DUPLICATE_TOLERANCE = 1e-9  # [rad] consecutive waypoints closer than this are merged
+
+
+def stack_segments(segments, segment_types=None):
+    # segments -> waypoints (N, NUMBER_OF_JOINTS), stops (N,) - True where robot has to stop (end of FINE segment)
+    segments = [np.asarray(segment, dtype=float).reshape(-1, NUMBER_OF_JOINTS) for segment in segments]
+    if not segments:
+        return np.empty((0, NUMBER_OF_JOINTS)), np.zeros(0, dtype=bool)
+    waypoints = np.concatenate(segments)
+    stops = np.zeros(len(waypoints), dtype=bool)
+    ends = np.cumsum([len(segment) for segment in segments]) - 1
+    if segment_types is not None:
+        fine = np.asarray(segment_types) == PHO_TRAJECTORY_FINE
+        stops[ends[fine & (ends >= 0)]] = True
+    if len(waypoints):
+        stops[[0, -1]] = True  # trajectory starts and ends in rest
+    return waypoints, stops
+
+
+def remove_duplicates(waypoints, stops):
+    # merge consecutive equal waypoints (segments repeat the last waypoint of the previous segment)
+    keep = np.ones(len(waypoints), dtype=bool)
+    keep[1:] = np.any(np.abs(np.diff(waypoints, axis=0)) > DUPLICATE_TOLERANCE, axis=1)
+    starts = np.flatnonzero(keep)
+    if len(starts) == 0:
+        return waypoints, stops
+    return waypoints[keep], np.logical_or.reduceat(stops, starts)
+
+
+def downsample_cnt(segments, segment_types, min_distance):
+    # keep CNT waypoints at least min_distance [rad] apart along the joint path, FINE segments and ends are kept
+    lengths = np.array([len(segment) for segment in segments])
+    if lengths.sum() == 0:
+        return [np.asarray(segment, dtype=float).reshape(-1, NUMBER_OF_JOINTS) for segment in segments]
+    waypoints = np.concatenate([np.asarray(segment, dtype=float).reshape(-1, NUMBER_OF_JOINTS) for segment in segments])
+    starts = np.cumsum(lengths) - lengths
+    segment_index = np.repeat(np.arange(len(segments)), lengths)
+
+    # path length from start of own segment
+    steps = np.zeros(len(waypoints))
+    steps[1:] = np.linalg.norm(np.diff(waypoints, axis=0), axis=1)
+    distance = np.cumsum(steps)
+    distance -= distance[starts][segment_index]
+
+    bins = np.floor(distance / min_distance)
+    keep = np.ones(len(waypoints), dtype=bool)
+    keep[1:] = bins[1:] != bins[:-1]
+    keep[starts[lengths > 0]] = True
+    keep[(starts + lengths - 1)[lengths > 0]] = True
+    keep |= (np.asarray(segment_types) != PHO_TRAJECTORY_CNT)[segment_index]
+    kept = np.bincount(segment_index[keep], minlength=len(segments))  # waypoints kept in every segment
+    return np.split(waypoints[keep], np.cumsum(kept)[:-1])
+
+
+def time_parameterize(waypoints, max_velocity, max_acceleration, stops=None):
+    # time of every waypoint [s] respecting joint velocity and acceleration limits, velocity is zero at stops
+    # path speed profile over joint space path length - forward and backward acceleration passes
+    # are solved in closed form with np.minimum.accumulate, no loop over waypoints
+    if len(waypoints) < 2:
+        return np.zeros(len(waypoints))
+    if stops is None:
+        stops = np.zeros(len(waypoints), dtype=bool)
+        stops[[0, -1]] = True
+    max_velocity = np.broadcast_to(np.asarray(max_velocity, dtype=float), (NUMBER_OF_JOINTS,))
+    max_acceleration = np.broadcast_to(np.asarray(max_acceleration, dtype=float), (NUMBER_OF_JOINTS,))
+
+    delta = np.diff(waypoints, axis=0)
+    length = np.maximum(np.linalg.norm(delta, axis=1), DUPLICATE_TOLERANCE)  # path length of every interval
+    direction = np.abs(delta / length[:, None])  # joint motion per unit of path length
+    with np.errstate(divide="ignore"):
+        interval_speed = np.min(max_velocity / direction, axis=1)  # maximal path speed of every interval
+        path_acceleration = np.min(max_acceleration / direction, axis=1)  # maximal path acceleration
+
+        # squared path speed limit of every waypoint - velocity of neighbouring intervals and curvature
+        limit = np.full(len(waypoints), np.inf)
+        limit[:-1] = interval_speed ** 2
+        limit[1:] = np.minimum(limit[1:], interval_speed ** 2)
+        curvature = np.abs(np.diff(delta / length[:, None], axis=0)) / ((length[:-1] + length[1:]) / 2)[:, None]
+        limit[1:-1] = np.minimum(limit[1:-1], np.min(max_acceleration / curvature, axis=1))
+    limit[stops] = 0
+
+    # v[k+1]^2 <= v[k]^2 + 2 * a * ds in both directions
+    increments = 2 * path_acceleration * length
+    speed = np.sqrt(np.minimum(accelerate(limit, increments), accelerate(limit[::-1], increments[::-1])[::-1]))
+
+    # trapezoidal profile between waypoints - accelerate to peak speed, cruise, decelerate, intervals starting
+    # and ending in rest take 2 * sqrt(length / a) instead of infinite time
+    start, end = speed[:-1], speed[1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        peak = np.minimum(interval_speed, np.sqrt(path_acceleration * length + (start ** 2 + end ** 2) / 2))
+        peak = np.maximum(peak, np.maximum(start, end))
+        cruise = np.maximum(length - (2 * peak ** 2 - start ** 2 - end ** 2) / (2 * path_acceleration), 0)
+        dt = (2 * peak - start - end) / path_acceleration + cruise / peak
+    dt[~np.isfinite(dt)] = 0  # zero length intervals - no joint moves
+    return np.concatenate([[0.], np.cumsum(dt)])
+
+
+def accelerate(limit, increments):
+    # x[0] = limit[0], x[k+1] = min(limit[k+1], x[k] + increments[k]) without loop
+    offsets = np.concatenate([[0.], np.cumsum(increments)])
+    return offsets + np.minimum.accumulate(limit - offsets)
+
+
+def resample(waypoints, times, cycle, method="linear", stops=None):
+    # sample trajectory every cycle [s] - returns sample times (M,) and joints (M, NUMBER_OF_JOINTS)
+    # linear keeps velocity limits exactly, cubic is smooth but may slightly exceed acceleration limit between waypoints
+    if len(waypoints) < 2:
+        return np.zeros(len(waypoints)), np.array(waypoints, dtype=float).reshape(-1, NUMBER_OF_JOINTS)
+    samples = np.arange(0., times[-1], cycle)
+    samples = np.append(samples, times[-1])  # last waypoint is always reached
+    index = np.clip(np.searchsorted(times, samples, side="right") - 1, 0, len(times) - 2)
+    h = times[index + 1] - times[index]
+    s = ((samples - times[index]) / h)[:, None]
+    start = waypoints[index]
+    end = waypoints[index + 1]
+    if method == "linear":
+        return samples, start + s * (end - start)
+    if method != "cubic":
+        raise ValueError("Unknown resampling method: " + str(method))
+
+    # cubic Hermite - finite difference tangents, zero tangent at stops
+    tangents = np.zeros_like(waypoints)
+    tangents[1:-1] = (waypoints[2:] - waypoints[:-2]) / (times[2:] - times[:-2])[:, None]
+    if stops is None:
+        stops = np.zeros(len(waypoints), dtype=bool)
+    tangents[stops] = 0
+    tangents[[0, -1]] = 0
+    s2 = s * s
+    s3 = s2 * s
+    return samples, ((2 * s3 - 3 * s2 + 1) * start + (s3 - 2 * s2 + s) * h[:, None] * tangents[index] +
+                     (-2 * s3 + 3 * s2) * end + (s3 - s2) * h[:, None] * tangents[index + 1])
+
+
+def prepare_trajectory(segments, segment_types, cycle, max_velocity, max_acceleration, method="cubic",
+                       cnt_min_distance=None):
+    # whole stage - CNT downsampling, time parameterization, resampling to interpolation cycle of robot driver
+    if cnt_min_distance is not None:
+        segments = downsample_cnt(segments, segment_types, cnt_min_distance)
+    waypoints, stops = remove_duplicates(*stack_segments(segments, segment_types))
+    times = time_parameterize(waypoints, max_velocity, max_acceleration, stops)
+    return resample(waypoints, times, cycle, method, stops)
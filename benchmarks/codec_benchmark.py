@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Microbenchmark of PhoCodec against the previous frame building (deepcopy + floatArray2bytes list concatenation),
+# requests are built by RequestEncoder - the path used by both clients
+import os
+import struct
+import sys
+import timeit
+from copy import deepcopy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import CommunicationLibrary  # noqa: E402 - imported first because of circular import with RobotStateServer
+import PhoCodec  # noqa: E402
+
+NUMBER = 100000  # calls per measurement
+
+PHO_HEADER = struct.pack("III", 80, 72, 79)  # P, H, O
+joints = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]
+pose = [100.0, 200.0, 300.0, 1.0, 0.0, 0.0, 0.0]
+
+
+def legacy_floatArray2bytes(array):  # previous implementation of floatArray2bytes
+    msg = []
+    for value in array:
+        msg = msg + list(struct.pack('<f', value))
+    return bytearray(msg)
+
+
+def legacy_joint_state():
+    msg = deepcopy(PHO_HEADER)
+    msg = msg + struct.pack("ii", 6, 1)  # Data size, Type
+    msg = msg + legacy_floatArray2bytes(joints)
+    return bytearray(msg)
+
+
+def legacy_state():
+    msg = deepcopy(PHO_HEADER) + struct.pack("ii", 6, 1) + legacy_floatArray2bytes(joints)
+    msg = msg + deepcopy(PHO_HEADER) + struct.pack("ii", 7, 2) + legacy_floatArray2bytes(pose)
+    return bytearray(msg)
+
+
+def legacy_scan_request():
+    payload = struct.pack("i", 1) + legacy_floatArray2bytes(pose)
+    msg = PHO_HEADER + struct.pack("ii", int(len(payload) / 4), 1)
+    return bytearray(msg + bytearray(payload))
+
+
+requests = PhoCodec.RequestEncoder()
+
+
+def scan_request():  # request frame as built by pho_request_binpicking_scan_nowait
+    return requests.request(1, PhoCodec.VS_ID_POSE, 1, *pose)
+
+
+encoder = PhoCodec.FrameEncoder(CommunicationLibrary.JOINT_STATE_TYPE, CommunicationLibrary.TOOL_POSE_TYPE)
+
+cases = [
+    ("joint state frame", legacy_joint_state, lambda: encoder.joint_state(joints)),
+    ("joint state + tool pose frame", legacy_state, lambda: encoder.state(joints, pose)),
+    ("scan request with tool pose", legacy_scan_request, scan_request),
+]
+
+
+def check():
+    # both paths have to produce the same bytes
+    for name, legacy, codec in cases:
+        assert bytes(codec()) == bytes(legacy()), name
+
+
+if __name__ == "__main__":
+    check()
+    for name, legacy, codec in cases:
+        legacy_time = min(timeit.repeat(legacy, number=NUMBER, repeat=3)) / NUMBER
+        codec_time = min(timeit.repeat(codec, number=NUMBER, repeat=3)) / NUMBER
+        print(f"{name:32s} legacy {legacy_time * 1e6:7.2f} us   codec {codec_time * 1e6:7.2f} us"
+              f"   speedup {legacy_time / codec_time:5.1f}x")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# Request/response benchmark against local MockVisionController
+import contextlib
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import CommunicationLibrary  # noqa: E402 - imported first because of circular import with RobotStateServer
+import PhoLogging  # noqa: E402
+from MockVisionController import MockVisionController  # noqa: E402
+
+ITERATIONS = 200  # round-trips per request type
+CYCLES = 50  # repetitions of every flow
+WAYPOINT_COUNTS = [10, 100, 1000, 10000]  # waypoints per trajectory segment
+CALIBRATION_POINTS = 9
+
+start_pose = [0., 0., 0., 0., 0., 0.]
+end_pose = [1.5, 0., 0., 0., 0., 0.]
+tool_pose = [100.0, 200.0, 300.0, 1.0, 0.0, 0.0, 0.0]
+
+results = sys.stdout  # benchmark results - library messages are redirected
+
+
+def output(line):
+    results.write(line + "\n")
+    results.flush()
+
+
+def connect(controller):
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    return robot
+
+
+def measure(function, iterations):
+    # returns durations of all calls [s]
+    durations = np.empty(iterations)
+    for iteration in range(iterations):
+        start = time.perf_counter()
+        function()
+        durations[iteration] = time.perf_counter() - start
+    return durations
+
+
+def report(name, durations, extra=""):
+    p50, p99 = np.percentile(durations, [50, 99]) * 1e3
+    output(f"{name:40s} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms {extra}")
+
+
+def request_latency():
+    output("--- round-trip latency per request type")
+    controller = MockVisionController(trajectory_segments=4, waypoints_per_segment=50)
+    robot = connect(controller)
+    requests = [
+        ("START SOLUTION", lambda: robot.pho_request_solution_start(254)),
+        ("INITIALIZATION [BINPICKING]", lambda: robot.pho_request_binpicking_init(1, start_pose, end_pose)),
+        ("SCAN [BINPICKING]", lambda: (robot.pho_request_binpicking_scan(1), robot.pho_binpicking_wait_for_scan())),
+        ("TRAJECTORY [BINPICKING]", lambda: robot.pho_request_binpicking_trajectory(1)),
+        ("OBJECT POSE [BINPICKING]", lambda: robot.pho_request_binpicking_object_pose(1)),
+        ("GET VISION SYSTEM STATUS [BINPICKING]", lambda: robot.pho_request_binpicking_get_vision_system_status(1)),
+        ("SCAN [LOCATOR]", lambda: (robot.pho_request_locator_scan(1), robot.pho_locator_wait_for_scan())),
+        ("GET OBJECTS [LOCATOR]", lambda: robot.pho_request_locator_get_objects(1, 5)),
+        ("ADD CALIBRATION POINT", lambda: robot.pho_request_calibration_add_point(tool_pose)),
+        ("GET RUNNING SOLUTION", lambda: robot.pho_request_solution_get_running()),
+    ]
+    for name, request in requests:
+        report(name, measure(request, ITERATIONS))
+    robot.close_connection()
+    controller.stop()
+
+
+def trajectory_throughput():
+    output("--- trajectory decode throughput (4 segments)")
+    for waypoints_per_segment in WAYPOINT_COUNTS:
+        controller = MockVisionController(trajectory_segments=4, waypoints_per_segment=waypoints_per_segment)
+        robot = connect(controller)
+        durations = measure(lambda: robot.pho_request_binpicking_trajectory(1), max(ITERATIONS // 10, 5))
+        waypoints = 4 * waypoints_per_segment
+        rate = waypoints / np.median(durations)
+        report(f"TRAJECTORY {waypoints} waypoints", durations, f"  {rate / 1e6:6.2f} M waypoints/s")
+        robot.close_connection()
+        controller.stop()
+
+
+def binpicking_cycle(robot):
+    robot.pho_request_binpicking_scan(1)
+    robot.pho_binpicking_wait_for_scan()
+    robot.pho_request_binpicking_trajectory(1)
+
+
+def locator_cycle(robot):
+    robot.pho_request_locator_scan(1)
+    robot.pho_locator_wait_for_scan()
+    robot.pho_request_locator_get_objects(1, 5)
+
+
+def calibration_cycle(robot):
+    robot.pho_request_calibration_start(6, 1)
+    for point in range(CALIBRATION_POINTS):
+        robot.pho_request_calibration_add_point(tool_pose)
+    robot.pho_request_calibration_save()
+    robot.pho_request_calibration_stop()
+
+
+def cycle_time():
+    output("--- cycle time of example flows")
+    controller = MockVisionController(trajectory_segments=4, waypoints_per_segment=50)
+    robot = connect(controller)
+    robot.pho_request_solution_start(254)
+    robot.pho_request_binpicking_init(1, start_pose, end_pose)
+    report("BINPICKING scan + trajectory", measure(lambda: binpicking_cycle(robot), CYCLES))
+    report("LOCATOR scan + get objects", measure(lambda: locator_cycle(robot), CYCLES))
+    report(f"CALIBRATION {CALIBRATION_POINTS} points", measure(lambda: calibration_cycle(robot), CYCLES))
+    robot.close_connection()
+    controller.stop()
+
+
+if __name__ == "__main__":
+    PhoLogging.set_log_level(PhoLogging.WARNING)  # measure communication, not logging
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):  # silence library messages
+        request_latency()
+        trajectory_throughput()
+        cycle_time()
@@ -0,0 +1,28 @@
+import asyncio
+import AsyncCommunicationLibrary
+
+CONTROLLER_IP = "192.168.1.1"
+PORT = 11003
+
+start_pose = [0., 0., 0., 0., 0., 0.]
+end_pose = [1.5, 0., 0., 0., 0., 0.]
+
+
+async def main():
+    robot = AsyncCommunicationLibrary.AsyncRobotRequestResponseCommunication()  # object is created
+    await robot.connect_to_server(CONTROLLER_IP, PORT)  # communication between VC and robot is created
+
+    await robot.pho_request_solution_start(254)
+    await robot.pho_request_binpicking_init(1, start_pose, end_pose)
+
+    # request scan
+    await robot.pho_request_binpicking_scan(1)
+    await robot.pho_binpicking_wait_for_scan()
+
+    # request trajectory
+    await robot.pho_request_binpicking_trajectory(1)
+
+    await robot.close_connection()  # communication needs to be closed
+
+
+asyncio.run(main())
@@ -15,4 +15,9 @@ robot.pho_locator_wait_for_scan()
 # request position of located objects
 robot.pho_request_locator_get_objects(1, 5)
 
+# objects one by one while the response is received - the rest is drained by the next request
+for located_object in robot.pho_request_locator_get_objects_stream(1, 5):
+    print(located_object.pose)
+    break
+
 robot.close_connection()  # communication needs to be closed
\ No newline at end of file
@@ -0,0 +1,22 @@
+import ControllerPool
+
+PORT = 11003
+
+# controller name -> (IP address, vision system IDs - one per bin)
+CONTROLLERS = {
+    "cell_1": ("192.168.1.1", [1]),
+    "cell_2": ("192.168.1.2", [1, 2]),
+}
+
+pool = ControllerPool.RobotControllerPool()  # object is created
+for name, (controller_ip, vs_ids) in CONTROLLERS.items():
+    pool.add_controller(name, controller_ip, PORT, vs_ids)  # communication between VCs and robot is created
+
+pool.pho_request_solution_start(253)
+
+# scan all bins at once and request position of located objects
+results = pool.pho_request_locator_scan_and_get_objects(5)
+for (name, vs_id), objects in results.items():
+    print(name, vs_id, objects.poses)
+
+pool.close_connection()  # communication needs to be closed
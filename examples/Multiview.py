@@ -1,11 +1,10 @@
 import CommunicationLibrary
+import MultiviewScan
 import json
 
 CONTROLLER_IP = "192.168.1.1"
 PORT = 11003
 
-tool_pose = []
-
 robot = CommunicationLibrary.RobotRequestResponseCommunication()  # object is created
 robot.connect_to_server(CONTROLLER_IP, PORT)  # communication between VC and robot is created
 
@@ -17,15 +16,18 @@ file_path = 'multiview_pose.json'
 with open(file_path, 'r') as file:
     json_data = json.load(file)
 
-for point in json_data:
-    translation_mm = point["translation"]
-    quaternion = point["quaternion"]
-    tool_pose = translation_mm + quaternion
 
-    robot.pho_request_locator_trigger_scan(1,tool_pose)
-    robot.pho_locator_wait_for_scan()
+def tool_poses():
+    # move robot to every pose and yield tool pose once it arrives
+    for point in json_data:
+        translation_mm = point["translation"]
+        quaternion = point["quaternion"]
+        yield translation_mm + quaternion
 
-robot.pho_request_locator_scan(1,tool_pose)
-robot.pho_locator_wait_for_scan()
 
+multiview = MultiviewScan.MultiviewScan(robot, 1)
+for timing in multiview.run(tool_poses()):
+    print(timing)
+print(multiview.get_objects(5))
 
+robot.close_connection()  # communication needs to be closed
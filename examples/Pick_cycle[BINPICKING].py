@@ -0,0 +1,35 @@
+import CommunicationLibrary
+import PickCycle
+from PhoReconnect import ReconnectPolicy
+
+CONTROLLER_IP = "192.168.1.1"
+PORT = 11003
+
+start_pose = [0., 0., 0., 0., 0., 0.]
+end_pose = [1.5, 0., 0., 0., 0., 0.]
+
+
+def pick(trajectory):
+    # execute trajectory.segments on the robot, return True if part was grasped
+    return True
+
+
+def place():
+    # place the part - next scan and trajectory are computed meanwhile
+    pass
+
+
+robot = CommunicationLibrary.RobotRequestResponseCommunication()  # object is created
+# lost connection is re-established automatically, running solution is started again
+robot.connect_to_server(CONTROLLER_IP, PORT, reconnect=ReconnectPolicy())
+
+robot.pho_request_solution_start(254)
+robot.pho_request_binpicking_init(1, start_pose, end_pose)
+
+cycle = PickCycle.BinPickingCycle(robot, 1, pick, place)
+for timing in cycle.run(10):
+    print(timing)
+print("picks: " + str(cycle.picks()) + ", failed picks: " + str(cycle.failed_picks()))
+print("picks per hour: " + str(round(cycle.picks_per_hour())))
+
+robot.close_connection()  # communication needs to be closed
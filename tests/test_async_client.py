@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+import AsyncCommunicationLibrary
+from MockVisionController import MockVisionController
+from PhoErrors import PhoRequestInProgress
+
+
+@pytest.fixture
+def controller():
+    controller = MockVisionController(scan_delay=0.05)
+    yield controller.start()
+    controller.stop()
+
+
+def test_status_poll_during_scan(controller):
+    # status request of another coroutine waits until the outstanding scan is received
+    async def main():
+        robot = AsyncCommunicationLibrary.AsyncRobotRequestResponseCommunication()
+        await robot.connect_to_server(*controller)
+
+        async def scan():
+            await robot.pho_request_binpicking_scan(1)
+            await asyncio.sleep(0.01)
+            return await robot.pho_binpicking_wait_for_scan()
+
+        async def poll():
+            await asyncio.sleep(0.005)
+            return await robot.pho_request_binpicking_get_vision_system_status(1)
+
+        scan_result, status = await asyncio.gather(scan(), poll())
+        assert robot.active_request == 0 and not robot.lock.locked()
+        await robot.close_connection()
+        return scan_result, status
+
+    scan_result, status = asyncio.run(main())
+    assert scan_result.request_id == 1
+    assert status is not None
+
+
+def test_failed_read_finishes_request(controller):
+    async def main():
+        robot = AsyncCommunicationLibrary.AsyncRobotRequestResponseCommunication()
+        await robot.connect_to_server(*controller)
+        await robot.pho_request_binpicking_scan(1)
+        robot.reader.feed_eof()  # connection closed before the response
+        with pytest.raises(asyncio.IncompleteReadError):
+            await robot.pho_binpicking_wait_for_scan()
+        assert robot.active_request == 0 and not robot.lock.locked()
+        await robot.close_connection()
+
+    asyncio.run(main())
+
+
+def test_request_of_task_waiting_for_scan(controller):
+    # same task cannot wait for its own scan - error instead of deadlock
+    async def main():
+        robot = AsyncCommunicationLibrary.AsyncRobotRequestResponseCommunication()
+        await robot.connect_to_server(*controller)
+        await robot.pho_request_binpicking_scan(1)
+        with pytest.raises(PhoRequestInProgress):
+            await robot.pho_request_binpicking_get_vision_system_status(1)
+        with pytest.raises(PhoRequestInProgress):
+            await robot.pho_request_binpicking_scan(1)
+        await robot.pho_binpicking_wait_for_scan()
+        await robot.close_connection()
+
+    asyncio.run(asyncio.wait_for(main(), 5))
+
+
+def test_cancelled_scan_releases_connection(controller):
+    async def main():
+        robot = AsyncCommunicationLibrary.AsyncRobotRequestResponseCommunication()
+        await robot.connect_to_server(*controller)
+
+        async def scan():
+            await robot.pho_request_binpicking_scan(1)
+            await asyncio.sleep(10)
+            await robot.pho_binpicking_wait_for_scan()
+
+        task = asyncio.create_task(scan())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not robot.lock.locked()
+        status = await asyncio.wait_for(robot.pho_request_binpicking_get_vision_system_status(1), 1)
+        await robot.close_connection()
+        return status
+
+    assert asyncio.run(main()) is not None
@@ -0,0 +1,56 @@
+import io
+import json
+import pytest
+import CommunicationLibrary
+from CalibrationBatch import CalibrationBatch, iter_json_points
+from MockVisionController import MockVisionController
+
+points = [{"translation": [0.1 * i, -0.25, 1e-3], "quaternion": [1.0, 0.0, 0.0, 0.0]} for i in range(5)]
+
+
+@pytest.fixture
+def robot():
+    controller = MockVisionController()
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    yield robot, controller
+    robot.close_connection()
+    controller.stop()
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7, 65536])
+def test_numbers_split_between_reads(read_size):
+    assert list(iter_json_points(io.StringIO("[12345, 678, -1.25e-2 ,3]"), read_size)) == [12345, 678, -0.0125, 3]
+
+
+@pytest.mark.parametrize("read_size", [1, 3, 65536])
+def test_points_split_between_reads(read_size):
+    text = json.dumps(points, indent=2)
+    assert list(iter_json_points(io.StringIO(text), read_size)) == points
+
+
+@pytest.mark.parametrize("text", ['{"a": 1}', "", "[1, 2", "[1, 2 3]", "[1,]", "[[1, 2]"])
+@pytest.mark.parametrize("read_size", [1, 3, 65536])
+def test_invalid_document(text, read_size):
+    with pytest.raises(ValueError):
+        list(iter_json_points(io.StringIO(text), read_size))
+
+
+def test_calibration_from_file(robot):
+    robot, controller = robot
+    batch = CalibrationBatch(robot, window=2)
+    result = batch.run(io.StringIO(json.dumps(points)), 1, 1)
+    assert batch.number_of_points == len(points) and batch.errors == []
+    assert controller.calibration_points == len(points)
+    assert result is not None
+
+
+@pytest.mark.parametrize("text", ['{"a": 1}', "[]"])
+def test_calibration_without_points_is_not_saved(robot, text):
+    robot, controller = robot
+    saves = []
+    save = robot.pho_request_calibration_save
+    robot.pho_request_calibration_save = lambda: saves.append(save())
+    with pytest.raises(ValueError):
+        CalibrationBatch(robot).run(io.StringIO(text), 1, 1)
+    assert saves == []
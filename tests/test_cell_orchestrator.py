@@ -0,0 +1,50 @@
+import socket
+import pytest
+from CellOrchestrator import CellOrchestrator
+from MockVisionController import MockVisionController
+
+
+@pytest.fixture
+def controller():
+    controller = MockVisionController(waypoints_per_segment=10, seed=1)
+    yield controller.start()
+    controller.stop()
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run(cells):
+    orchestrator = CellOrchestrator({"cells": cells})
+    orchestrator.start()
+    try:
+        return orchestrator.join(0.2)
+    finally:
+        orchestrator.close()
+
+
+def test_cells_are_aggregated(controller):
+    ip, port = controller
+    cells = [{"name": "cell" + str(index), "controller_ip": ip, "port": port, "solution": 254, "picks": 3}
+             for index in range(2)]
+    result = run(cells)
+    assert [cell["state"] for cell in result["cells"].values()] == ["finished", "finished"]
+    assert all(cell["cycles"] == 3 and cell["picks"] == 3 for cell in result["cells"].values())
+    total = result["total"]
+    assert total["cycles"] == 6 and total["picks"] == 6 and total["failed_cycles"] == 0
+    assert total["requests"] == sum(cell["requests"] for cell in result["cells"].values()) > 0
+    assert total["picks_per_hour"] > 0 and total["mean_cycle_time"] > 0
+    assert total["latency_p50"] is not None
+
+
+def test_failed_cell(controller):
+    ip, port = controller
+    cells = [{"name": "running", "controller_ip": ip, "port": port, "picks": 1},
+             {"name": "unreachable", "controller_ip": "127.0.0.1", "port": closed_port(), "picks": 1}]
+    result = run(cells)
+    assert result["cells"]["running"]["state"] == "finished"
+    assert result["cells"]["unreachable"]["state"] == "failed"
+    assert result["total"]["cycles"] == 1
@@ -0,0 +1,37 @@
+import pytest
+from ControllerPool import RobotControllerPool
+from MockVisionController import MockVisionController
+from PhoResults import ObjectsResult, StatusResult
+
+
+@pytest.fixture
+def pool():
+    controllers = {"left": MockVisionController(number_of_objects=2), "right": MockVisionController(number_of_objects=4)}
+    pool = RobotControllerPool()
+    pool.add_controller("left", *controllers["left"].start(), vs_ids=(1, 2))
+    pool.add_controller("right", *controllers["right"].start())
+    yield pool, controllers
+    pool.close_connection()
+    for controller in controllers.values():
+        controller.stop()
+
+
+def test_fan_out_to_every_bin(pool):
+    pool, controllers = pool
+    objects = pool.pho_request_locator_scan_and_get_objects(3)
+    assert list(objects) == [("left", 1), ("left", 2), ("right", 1)]
+    assert all(isinstance(result, ObjectsResult) for result in objects.values())
+    assert [len(result) for result in objects.values()] == [2, 2, 3]
+    status = pool.pho_request_binpicking_get_vision_system_status()
+    assert all(isinstance(result, StatusResult) and result.status.tolist() == [1, 0, 0, 0]
+               for result in status.values())
+
+
+def test_fan_out_to_every_controller(pool):
+    pool, controllers = pool
+    results = pool.pho_request_solution_start(253)
+    assert list(results) == ["left", "right"]
+    assert all(result.error == 0 for result in results.values())
+    assert [controller.running_solution for controller in controllers.values()] == [253, 253]
+    pool.pho_request_solution_stop()
+    assert [controller.running_solution for controller in controllers.values()] == [0, 0]
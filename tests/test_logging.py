@@ -0,0 +1,78 @@
+import logging
+import numpy as np
+import pytest
+import CommunicationLibrary
+from CommunicationLibrary import WAYPOINT_DTYPE, SUBHEADER_SIZE
+from MockVisionController import MockVisionController
+from PhoErrors import PhoChecksumError
+from PhoLogging import FlightRecorder, logger, flight_recorder, set_log_level, INFO, DEBUG, DISABLED
+from SessionCapture import SENT, RECEIVED
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records():
+    handler = ListHandler()
+    logger.addHandler(handler)
+    yield handler.records
+    logger.removeHandler(handler)
+    set_log_level(INFO)
+
+
+@pytest.fixture
+def robot():
+    controller = MockVisionController(waypoints_per_segment=10, seed=1)
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    yield robot, controller
+    robot.close_connection()
+    controller.stop()
+
+
+def test_flight_recorder_ring():
+    recorder = FlightRecorder(size=3, snippet=4)
+    frame = bytearray(b"0123456789")
+    for index in range(5):
+        recorder.record(SENT, "frame " + str(index), frame)
+    frame[0:4] = b"xxxx"  # recorder keeps a copy
+    assert [description for timestamp, direction, description, size, data in recorder.frames] == \
+        ["frame 2", "frame 3", "frame 4"]
+    assert all(size == 10 and data == b"0123" for timestamp, direction, description, size, data in recorder.frames)
+
+
+def test_levels(robot, records, capsys):
+    robot, controller = robot
+    robot.pho_request_solution_get_available()
+    assert [record.levelno for record in records] == [logging.INFO]  # request only - messages are DEBUG
+    set_log_level(DEBUG)
+    robot.pho_request_solution_get_available()
+    assert len([record for record in records if record.levelno == logging.DEBUG]) == 3
+    set_log_level(DISABLED)
+    records.clear()
+    capsys.readouterr()
+    robot.pho_request_solution_get_available()
+    assert records == [] and capsys.readouterr().out == ""
+
+
+def test_frames_dumped_on_protocol_error(robot, records):
+    robot, controller = robot
+    robot.pho_request_binpicking_trajectory(1)
+    segment = bytearray(controller.trajectory[0])
+    np.frombuffer(segment, WAYPOINT_DTYPE, offset=SUBHEADER_SIZE)['checksum'][0] += 1.0
+    controller.trajectory[0] = bytes(segment)
+    flight_recorder.clear()
+    with pytest.raises(PhoChecksumError):
+        robot.pho_request_binpicking_trajectory(1)
+    errors = [record.getMessage() for record in records if record.levelno == logging.ERROR]
+    assert "Wrong joints sum" in errors[0]
+    assert any("TRAJECTORY" in message and "->" in message for message in errors[1:])  # request which led to it
+    directions = [direction for timestamp, direction, description, size, data in flight_recorder.frames]
+    assert directions[:3] == [SENT, RECEIVED, RECEIVED]  # request, header, subheader
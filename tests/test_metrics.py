@@ -0,0 +1,41 @@
+import pytest
+import CommunicationLibrary
+from CommunicationLibrary import ActionRequest
+from MockVisionController import MockVisionController
+from PhoMetrics import LatencyHistogram, LATENCY_BUCKETS
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    for value in [0.0002] * 98 + [0.02, 100.0]:
+        histogram.record(value)
+    assert histogram.percentile(50) == 0.00025
+    assert histogram.percentile(99) == 0.025
+    assert histogram.percentile(100) == float("inf")  # above the last bucket
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100 and sum(snapshot["counts"]) == 100
+    assert len(snapshot["counts"]) == len(LATENCY_BUCKETS) + 1
+    assert snapshot["sum"] == pytest.approx(98 * 0.0002 + 100.02)
+
+
+def test_client_metrics():
+    controller = MockVisionController(trajectory_segments=2, waypoints_per_segment=10,
+                                      errors={ActionRequest.PHO_BINPICKING_PICK_FAILED: 3})
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    try:
+        robot.pho_request_binpicking_trajectory(1)
+        robot.pho_request_binpicking_trajectory(1)
+        robot.pho_request_binpicking_pick_failed(1)
+    finally:
+        robot.close_connection()
+        controller.stop()
+    trajectory = robot.metrics.requests[ActionRequest.PHO_BINPICKING_TRAJECTORY]
+    assert trajectory.requests == 2 and trajectory.responses == 2
+    assert trajectory.bytes_sent == 2 * 24  # header and vision system ID
+    assert trajectory.waypoints == 2 * 20
+    assert trajectory.subheaders == 2 * 4  # 2 segments, gripper command, gripping info
+    assert trajectory.total.count == 2 and trajectory.first_byte.sum <= trajectory.total.sum
+    pick_failed = robot.metrics.requests[ActionRequest.PHO_BINPICKING_PICK_FAILED]
+    assert pick_failed.errors == 1
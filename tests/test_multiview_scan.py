@@ -0,0 +1,37 @@
+import pytest
+import CommunicationLibrary
+from MockVisionController import MockVisionController
+from MultiviewScan import MultiviewScan
+from PhoErrors import PhoRequestError
+
+poses = [[100.0 * i, 0.0, 500.0, 1.0, 0.0, 0.0, 0.0] for i in range(3)]
+
+
+@pytest.fixture
+def robot():
+    controller = MockVisionController(number_of_objects=2)
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    yield robot
+    robot.close_connection()
+    controller.stop()
+
+
+@pytest.mark.parametrize("wait_for_acquisition", [True, False])
+def test_objects_of_multiview_scan(robot, wait_for_acquisition):
+    scan = MultiviewScan(robot, 1)
+    timings = scan.run(iter(poses), wait_for_acquisition)
+    assert [timing.view for timing in timings] == [0, 1, 2]
+    assert all(timing.acquisition >= 0 for timing in timings)
+    assert len(scan.get_objects(5).poses) == 2
+
+
+def test_no_views(robot):
+    # nothing was localized - error before any request is sent
+    scan = MultiviewScan(robot, 1, "binpicking")
+    assert scan.run([]) == []
+    with pytest.raises(PhoRequestError):
+        scan.trajectory()
+    with pytest.raises(PhoRequestError):
+        scan.get_objects(1)
+    assert not any(robot.pending.values())
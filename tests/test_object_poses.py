@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from ObjectPoses import ObjectPoses, FrameTransforms
+from PhoResults import CalibrationResult
+from PoseMath import pose_to_matrix, axis_angle_quaternion
+
+rng = np.random.default_rng(3)
+
+
+def random_poses(count):
+    q = rng.normal(size=(count, 4))
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return np.concatenate([rng.uniform(-500, 500, (count, 3)), q * np.sign(q[:, :1])], axis=1)
+
+
+def test_transform_matches_matrices():
+    poses = random_poses(20)
+    objects = ObjectPoses(poses)
+    frame = pose_to_matrix([100.0, -50.0, 800.0, *axis_angle_quaternion([0., 1., 0.], np.pi)])
+    transformed = objects.transform(frame)
+    np.testing.assert_allclose(transformed.matrices, frame @ pose_to_matrix(poses), atol=1e-9)
+    np.testing.assert_allclose(pose_to_matrix(transformed.poses), transformed.matrices, atol=1e-9)
+    back = transformed.transform(np.linalg.inv(frame))
+    np.testing.assert_allclose(back.poses, poses, atol=1e-9)
+
+
+def test_selection_and_order():
+    objects = ObjectPoses(random_poses(10))
+    objects.matrices  # cached matrices are selected together with poses
+    distances = objects.distances([0.0, 0.0, 0.0])
+    ordered = objects.order_by(distances)
+    assert np.all(np.diff(ordered.distances([0.0, 0.0, 0.0])) >= 0)
+    high = objects[objects.positions[:, 2] > 0]
+    np.testing.assert_allclose(high.matrices, pose_to_matrix(high.poses), atol=1e-12)
+    assert len(objects[3]) == 1
+    np.testing.assert_allclose(ObjectPoses([0, 0, 0, 1, 0, 0, 0]).approach_axes, [[0.0, 0.0, 1.0]])
+
+
+@pytest.mark.parametrize("hand_eye", [False, True])
+def test_frames_of_calibration(hand_eye):
+    camera_pose = [500.0, 0.0, 1000.0, 0.0, 1.0, 0.0, 0.0]
+    calibration = CalibrationResult(0, 0, np.array([1, 0]), np.array(camera_pose))
+    frames = FrameTransforms.for_calibration(calibration, hand_eye)
+    assert FrameTransforms.for_calibration(calibration, hand_eye) is frames  # created once per calibration
+    objects = ObjectPoses(random_poses(5))
+    tool_pose = [200.0, 100.0, 600.0, *axis_angle_quaternion([0., 0., 1.], 0.3)]
+    base = frames.to_base(objects, tool_pose)
+    tool = frames.to_tool(objects, tool_pose)
+    np.testing.assert_allclose(pose_to_matrix(tool_pose) @ tool.matrices, base.matrices, atol=1e-9)
+    expected = pose_to_matrix(camera_pose) @ objects.matrices
+    if hand_eye:
+        expected = pose_to_matrix(tool_pose) @ expected
+        with pytest.raises(ValueError):
+            frames.to_base(objects)
+    np.testing.assert_allclose(base.matrices, expected, atol=1e-9)
+
+
+def test_calibration_without_camera_pose():
+    with pytest.raises(ValueError):
+        FrameTransforms.for_calibration(CalibrationResult(0, 0, np.array([1, 0]), None))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import CommunicationLibrary
+from MockVisionController import MockVisionController
+
+
+@pytest.fixture
+def robot():
+    controller = MockVisionController(number_of_objects=5)
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    yield robot
+    robot.close_connection()
+    controller.stop()
+
+
+def check_objects(objects, number_of_objects):
+    assert [located.index for located in objects] == list(range(number_of_objects))
+    for located in objects:
+        assert located.pose.shape == (7,)
+        np.testing.assert_allclose(located.pose[3:], [1.0, 0.0, 0.0, 0.0])
+        assert located.dimensions.tolist() == [100, 50, 20]
+        assert located.zheight_angle.shape == (2,) and located.zheight_angle[1] == 0
+
+
+@pytest.mark.parametrize("number_of_objects, expected", [(3, 3), (10, 5), (0, 0)])
+def test_stream_objects(robot, number_of_objects, expected):
+    check_objects(list(robot.pho_request_locator_get_objects_stream(1, number_of_objects)), expected)
+
+
+def test_stopped_stream(robot):
+    # rest of the response is drained before the next request is received
+    for located in robot.pho_request_locator_get_objects_stream(1, 5):
+        break
+    assert robot.pho_request_locator_get_vision_system_status(1).status.tolist() == [1, 0, 0, 0]
+    assert len(robot.pho_request_locator_get_objects(1, 2)) == 2
+
+
+def test_stream_behind_other_requests(robot):
+    status = robot.pho_request_locator_get_vision_system_status_nowait(1)
+    objects = robot.pho_request_locator_get_objects_stream(1, 4)
+    check_objects(list(objects), 4)  # older response is dispatched to its request first
+    assert status.result().status.tolist() == [1, 0, 0, 0]
+
+
+def test_stream_of_received_response(robot):
+    objects = robot.pho_request_locator_get_objects_stream(1, 4)
+    robot.pho_request_locator_get_vision_system_status(1)  # objects response is received before iteration
+    check_objects(list(objects), 4)
@@ -0,0 +1,27 @@
+import pytest
+from CommunicationLibrary import pho_build_request
+from PhoCodec import RequestEncoder, VS_ID, VS_ID_POSE, VS_ID_START_END, SOL_ID_VS_ID, POSE
+
+pose = [100.0, 200.0, 300.0, 1.0, 0.0, 0.0, 0.0]
+
+
+@pytest.mark.parametrize("layout, values", [
+    (None, ()),
+    (VS_ID, (3,)),
+    (VS_ID_POSE, (3, *pose)),
+    (VS_ID_START_END, (3, *range(12))),
+    (SOL_ID_VS_ID, (2, 3)),
+    (POSE, pose),
+])
+def test_request_frame(layout, values):
+    # frame packed into the reusable buffer is the same as header + payload
+    payload = None if layout is None else layout.pack(*values)
+    assert bytes(RequestEncoder().request(19, layout, *values)) == pho_build_request(19, payload)
+
+
+def test_request_buffer_is_reused():
+    requests = RequestEncoder()
+    scan = requests.request(1, VS_ID_POSE, 1, *pose)
+    status = requests.request(19, VS_ID, 1)
+    assert scan.obj is status.obj
+    assert len(status) == 24
@@ -0,0 +1,41 @@
+import pytest
+import CommunicationLibrary
+from MockVisionController import MockVisionController
+from PhoErrors import PhoConnectionLost
+from PickCycle import BinPickingCycle
+
+
+@pytest.fixture
+def robot():
+    controller = MockVisionController(waypoints_per_segment=10)
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    yield robot
+    robot.close_connection()
+    controller.stop()
+
+
+def test_failed_picks_are_not_counted(robot):
+    grasps = iter([True, False, False, True])
+    cycle = BinPickingCycle(robot, 1, lambda trajectory: next(grasps), lambda: None, max_pick_retries=1)
+    cycle.run(3)  # second cycle fails twice, third picks
+    assert [timing.grasped for timing in cycle.timings] == [True, False, True]
+    assert cycle.picks() == 2 and cycle.failed_picks() == 1
+    total = sum(timing.total for timing in cycle.timings)
+    assert cycle.picks_per_hour() == pytest.approx(3600 * 2 / total)
+
+
+def test_prefetch_retried_after_connection_lost(robot):
+    trigger_scan = robot.pho_request_binpicking_trigger_scan_nowait
+    failures = [PhoConnectionLost("Connection lost before response was received")]
+
+    def lost_trigger_scan(*args):
+        if failures:
+            raise failures.pop()
+        return trigger_scan(*args)
+
+    robot.pho_request_binpicking_trigger_scan_nowait = lost_trigger_scan
+    cycle = BinPickingCycle(robot, 1, lambda trajectory: True, lambda: None)
+    timings = cycle.run(2)
+    assert len(timings) == 2
+    assert timings[0].reconnects == 1 and timings[1].reconnects == 0
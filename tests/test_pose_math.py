@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from PoseMath import quaternion_multiply, right_multiplication_matrix, normalize_quaternion, quaternion_conjugate, \
+    axis_angle_quaternion, quaternion_slerp, quaternion_to_matrix, matrix_to_quaternion, pose_to_matrix, \
+    matrix_to_pose, invert_transform, upsample_states
+
+rng = np.random.default_rng(7)
+
+
+def random_quaternions(count):
+    q = normalize_quaternion(rng.normal(size=(count, 4)))
+    return np.where(q[:, :1] < 0, -q, q)
+
+
+def angle(q0, q1):
+    return 2 * np.arccos(np.clip(np.abs(np.sum(q0 * q1, axis=-1)), 0, 1))
+
+
+def test_multiply_composes_rotations():
+    q1, q2 = random_quaternions(100), random_quaternions(100)
+    np.testing.assert_allclose(quaternion_to_matrix(quaternion_multiply(q1, q2)),
+                               quaternion_to_matrix(q1) @ quaternion_to_matrix(q2), atol=1e-12)
+    np.testing.assert_allclose(q1 @ right_multiplication_matrix(q2[0]), quaternion_multiply(q1, q2[0]), atol=1e-12)
+    identity = quaternion_multiply(q1, quaternion_conjugate(q1))
+    np.testing.assert_allclose(identity, np.tile([1., 0., 0., 0.], (100, 1)), atol=1e-12)
+
+
+def test_matrix_round_trip():
+    # half-turns have w == 0 - quaternion is taken from another row of the matrix
+    half_turns = axis_angle_quaternion(np.eye(3), np.full(3, np.pi))
+    q = np.concatenate([random_quaternions(100), np.where(half_turns < -1e-9, -half_turns, half_turns)])
+    np.testing.assert_allclose(matrix_to_quaternion(quaternion_to_matrix(q)), q, atol=1e-12)
+    single = matrix_to_quaternion(quaternion_to_matrix(q[0]))
+    assert single.shape == (4,)
+
+
+def test_pose_transforms():
+    poses = np.concatenate([rng.uniform(-500, 500, (50, 3)), random_quaternions(50)], axis=1)
+    matrices = pose_to_matrix(poses)
+    np.testing.assert_allclose(matrix_to_pose(matrices), poses, atol=1e-9)
+    np.testing.assert_allclose(invert_transform(matrices) @ matrices, np.tile(np.eye(4), (50, 1, 1)), atol=1e-9)
+    np.testing.assert_allclose(invert_transform(matrices), np.linalg.inv(matrices), atol=1e-9)
+
+
+def test_slerp():
+    q0 = np.array([1., 0., 0., 0.])
+    q1 = axis_angle_quaternion([0., 0., 1.], np.pi / 2)
+    t = np.linspace(0, 1, 11)
+    path = quaternion_slerp(q0, q1, t)
+    np.testing.assert_allclose(path[[0, -1]], [q0, q1], atol=1e-12)
+    np.testing.assert_allclose(angle(q0, path), t * np.pi / 2, atol=1e-9)  # constant angular velocity
+    np.testing.assert_allclose(quaternion_slerp(q0, -q1, 0.5), quaternion_slerp(q0, q1, 0.5), atol=1e-12)
+    same = quaternion_slerp(q1, q1, t)  # zero angle - linear blend instead of division by zero
+    assert np.all(np.isfinite(same))
+    np.testing.assert_allclose(same, np.tile(q1, (11, 1)), atol=1e-12)
+
+
+def test_batched_slerp():
+    q0, q1 = random_quaternions(20), random_quaternions(20)
+    t = rng.uniform(0, 1, 20)
+    batched = quaternion_slerp(q0, q1, t)
+    single = np.array([quaternion_slerp(a, b, s) for a, b, s in zip(q0, q1, t)])
+    np.testing.assert_allclose(batched, single, atol=1e-12)
+
+
+@pytest.mark.parametrize("rate", [100, 1000])
+def test_upsample_states(rate):
+    times = np.array([0.0, 0.1, 0.25])
+    joints = np.array([[0.0] * 6, [1.0] * 6, [4.0] * 6])
+    q1 = axis_angle_quaternion([1., 0., 0.], 0.5)
+    tool_poses = np.array([[0, 0, 0, 1, 0, 0, 0], [10, 0, 0, *q1], [40, 0, 0, *q1]], dtype=float)
+    samples, upsampled_joints, upsampled_poses = upsample_states(times, joints, tool_poses, rate)
+    assert samples[0] == 0.0 and samples[-1] == 0.25
+    assert np.all(np.diff(samples) <= 1.0 / rate + 1e-12)
+    np.testing.assert_allclose(upsampled_joints[:, 0], np.interp(samples, times, joints[:, 0]), atol=1e-12)
+    np.testing.assert_allclose(upsampled_poses[:, 0], np.interp(samples, times, tool_poses[:, 0]), atol=1e-12)
+    np.testing.assert_allclose(np.linalg.norm(upsampled_poses[:, 3:], axis=1), 1.0)
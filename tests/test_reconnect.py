@@ -0,0 +1,151 @@
+import socket
+import struct
+import threading
+import pytest
+import CommunicationLibrary
+from CommunicationLibrary import ActionRequest, BRAND_IDENTIFICATION
+from PhoErrors import PhoConnectionLost
+from MockVisionController import MockVisionController
+from PhoReconnect import ReconnectPolicy
+
+
+def recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed by peer")
+        data += chunk
+    return data
+
+
+class DroppingServer:  # first connection is closed right after the header of the first response
+    def __init__(self):
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.connections = 0
+        self.clients = []
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    @property
+    def address(self):
+        return self.server.getsockname()
+
+    def accept_loop(self):
+        while True:
+            try:
+                client, client_address = self.server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            self.clients.append(client)
+            if self.connections == 1:
+                threading.Thread(target=self.drop_after_header, args=(client,), daemon=True).start()
+
+    def drop_after_header(self, client):
+        recv_exact(client, len(BRAND_IDENTIFICATION))
+        header = recv_exact(client, 20)
+        payload_size, request_id = struct.unpack_from("<ii", header, 12)
+        recv_exact(client, 4 * payload_size)
+        client.sendall(struct.pack("<iii", request_id, 3, 0))  # 3 messages follow - never sent
+        client.close()
+
+    def close(self):
+        self.server.close()
+        for client in self.clients:
+            client.close()
+
+
+def call_with_timeout(function, timeout=5):
+    # returns exception raised by function - fails when function hangs
+    outcome = []
+
+    def target():
+        try:
+            function()
+            outcome.append(None)
+        except BaseException as error:
+            outcome.append(error)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert outcome, "request hangs after connection was lost"
+    return outcome[0]
+
+
+@pytest.fixture
+def server():
+    server = DroppingServer()
+    yield server
+    server.close()
+
+
+def connect(server):
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*server.address, reconnect=ReconnectPolicy(initial_delay=0.01, max_attempts=5))
+    return robot
+
+
+def test_drop_in_the_middle_of_response(server):
+    robot = connect(server)
+    handle = robot.pho_request_solution_get_running_nowait()
+    assert isinstance(call_with_timeout(handle.result), PhoConnectionLost)
+    assert server.connections == 2 and robot.reconnects == 1
+    assert robot.current_handle is None and not any(robot.pending.values())
+    robot.close_connection()
+
+
+def test_drop_in_the_middle_of_streamed_objects(server):
+    robot = connect(server)
+    stream = robot.pho_request_locator_get_objects_stream(1, 3)
+    assert isinstance(call_with_timeout(lambda: list(stream)), PhoConnectionLost)
+    assert robot.reconnects == 1
+    robot.close_connection()
+
+
+def test_backoff_delays():
+    policy = ReconnectPolicy(initial_delay=0.1, max_delay=0.5, multiplier=2.0, jitter=0.0, max_attempts=6)
+    assert list(policy.delays()) == pytest.approx([0.0, 0.1, 0.2, 0.4, 0.5, 0.5])
+    policy = ReconnectPolicy(initial_delay=0.1, max_delay=0.5, jitter=0.5, max_attempts=200)
+    delays = list(policy.delays())[1:]
+    assert all(0.05 <= delay <= 0.5 for delay in delays)  # shortened by up to half
+    assert len(set(delays)) > 1
+
+
+def test_session_restored_after_drop():
+    controller = MockVisionController()
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start(), reconnect=ReconnectPolicy(initial_delay=0.01, max_attempts=5))
+    try:
+        robot.pho_request_solution_start(253)
+        for client in controller.clients:
+            client.shutdown(socket.SHUT_RDWR)
+        controller.running_solution = 0  # controller restarted
+        error = call_with_timeout(robot.pho_request_solution_get_running)
+        assert error is None or isinstance(error, PhoConnectionLost)
+        assert robot.reconnects == 1 and len(controller.clients) == 2
+        assert robot.pho_request_solution_get_running().running_solution == 253  # solution started again
+    finally:
+        robot.close_connection()
+        controller.stop()
+
+
+def test_reconnect_gives_up():
+    controller = MockVisionController()
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start(), reconnect=ReconnectPolicy(initial_delay=0.01, max_attempts=3))
+    controller.stop()
+    error = call_with_timeout(robot.pho_request_solution_get_running)
+    assert isinstance(error, ConnectionError)
+    assert robot.reconnects == 0 and not robot.reconnecting
+    robot.close_connection()
+
+
+def test_without_policy_error_is_raised():
+    controller = MockVisionController()
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    controller.stop()
+    assert isinstance(call_with_timeout(robot.pho_request_solution_get_running), OSError)
+    assert robot.reconnects == 0
+    robot.close_connection()
@@ -0,0 +1,51 @@
+import time
+import pytest
+import CommunicationLibrary
+from MockVisionController import MockVisionController
+from PhoErrors import PhoRequestError
+
+
+@pytest.fixture
+def robot():
+    controller = MockVisionController(number_of_objects=3)
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    yield robot
+    robot.close_connection()
+    controller.stop()
+
+
+def test_pipelined_requests(robot):
+    # all requests are sent before any response is read, results are collected in any order
+    status = robot.pho_request_binpicking_get_vision_system_status_nowait(1)
+    objects = robot.pho_request_locator_get_objects_nowait(1, 2)
+    solution = robot.pho_request_solution_start_nowait(253)
+    running = robot.pho_request_solution_get_running_nowait()
+    assert robot.pho_request_locator_get_objects(1, 3).poses.shape == (3, 7)  # blocking request behind them
+    assert running.result().running_solution == 253
+    assert solution.result().error == 0
+    assert len(objects.result()) == 2
+    assert status.result().status.tolist() == [1, 0, 0, 0]
+    assert not any(robot.pending.values())
+
+
+def test_same_requests_are_matched_in_order(robot):
+    handles = [robot.pho_request_locator_get_objects_nowait(1, number) for number in (1, 2, 3)]
+    assert [len(handle.result()) for handle in reversed(handles)] == [3, 2, 1]
+
+
+def test_done_does_not_block(robot):
+    handle = robot.pho_request_solution_get_available_nowait()
+    deadline = time.monotonic() + 5
+    while not handle.done():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    assert handle.result().available_solutions.tolist() == [252, 253, 254]
+    assert handle.finished_time >= handle.sent_time
+
+
+def test_wait_without_request(robot):
+    with pytest.raises(PhoRequestError):
+        robot.pho_binpicking_wait_for_scan()
+    robot.pho_request_binpicking_scan(1)
+    assert robot.pho_binpicking_wait_for_scan().error == 0
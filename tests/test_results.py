@@ -0,0 +1,21 @@
+import numpy as np
+from CommunicationLibrary import ActionRequest, MessageType, ResponseData
+from PhoResults import TrajectoryResult
+
+
+def test_empty_segment_keeps_types_aligned():
+    data = ResponseData()
+    data.init_trajectory_data()
+    data.trajectory_data = [np.ones((3, 6)), np.empty((0, 6)), np.zeros((2, 6))]
+    data.trajectory_types = [MessageType.PHO_TRAJECTORY_CNT, MessageType.PHO_TRAJECTORY_CNT,
+                             MessageType.PHO_TRAJECTORY_FINE]
+    result = TrajectoryResult.from_response_data(ActionRequest.PHO_BINPICKING_TRAJECTORY, data)
+    assert [len(segment) for segment in result.segments] == [3, 2]
+    assert result.segment_types.tolist() == [MessageType.PHO_TRAJECTORY_CNT, MessageType.PHO_TRAJECTORY_FINE]
+
+
+def test_no_segments():
+    data = ResponseData()
+    data.init_trajectory_data()
+    result = TrajectoryResult.from_response_data(ActionRequest.PHO_BINPICKING_TRAJECTORY, data)
+    assert result.segments == [] and len(result.segment_types) == 0
@@ -0,0 +1,30 @@
+import numpy as np
+import CommunicationLibrary  # noqa: F401 - imported first because of circular import with RobotStateServer
+from PoseMath import quaternion_multiply
+from RobotStateServer import RobotSimulator, JOINT_LOWER_LIMIT, JOINT_UPPER_LIMIT, TOOL_RADIUS, TOOL_ROTATION
+
+
+def test_joints_stay_in_limits():
+    simulator = RobotSimulator(8, seed=2)
+    for _ in range(500):
+        joints = simulator.step_joint_state()
+        assert np.all(joints >= JOINT_LOWER_LIMIT) and np.all(joints <= JOINT_UPPER_LIMIT)
+    assert len(np.unique(joints[:, 0])) > 1  # robots move independently
+
+
+def test_seeded_simulators_are_equal():
+    first, second = RobotSimulator(3, seed=5), RobotSimulator(3, seed=5)
+    for _ in range(50):
+        np.testing.assert_array_equal(first.step()[0], second.step()[0])
+
+
+def test_tool_pose():
+    simulator = RobotSimulator(4, seed=1)
+    quaternion = np.array([1.0, 0.0, 0.0, 0.0])
+    for frame in range(60):
+        phase = min(simulator.tool_counter // 25, 3)
+        poses = simulator.step_tool_pose()
+        quaternion = quaternion_multiply(quaternion, TOOL_ROTATION[phase])
+        np.testing.assert_allclose(np.hypot(poses[:, 0], poses[:, 1]), TOOL_RADIUS)
+        np.testing.assert_allclose(np.linalg.norm(poses[:, 3:], axis=1), 1.0)
+        np.testing.assert_allclose(poses[:, 3:], np.tile(quaternion, (4, 1)), atol=1e-9)
@@ -0,0 +1,148 @@
+import socket
+import struct
+import threading
+import time
+import pytest
+import CommunicationLibrary
+from CommunicationLibrary import ActionRequest, MessageType
+from MockVisionController import MockVisionController
+from PhoErrors import PhoMessageTypeError
+from SessionCapture import CAPTURE_MAGIC, FILE_HEADER, RECORD, RECEIVED, CaptureFile
+
+
+@pytest.fixture
+def capture(tmp_path):
+    # live session with mock vision controller recorded into capture file
+    path = str(tmp_path / "session.phocap")
+    controller = MockVisionController(waypoints_per_segment=20, scan_delay=0.01)
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    robot.start_recording(path)
+    robot.pho_request_binpicking_scan(1)
+    robot.pho_binpicking_wait_for_scan()
+    robot.pho_request_binpicking_trajectory(1)
+    robot.close_connection()
+    controller.stop()
+    return path
+
+
+def test_replay_capture(capture):
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    handles = list(robot.replay_capture(capture))
+    assert [handle.finished for handle in handles] == [True, True]
+    assert len(handles[1].result().segments) == 4
+
+
+def test_poll_during_replay(capture):
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_capture(capture)
+    scan = robot.pho_request_binpicking_scan_nowait(1)
+    trajectory = robot.pho_request_binpicking_trajectory_nowait(1)
+    deadline = time.monotonic() + 5
+    while not trajectory.done():
+        assert time.monotonic() < deadline
+    assert scan.finished
+    assert len(trajectory.result().segments) == 4
+    robot.close_connection()
+
+
+def write_capture(path, records):
+    # records - (seconds since capture start, direction, bytes)
+    with open(path, "wb") as file:
+        file.write(FILE_HEADER.pack(CAPTURE_MAGIC, 0.0))
+        for timestamp, direction, data in records:
+            file.write(RECORD.pack(timestamp, direction, len(data)) + data)
+
+
+def solution_response(solution_id, message_type=MessageType.PHO_INFO):
+    return (struct.pack("<iii", ActionRequest.PHO_SOLUTION_GET_RUNNING, 1, 0) +
+            struct.pack("<iii", message_type, 0, 1) + struct.pack("<i", solution_id))
+
+
+def test_replay_unknown_message_type(tmp_path):
+    # bad response and its tail are discarded until the recorded line is quiet, next response is decoded
+    path = str(tmp_path / "corrupt.phocap")
+    write_capture(path, [(0.0, RECEIVED, solution_response(7, message_type=9)),
+                         (0.001, RECEIVED, b"\0" * 40),
+                         (1.0, RECEIVED, solution_response(254))])
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_capture(path)
+    with pytest.raises(PhoMessageTypeError) as error:
+        robot.pho_request_solution_get_running()
+    assert error.value.resynchronized
+    assert robot.pho_request_solution_get_running().running_solution == 254
+    robot.close_connection()
+
+
+def test_replay_unknown_message_type_at_end(tmp_path):
+    # end of capture while discarding is quiet line - protocol error is raised, not lost connection
+    path = str(tmp_path / "corrupt_end.phocap")
+    write_capture(path, [(0.0, RECEIVED, solution_response(7, message_type=9) + b"\0" * 40)])
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_capture(path)
+    with pytest.raises(PhoMessageTypeError):
+        robot.pho_request_solution_get_running()
+    robot.close_connection()
+
+
+def test_replay_truncated_capture(tmp_path):
+    path = str(tmp_path / "truncated.phocap")
+    write_capture(path, [(0.0, RECEIVED, solution_response(254)[:-2])])
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_capture(path)
+    handle = robot.pho_request_solution_get_running_nowait()
+    with pytest.raises(ConnectionError):
+        while not handle.done():
+            pass
+    robot.close_connection()
+
+
+class GarbageServer:  # first response has unknown message type followed by garbage, next responses are valid
+    def __init__(self):
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.sent = 0  # bytes sent to client
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        client, client_address = self.server.accept()
+        with client:
+            client.recv(len(CommunicationLibrary.BRAND_IDENTIFICATION))
+            responses = [[solution_response(7, message_type=9), b"\xff" * 40], [solution_response(254)]]
+            for chunks in responses:
+                if len(client.recv(20)) < 20:
+                    return
+                for chunk in chunks:
+                    client.sendall(chunk)
+                    self.sent += len(chunk)
+                    time.sleep(0.01)
+            client.recv(1)  # until client closes
+
+    def close(self):
+        self.server.close()
+
+
+def test_capture_of_corrupt_stream(tmp_path):
+    # bytes discarded by resync are captured - replay resynchronizes like the live session
+    path = str(tmp_path / "garbage.phocap")
+    server = GarbageServer()
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*server.server.getsockname())
+    robot.start_recording(path)
+    with pytest.raises(PhoMessageTypeError):
+        robot.pho_request_solution_get_running()
+    assert robot.pho_request_solution_get_running().running_solution == 254
+    robot.close_connection()
+    server.thread.join(5)
+    server.close()
+
+    capture = CaptureFile(path)
+    assert sum(len(data) for timestamp, direction, data in capture.records(RECEIVED)) == server.sent
+    capture.close()
+
+    replay = CommunicationLibrary.RobotRequestResponseCommunication()
+    replay.connect_to_capture(path)
+    with pytest.raises(PhoMessageTypeError):
+        replay.pho_request_solution_get_running()
+    assert replay.pho_request_solution_get_running().running_solution == 254
+    replay.close_connection()
@@ -0,0 +1,36 @@
+import socket
+import struct
+import threading
+import CommunicationLibrary
+from PhoCodec import STATE_FRAME
+
+
+def receive_frame(client):
+    data = b""
+    while len(data) < STATE_FRAME.size:
+        data += client.recv(STATE_FRAME.size - len(data))
+    return data
+
+
+def test_multi_client_serve_state():
+    server = CommunicationLibrary.MultiClientRobotStateCommunication()
+    server.create_server("127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_state, args=(500, 2), daemon=True)
+    thread.start()
+    try:
+        clients = [socket.create_connection(server.server.getsockname()) for _ in range(2)]
+        for client in clients:
+            hello = CommunicationLibrary.BRAND_IDENTIFICATION_SERVER.encode("utf-8")
+            received = b""
+            while len(received) < len(hello):
+                received += client.recv(len(hello) - len(received))
+            assert received == hello
+            frame = receive_frame(client)
+            assert struct.unpack_from("<3I2i", frame) == (80, 72, 79, 6, CommunicationLibrary.JOINT_STATE_TYPE)
+        for client in clients:
+            client.close()
+        thread.join(5)
+        assert not thread.is_alive()  # both clients left
+        assert server.stream_statistics.ticks > 0
+    finally:
+        server.close_connection()
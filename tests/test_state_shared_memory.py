@@ -0,0 +1,76 @@
+import socket
+import threading
+import time
+import pytest
+import CommunicationLibrary
+from StateSharedMemory import StatePublisher, StateReader
+
+
+def wait_for_samples(reader, count, timeout=5):
+    start = reader.latest()
+    first = -1 if start is None else start.number
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        sample = reader.latest()
+        if sample is not None and sample.number >= first + count:
+            return sample
+        time.sleep(0.005)
+    raise AssertionError("State is not published")
+
+
+def connect_and_drop(address):
+    client = socket.create_connection(address)
+    client.recv(len(CommunicationLibrary.BRAND_IDENTIFICATION_SERVER))
+    client.recv(4096)  # state frames
+    client.close()
+
+
+def test_publishing_without_client():
+    server = CommunicationLibrary.RobotStateCommunication()
+    server.create_server("127.0.0.1", 0)
+    name = server.start_publishing()
+    thread = threading.Thread(target=server.serve_state, args=(500, 2), daemon=True)
+    thread.start()
+    reader = StateReader(name)
+    try:
+        wait_for_samples(reader, 5)  # before the first client
+        connect_and_drop(server.server.getsockname())
+        wait_for_samples(reader, 5)  # after the client dropped - same block
+        connect_and_drop(server.server.getsockname())
+        thread.join(5)
+        assert not thread.is_alive()
+    finally:
+        reader.close()
+        server.close_connection()
+
+
+def test_separate_frames_are_published():
+    server = CommunicationLibrary.RobotStateCommunication()
+    name = server.start_publishing()
+    server.client, peer = socket.socketpair()
+    reader = StateReader(name)
+    try:
+        server.send_joint_state()
+        assert reader.latest() is None  # sample is complete with the tool pose
+        server.send_tool_pose()
+        assert reader.latest().number == 0
+    finally:
+        reader.close()
+        server.stop_publishing()
+        server.client.close()
+        peer.close()
+
+
+def test_incomplete_sample():
+    publisher = StatePublisher(ring_size=1)
+    reader = StateReader(publisher.name)
+    try:
+        publisher.publish([0.0] * 6, [0.0] * 7)
+        publisher.sequence[0] += 1  # publisher stopped in the middle of the next sample
+        with pytest.raises(TimeoutError):
+            reader.latest(retries=10)
+        with pytest.raises(TimeoutError):
+            reader.latest_view(retries=10)
+    finally:
+        reader.close()
+        publisher.close()
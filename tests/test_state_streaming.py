@@ -0,0 +1,53 @@
+import socket
+import time
+import pytest
+import CommunicationLibrary
+from PhoCodec import STATE_FRAME
+
+
+@pytest.fixture
+def server():
+    # frames of few ticks fit into the socket buffer - nothing has to read them during streaming
+    server = CommunicationLibrary.RobotStateCommunication()
+    server.client, client = socket.socketpair()
+    yield server, client
+    server.client.close()
+    client.close()
+
+
+def read_all(sock):
+    data = b""
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_fixed_rate(server):
+    server, client = server
+    start = time.monotonic()
+    statistics = server.stream_state(rate=200, number_of_ticks=40)
+    duration = time.monotonic() - start
+    assert statistics.ticks == 40
+    assert 39 / 200 <= duration < 1.0  # schedule is not shifted by send time
+    server.client.shutdown(socket.SHUT_WR)
+    assert len(read_all(client)) == 40 * STATE_FRAME.size
+
+
+def test_missed_deadlines_are_skipped(server):
+    server, client = server
+    send_state = server.send_state
+    ticks = []
+
+    def slow_send_state():
+        ticks.append(time.monotonic())
+        if len(ticks) == 5:
+            time.sleep(0.055)  # more than 5 periods
+        send_state()
+
+    server.send_state = slow_send_state
+    statistics = server.stream_state(rate=100, number_of_ticks=10)
+    assert statistics.ticks == 10
+    assert statistics.missed_deadlines >= 4
+    assert ticks[9] - ticks[5] > 0.025  # lost ticks are not sent in a burst after the late one
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import CommunicationLibrary
+from CommunicationLibrary import MessageType, WAYPOINT_DTYPE, SUBHEADER_SIZE
+from MockVisionController import MockVisionController
+from PhoErrors import PhoChecksumError
+
+
+def connect(controller):
+    robot = CommunicationLibrary.RobotRequestResponseCommunication()
+    robot.connect_to_server(*controller.start())
+    return robot
+
+
+def sent_segments(controller):
+    # joints of trajectory segments as sent by the mock controller
+    return [np.frombuffer(message, WAYPOINT_DTYPE, offset=SUBHEADER_SIZE)['joints'] for message in controller.trajectory
+            if int.from_bytes(message[0:4], "little") in (MessageType.PHO_TRAJECTORY_CNT,
+                                                            MessageType.PHO_TRAJECTORY_FINE)]
+
+
+@pytest.mark.parametrize("waypoints_per_segment", [1, 50, 5000])  # 5000 waypoints do not fit receive buffer
+def test_trajectory_decode(waypoints_per_segment):
+    controller = MockVisionController(waypoints_per_segment=waypoints_per_segment, seed=1)
+    robot = connect(controller)
+    try:
+        trajectory = robot.pho_request_binpicking_trajectory(1)
+        segments = sent_segments(controller)
+        assert len(trajectory.segments) == 4
+        for received, sent in zip(trajectory.segments, segments):
+            assert received.shape == (waypoints_per_segment, CommunicationLibrary.NUMBER_OF_JOINTS)
+            np.testing.assert_array_equal(received, sent)
+        cnt, fine = MessageType.PHO_TRAJECTORY_CNT, MessageType.PHO_TRAJECTORY_FINE
+        assert trajectory.segment_types.tolist() == [cnt, fine, cnt, fine]
+        assert trajectory.gripper_commands.tolist() == [1]
+        assert [info.tolist() for info in trajectory.gripping_info] == [[1, 2, 3]]
+        assert len(trajectory.waypoints) == 4 * waypoints_per_segment
+    finally:
+        robot.close_connection()
+        controller.stop()
+
+
+def test_results_do_not_share_arrays():
+    controller = MockVisionController(seed=1)
+    robot = connect(controller)
+    try:
+        first = robot.pho_request_binpicking_trajectory(1)
+        copy = first.waypoints.copy()
+        robot.pho_request_binpicking_trajectory(1)
+        np.testing.assert_array_equal(first.waypoints, copy)
+    finally:
+        robot.close_connection()
+        controller.stop()
+
+
+def test_wrong_checksum():
+    controller = MockVisionController(waypoints_per_segment=10, seed=1)
+    robot = connect(controller)
+    try:
+        robot.pho_request_binpicking_trajectory(1)  # mock generates its trajectory
+        segment = bytearray(controller.trajectory[0])
+        waypoints = np.frombuffer(segment, WAYPOINT_DTYPE, offset=SUBHEADER_SIZE)
+        waypoints['checksum'][3] += 1.0
+        controller.trajectory[0] = bytes(segment)
+        with pytest.raises(PhoChecksumError) as error:
+            robot.pho_request_binpicking_trajectory(1)
+        assert error.value.resynchronized
+        assert robot.pho_request_binpicking_get_vision_system_status(1).status.tolist() == [1, 0, 0, 0]
+    finally:
+        robot.close_connection()
+        controller.stop()
@@ -0,0 +1,37 @@
+import numpy as np
+from TrajectoryProcessing import PHO_TRAJECTORY_FINE, prepare_trajectory, time_parameterize
+
+
+def line(end):
+    waypoints = np.zeros((2, 6))
+    waypoints[1, 0] = end
+    return waypoints
+
+
+def test_two_waypoints_acceleration_limited():
+    # triangular profile - never reaches max velocity
+    times = time_parameterize(line(0.5), 1.0, 2.0)
+    assert np.allclose(times, [0, 2 * np.sqrt(0.5 / 2)])
+
+
+def test_two_waypoints_velocity_limited():
+    # trapezoidal profile - length / v + v / a
+    times = time_parameterize(line(10.0), 1.0, 2.0)
+    assert np.allclose(times, [0, 10.0 / 1.0 + 1.0 / 2.0])
+
+
+def test_fine_fine_segments():
+    segment = line(1.0)
+    segments = [segment, segment[::-1]]
+    types = [PHO_TRAJECTORY_FINE, PHO_TRAJECTORY_FINE]
+    samples, joints = prepare_trajectory(segments, types, 0.004, 1.0, 2.0)
+    assert np.isclose(samples[-1], 3.0)
+    assert np.allclose(joints[0], 0) and np.allclose(joints[-1], 0)
+    assert np.isclose(joints[:, 0].max(), 1.0)
+    assert np.all(np.abs(np.diff(joints[:, 0])) <= 1.0 * 0.004 + 1e-9)  # velocity limit
+
+
+def test_single_fine_segment():
+    samples, joints = prepare_trajectory([line(1.0)], [PHO_TRAJECTORY_FINE], 0.004, 1.0, 2.0)
+    assert np.isclose(samples[-1], 1.5)
+    assert np.allclose(joints[-1], line(1.0)[-1])
@@ -0,0 +1,48 @@
+import socket
+import threading
+import time
+import pytest
+from CommunicationLibrary import PhoTransport
+
+data = bytes(range(256)) * 40
+
+
+def send_in_pieces(sock, payload, piece=7):
+    for start in range(0, len(payload), piece):
+        sock.sendall(payload[start:start + piece])
+        time.sleep(0.0001)
+    sock.shutdown(socket.SHUT_WR)
+
+
+@pytest.fixture
+def pair():
+    left, right = socket.socketpair()
+    yield left, right
+    left.close()
+    right.close()
+
+
+@pytest.mark.parametrize("buffer_size", [16, 4096])  # 16 -> buffer grows for larger frames
+def test_exact_frames_over_split_stream(pair, buffer_size):
+    left, right = pair
+    threading.Thread(target=send_in_pieces, args=(left, data), daemon=True).start()
+    transport = PhoTransport(right, buffer_size)
+    sizes = [12, 1, 300, 5000, 3, 12]
+    received = b"".join(bytes(transport.recv_exact(size)) for size in sizes)
+    assert received == data[:sum(sizes)]
+    assert bytes(transport.recv_exact(len(data) - sum(sizes))) == data[sum(sizes):]
+    with pytest.raises(ConnectionError):
+        transport.recv_exact(1)
+
+
+def test_readable_and_discard(pair):
+    left, right = pair
+    transport = PhoTransport(right)
+    assert not transport.readable()
+    left.sendall(b"0123456789")
+    assert transport.readable(1)
+    assert bytes(transport.recv_exact(4)) == b"0123"
+    assert transport.buffered() == 6 and transport.readable()
+    left.sendall(b"garbage")
+    assert transport.discard(0.05) == 13  # buffered rest and everything that arrived
+    assert transport.buffered() == 0 and not transport.readable()